@@ -0,0 +1,128 @@
+"""
+Micro-benchmarks for the hot paths of an upload, each timed in isolation:
+
+  read_resume[<format>]       upload read + sniffing + parsing (OCR for images)
+  extract_skills[llm]         prompt build, gateway round trip to a zero-latency
+                              stub, JSON validation and skill cleanup
+  extract_skills[local]       taxonomy matching only, no model call
+  compact                     prompt compaction of the same resume text
+  get_current_user[cold|warm] JWT decode + user lookup, with and without the principal cache
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_micro --repeat 200
+    python -m benchmarks.bench_micro --repeat 200 --save-baseline
+    python -m benchmarks.compare benchmarks/baselines/micro.json benchmarks/results/micro-<timestamp>.json
+"""
+import io
+import time
+import asyncio
+import argparse
+import tempfile
+from benchmarks import harness
+from benchmarks.stub_openai import start_stub
+
+
+def time_calls(fn, repeat: int, setup=None) -> dict:
+    samples = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return harness.summarize(samples, time.perf_counter() - started)
+
+
+def bench_read_resume(loop, repeat: int, ocr_repeat: int) -> dict:
+    from fastapi import UploadFile
+    from utils.file_reader import read_resume
+    from benchmarks.bench_read_resume import generate_corpus
+
+    corpus = tempfile.mkdtemp(prefix="extractor-corpus-")
+    generate_corpus(corpus)
+    results = {}
+    for name, kind in (("sample.docx", "docx"), ("sample.pdf", "pdf"), ("sample.png", "png")):
+        with open(f"{corpus}/{name}", "rb") as f:
+            content = f.read()
+
+        def read():
+            upload = UploadFile(file=io.BytesIO(content), filename=name, size=len(content))
+            loop.run_until_complete(read_resume(upload))
+
+        try:
+            results[f"read_resume[{kind}]"] = time_calls(read, ocr_repeat if kind == "png" else repeat)
+        except Exception as e:  # e.g. no tesseract binary on this machine
+            results[f"read_resume[{kind}]"] = {"n": 0, "error": f"{type(e).__name__}: {e}"}
+    return results
+
+
+def bench_extraction(loop, repeat: int) -> dict:
+    from utils.skill_extractor import extract_skills_and_feedback_with_llm, extract_skills_locally
+    from utils.text_compactor import compact
+    from benchmarks.bench_read_resume import SAMPLE_LINES
+
+    text = "\n".join(SAMPLE_LINES * 3)
+    prompt_text = compact(text).text
+    extract_skills_locally(text)  # loads the taxonomy outside the timed loop
+
+    def extract_llm():
+        result = loop.run_until_complete(extract_skills_and_feedback_with_llm(prompt_text))
+        if not result.ok:
+            raise RuntimeError("stub call failed; is the stub server reachable?")
+
+    return {
+        "extract_skills[llm]": time_calls(extract_llm, repeat),
+        "extract_skills[local]": time_calls(lambda: extract_skills_locally(text), repeat),
+        "compact": time_calls(lambda: compact(text), repeat),
+    }
+
+
+def bench_get_current_user(repeat: int) -> dict:
+    import auth
+    import crud
+    import create_tables
+    from database import SessionLocal
+
+    create_tables.create_tables()
+    db = SessionLocal()
+    try:
+        email = "bench-user@gmail.com"
+        if crud.get_user_by_email(db, email) is None:
+            crud.create_user(db, email, auth.get_password_hash("Benchmark1pass"))
+        token = auth.create_access_token({"sub": email})
+        auth.get_current_user(token=token, db=db)
+        return {
+            "get_current_user[cold]": time_calls(lambda: auth.get_current_user(token=token, db=db), repeat,
+                                                 setup=auth.principal_cache.clear),
+            "get_current_user[warm]": time_calls(lambda: auth.get_current_user(token=token, db=db), repeat),
+        }
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--ocr-repeat", type=int, default=5, help="repetitions for OCR'd formats, which take seconds each")
+    parser.add_argument("--save-baseline", action="store_true", help="also write benchmarks/baselines/micro.json")
+    args = parser.parse_args()
+
+    server, base_url = start_stub()
+    harness.configure(base_url, SKILL_EXTRACTION_MODE="llm")
+    loop = asyncio.new_event_loop()
+    try:
+        results = {}
+        results.update(bench_read_resume(loop, args.repeat, args.ocr_repeat))
+        results.update(bench_extraction(loop, args.repeat))
+        results.update(bench_get_current_user(args.repeat))
+    finally:
+        loop.close()
+        server.shutdown()
+
+    harness.print_table(results)
+    harness.write_results("micro", {"repeat": args.repeat, "ocr_repeat": args.ocr_repeat}, results, args.save_baseline)
+
+
+if __name__ == "__main__":
+    main()
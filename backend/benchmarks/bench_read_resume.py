@@ -0,0 +1,108 @@
+"""
+Compares the legacy temp-file parsing path with the in-memory one in utils.file_reader.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_read_resume --generate benchmarks/corpus
+    python -m benchmarks.bench_read_resume benchmarks/corpus --repeat 20
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import tempfile
+import fitz  # PyMuPDF
+import docx
+import pytesseract
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.file_reader import parse_resume, sniff_format
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".png", ".jpg", ".jpeg")
+SAMPLE_LINES = [
+    "Jane Doe - Senior Backend Engineer",
+    "Experience: Python, FastAPI, PostgreSQL, Docker, Kubernetes, AWS",
+    "Led migration of a monolith to event-driven microservices.",
+    "Education: BSc Computer Science",
+] * 10
+
+
+def legacy_parse(filename: str, content: bytes) -> str:
+    """The pre-change implementation: write every upload to a temp dir and reopen it."""
+    ext = os.path.splitext(filename)[1].lower()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        temp_path = os.path.join(tmpdir, "temp_resume" + ext)
+        with open(temp_path, "wb") as f:
+            f.write(content)
+        if ext == ".pdf":
+            doc = fitz.open(temp_path)
+            text = ""
+            for page in doc:
+                text += page.get_text()
+            doc.close()
+            return text
+        if ext == ".docx":
+            return "\n".join(para.text for para in docx.Document(temp_path).paragraphs)
+        return pytesseract.image_to_string(Image.open(temp_path))
+
+
+def generate_corpus(directory: str, pages: int = 3):
+    os.makedirs(directory, exist_ok=True)
+
+    pdf = fitz.open()
+    for _ in range(pages):
+        page = pdf.new_page()
+        page.insert_text((72, 72), "\n".join(SAMPLE_LINES), fontsize=9)
+    pdf.save(os.path.join(directory, "sample.pdf"))
+    pdf.close()
+
+    document = docx.Document()
+    for line in SAMPLE_LINES * pages:
+        document.add_paragraph(line)
+    document.save(os.path.join(directory, "sample.docx"))
+
+    image = Image.new("RGB", (1240, 1754), "white")
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(SAMPLE_LINES[:20]):
+        draw.text((60, 60 + i * 40), line, fill="black")
+    image.save(os.path.join(directory, "sample.png"))
+    print(f"Wrote sample.pdf, sample.docx and sample.png to {directory}")
+
+
+def time_call(fn, filename: str, content: bytes, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(filename, content)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def run(directory: str, repeat: int):
+    files = sorted(f for f in os.listdir(directory) if f.lower().endswith(SUPPORTED_EXTENSIONS))
+    if not files:
+        sys.exit(f"No resumes found in {directory}; run with --generate first.")
+
+    print(f"{'file':30} {'size KB':>8} {'legacy ms':>10} {'in-memory ms':>13} {'speedup':>8}")
+    for name in files:
+        with open(os.path.join(directory, name), "rb") as f:
+            content = f.read()
+        legacy = statistics.median(time_call(legacy_parse, name, content, repeat))
+        kind = sniff_format(content)
+        current = statistics.median(time_call(lambda _, data: parse_resume(kind, data), name, content, repeat))
+        print(f"{name:30} {len(content) / 1024:8.1f} {legacy:10.2f} {current:13.2f} {legacy / current:7.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="Directory of sample resumes")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--generate", action="store_true", help="Write a small synthetic corpus into the directory")
+    args = parser.parse_args()
+
+    if args.generate:
+        generate_corpus(args.corpus)
+    else:
+        run(args.corpus, args.repeat)
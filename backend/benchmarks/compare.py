@@ -0,0 +1,63 @@
+"""
+Compares a benchmark result file against a baseline and flags regressions.
+
+A case regresses when its p50 or p99 latency grows, or its rps falls, by more
+than --threshold (10% by default). The exit status is 1 if anything
+regressed, so CI can use it.
+
+Usage (from the backend directory):
+    python -m benchmarks.compare benchmarks/baselines/micro.json benchmarks/results/micro-<timestamp>.json
+"""
+import sys
+import json
+import argparse
+
+# metric -> True when a higher value is better
+METRICS = {"p50_ms": False, "p99_ms": False, "rps": True}
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """Prints the comparison table and returns the regressed "case metric" names."""
+    if baseline.get("params") != current.get("params"):
+        print(f"warning: parameters differ\n  baseline: {baseline.get('params')}\n  current:  {current.get('params')}")
+    if baseline.get("platform") != current.get("platform") or baseline.get("cpu_count") != current.get("cpu_count"):
+        print("warning: results come from different machines; differences may not be regressions")
+
+    regressions = []
+    print(f"{'case':44} {'metric':7} {'baseline':>10} {'current':>10} {'change':>8}")
+    for case, base in baseline["results"].items():
+        now = current["results"].get(case)
+        if now is None:
+            print(f"{case:44} missing from current results")
+            continue
+        for metric, higher_is_better in METRICS.items():
+            if not base.get(metric) or metric not in now:
+                continue
+            change = (now[metric] - base[metric]) / base[metric]
+            worse = change < -threshold if higher_is_better else change > threshold
+            flag = "  REGRESSION" if worse else ""
+            print(f"{case:44} {metric:7} {base[metric]:10.2f} {now[metric]:10.2f} {change:+7.1%}{flag}")
+            if worse:
+                regressions.append(f"{case} {metric}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative change before flagging")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    if baseline.get("benchmark") != current.get("benchmark"):
+        sys.exit(f"Cannot compare {baseline.get('benchmark')} results with {current.get('benchmark')} results")
+
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print("\nNo regressions")
@@ -0,0 +1,108 @@
+"""
+Shared setup for the benchmarks: an isolated SQLite database, latency
+summaries, and JSON result files that benchmarks.compare can diff.
+
+configure() must run before anything from the app is imported, because the
+app reads its configuration from the environment at import time.
+"""
+import os
+import sys
+import json
+import math
+import platform
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+BASELINES_DIR = os.path.join(BACKEND_DIR, "benchmarks", "baselines")
+
+sys.path.insert(0, BACKEND_DIR)
+
+
+def configure(openai_base_url: str, **overrides) -> str:
+    """Points the app at a fresh SQLite database and the stub OpenAI server; returns the scratch directory."""
+    workdir = tempfile.mkdtemp(prefix="extractor-bench-")
+    env = {
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "SECRET_KEY": "benchmark-secret",
+        "OPENAI_API_KEY": "sk-benchmark",
+        "OPENAI_BASE_URL": openai_base_url,
+        "EXECUTOR_MODE": "thread",
+        "MAIL_SENDER_ENABLED": "false",
+        "API_CALL_LIMIT": "1000000000",
+        "FREE_TRIAL_LIMIT": "1000000000",
+        "UPLOAD_RATE_LIMIT": "1000000/second",
+        "RATE_LIMIT_STORAGE_URI": "memory://",
+    }
+    env.update({key: str(value) for key, value in overrides.items()})
+    os.environ.update(env)
+    return workdir
+
+
+def summarize(samples_ms: list[float], elapsed_seconds: float | None = None) -> dict:
+    """Latency percentiles in ms, plus throughput when the wall-clock time of the run is given."""
+    if not samples_ms:
+        return {"n": 0}
+    ordered = sorted(samples_ms)
+    n = len(ordered)
+
+    def percentile(p: float) -> float:
+        return round(ordered[max(0, math.ceil(p / 100 * n) - 1)], 3)  # nearest rank
+
+    summary = {
+        "n": n,
+        "mean_ms": round(sum(ordered) / n, 3),
+        "p50_ms": percentile(50),
+        "p90_ms": percentile(90),
+        "p99_ms": percentile(99),
+        "max_ms": round(ordered[-1], 3),
+    }
+    if elapsed_seconds:
+        summary["rps"] = round(n / elapsed_seconds, 2)
+    return summary
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(name: str, params: dict, results: dict, save_baseline: bool = False) -> str:
+    """Writes results/<name>-<timestamp>.json, and baselines/<name>.json when asked; returns the results path."""
+    now = datetime.now(timezone.utc)
+    document = {
+        "benchmark": name,
+        "created_at": now.isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": params,
+        "results": results,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{name}-{now:%Y%m%dT%H%M%S}.json")
+    targets = [path]
+    if save_baseline:
+        os.makedirs(BASELINES_DIR, exist_ok=True)
+        targets.append(os.path.join(BASELINES_DIR, f"{name}.json"))
+    for target in targets:
+        with open(target, "w") as f:
+            json.dump(document, f, indent=2)
+        print(f"Wrote {os.path.relpath(target, BACKEND_DIR)}")
+    return path
+
+
+def print_table(results: dict):
+    print(f"{'case':44} {'n':>6} {'p50 ms':>9} {'p99 ms':>9} {'rps':>9}")
+    for case, summary in results.items():
+        if not summary.get("n"):
+            print(f"{case:44} skipped: {summary.get('error', 'no samples')}")
+            continue
+        rps = summary.get("rps")
+        print(f"{case:44} {summary['n']:6} {summary['p50_ms']:9.2f} {summary['p99_ms']:9.2f} {rps if rps is not None else '':>9}")
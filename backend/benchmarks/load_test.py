@@ -0,0 +1,196 @@
+"""
+In-process load test of the full FastAPI app, against SQLite and the stub
+OpenAI server. Requests go through httpx's ASGI transport, so no ports,
+SMTP, Paddle or OpenAI are involved.
+
+Virtual users loop over a weighted mix of scenarios for --duration seconds:
+  signup  POST /api/signup, then GET /api/verify-email with the stored token
+  login   POST /api/login
+  upload  POST /api/upload-resume/ as an already verified user. --unique-ratio
+          of uploads carry unique content and go through parse and the LLM;
+          the rest repeat a known file and hit the result cache.
+
+The client shares the event loop with the app, so absolute numbers
+understate capacity. Compare runs on the same machine with the same
+parameters, not against production.
+
+Usage (from the backend directory):
+    python -m benchmarks.load_test --users 20 --duration 30 --mix signup=1,login=3,upload=6
+    python -m benchmarks.load_test --users 20 --duration 30 --save-baseline
+    python -m benchmarks.compare benchmarks/baselines/load_test.json benchmarks/results/load_test-<timestamp>.json
+"""
+import io
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from collections import defaultdict
+from benchmarks import harness
+from benchmarks.stub_openai import start_stub
+
+PASSWORD = "Benchmark1pass"
+RESUME_LINES = [
+    "Jane Doe - Senior Backend Engineer",
+    "Experience",
+    "Built FastAPI services on PostgreSQL, deployed with Docker and Kubernetes on AWS.",
+    "Led a team of five engineers; introduced code review and CI with Git.",
+    "Skills",
+    "Python, SQL, Docker, Kubernetes, AWS, Leadership",
+    "Education",
+    "BSc Computer Science",
+]
+
+
+def make_docx(unique: bool) -> bytes:
+    import docx
+
+    document = docx.Document()
+    for line in RESUME_LINES:
+        document.add_paragraph(line)
+    if unique:
+        document.add_paragraph(f"Reference {uuid.uuid4().hex}")
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+class LoadTest:
+    def __init__(self, client, unique_uploads: list[bytes], repeated_upload: bytes, unique_ratio: float):
+        self.client = client
+        self.unique_uploads = unique_uploads
+        self.repeated_upload = repeated_upload
+        self.unique_ratio = unique_ratio
+        self.samples = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.accounts = []  # (email, token) of verified users
+
+    async def request(self, name: str, method: str, url: str, expected: int = 200, **kwargs):
+        start = time.perf_counter()
+        response = await self.client.request(method, url, **kwargs)
+        self.samples[name].append((time.perf_counter() - start) * 1000)
+        self.statuses[name][response.status_code] += 1
+        return response if response.status_code == expected else None
+
+    async def signup(self) -> tuple[str, str] | None:
+        """Signs up and verifies a new user; returns (email, access token), or None if a step failed."""
+        import crud
+        from database import SessionLocal
+
+        email = f"bench-{uuid.uuid4().hex[:12]}@gmail.com"
+        if await self.request("POST /api/signup", "POST", "/api/signup", json={"email": email, "password": PASSWORD}) is None:
+            return None
+        db = SessionLocal()
+        try:
+            token = crud.get_user_by_email(db, email).verification_token  # stands in for the emailed link
+        finally:
+            db.close()
+        if await self.request("GET /api/verify-email", "GET", "/api/verify-email", params={"token": token}) is None:
+            return None
+        token = await self.login(email)
+        return (email, token) if token is not None else None
+
+    async def login(self, email: str) -> str | None:
+        response = await self.request("POST /api/login", "POST", "/api/login", data={"username": email, "password": PASSWORD})
+        return response.json()["access_token"] if response is not None else None
+
+    async def upload(self, token: str):
+        if self.unique_uploads and random.random() < self.unique_ratio:
+            content = self.unique_uploads.pop()
+        else:
+            content = self.repeated_upload
+        files = {"file": ("resume.docx", content, "application/vnd.openxmlformats-officedocument.wordprocessingml.document")}
+        await self.request("POST /api/upload-resume/", "POST", "/api/upload-resume/", files=files,
+                           headers={"Authorization": f"Bearer {token}"})
+
+    async def virtual_user(self, mix: dict, deadline: float):
+        scenarios, weights = zip(*mix.items())
+        while time.perf_counter() < deadline:
+            scenario = random.choices(scenarios, weights)[0]
+            if scenario == "signup":
+                account = await self.signup()
+                if account is not None:
+                    self.accounts.append(account)
+            elif scenario == "login":
+                await self.login(random.choice(self.accounts)[0])
+            else:
+                await self.upload(random.choice(self.accounts)[1])
+
+    def results(self, elapsed: float) -> dict:
+        results = {}
+        for name, samples in sorted(self.samples.items()):
+            results[name] = {**harness.summarize(samples, elapsed), "statuses": dict(self.statuses[name])}
+        all_samples = [sample for samples in self.samples.values() for sample in samples]
+        results["all"] = harness.summarize(all_samples, elapsed)
+        return results
+
+
+async def run(args) -> dict:
+    import httpx
+    import rate_limit
+    from main import app
+
+    # Auth routes allow a few requests per minute per IP, and every virtual user shares one address here
+    rate_limit.limiter.enabled = args.rate_limits
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            # More unique files than the run can use, generated up front so the client doesn't compete with the app
+            unique_uploads = [make_docx(unique=True) for _ in range(args.unique_pool)]
+            test = LoadTest(client, unique_uploads, make_docx(unique=False), args.unique_ratio)
+            # Verified accounts for the login and upload scenarios; not part of the measurement
+            test.accounts = [account for account in await asyncio.gather(*(test.signup() for _ in range(args.users))) if account]
+            if not test.accounts:
+                raise SystemExit("Could not create any benchmark users; check the app logs")
+            test.samples.clear()
+            test.statuses.clear()
+
+            start = time.perf_counter()
+            deadline = start + args.duration
+            await asyncio.gather(*(test.virtual_user(args.mix, deadline) for _ in range(args.users)))
+            return test.results(time.perf_counter() - start)
+    finally:
+        await app.router.shutdown()
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("signup", "login", "upload"):
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of measured load")
+    parser.add_argument("--mix", type=parse_mix, default="signup=1,login=3,upload=6")
+    parser.add_argument("--unique-ratio", type=float, default=0.5, help="share of uploads that miss the result cache")
+    parser.add_argument("--unique-pool", type=int, default=500, help="unique files generated up front; later uploads repeat")
+    parser.add_argument("--llm-latency-ms", type=float, default=300, help="stub OpenAI response time")
+    parser.add_argument("--llm-jitter-ms", type=float, default=100)
+    parser.add_argument("--executor-mode", choices=("thread", "process", "inline"), default="thread")
+    parser.add_argument("--rate-limits", action="store_true", help="keep the slowapi limits on auth routes")
+    parser.add_argument("--save-baseline", action="store_true", help="also write benchmarks/baselines/load_test.json")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    server, base_url = start_stub(args.llm_latency_ms, args.llm_jitter_ms)
+    harness.configure(base_url, EXECUTOR_MODE=args.executor_mode)
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        server.shutdown()
+
+    harness.print_table(results)
+    params = {key: value for key, value in vars(args).items() if key != "save_baseline"}
+    harness.write_results("load_test", params, results, args.save_baseline)
+
+
+if __name__ == "__main__":
+    main()
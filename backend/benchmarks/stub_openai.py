@@ -0,0 +1,92 @@
+"""
+A minimal OpenAI-compatible chat completions server for offline benchmarks.
+
+POST /v1/chat/completions waits --latency-ms (plus up to --jitter-ms) and
+replies with a well-formed completion. Requests that ask for a JSON
+response_format get a {"skills": [...], "feedback": "..."} object, and the
+skills are picked from the resume text. Other requests get plain feedback
+text. Token usage is estimated from the request size, so token counters
+move as they would against the real API.
+
+Usage (from the backend directory):
+    python -m benchmarks.stub_openai --port 8099 --latency-ms 800
+    OPENAI_BASE_URL=http://127.0.0.1:8099/v1 uvicorn main:app
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+KNOWN_SKILLS = ("Python", "FastAPI", "PostgreSQL", "Docker", "Kubernetes", "AWS", "SQL", "Git", "Leadership")
+FEEDBACK = "Quantify the impact of your recent projects and move the skills summary above your education."
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+    latency_ms = 0.0
+    jitter_ms = 0.0
+    error_rate = 0.0
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.path.endswith("/chat/completions"):
+            return self._reply(404, {"error": {"message": f"Unknown path {self.path}"}})
+        time.sleep((self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000)
+        if random.random() < self.error_rate:
+            return self._reply(500, {"error": {"message": "Injected failure", "type": "server_error"}})
+
+        request = json.loads(body)
+        text = " ".join(str(message.get("content", "")) for message in request.get("messages", []))
+        if request.get("response_format", {}).get("type") in ("json_object", "json_schema"):
+            skills = [skill for skill in KNOWN_SKILLS if skill.lower() in text.lower()] or ["Communication"]
+            content = json.dumps({"skills": skills, "feedback": FEEDBACK})
+        else:
+            content = FEEDBACK
+        prompt_tokens, completion_tokens = len(text) // 4, len(content) // 4
+        self._reply(200, {
+            "id": f"chatcmpl-stub-{random.getrandbits(32):08x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        })
+
+    def _reply(self, status: int, payload: dict):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0, port: int = 0):
+    """Serves the stub from a daemon thread; returns (server, base_url for OPENAI_BASE_URL)."""
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"latency_ms": latency_ms, "jitter_ms": jitter_ms, "error_rate": error_rate})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-openai", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=800)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0, help="share of requests answered with a 500")
+    args = parser.parse_args()
+
+    server, base_url = start_stub(args.latency_ms, args.jitter_ms, args.error_rate, args.port)
+    print(f"Stub OpenAI API on {base_url}; Ctrl+C to stop")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -1,98 +1,465 @@
-from datetime import datetime, timedelta
-import logging
-logger = logging.getLogger("crud")
-logging.basicConfig(level=logging.INFO)
-from sqlalchemy.orm import Session
-from models import User, Resume
-from schemas import UserCreate
-from utils.hashing import get_password_hash, verify_password
-
-
-
-# ---------- User CRUD ----------
-
-def get_user_by_email(db: Session, email: str):
-    user = db.query(User).filter(User.email == email).first()
-    return user
-
-def create_user(db: Session, email: str, hashed_password: str):
-    db_user = User(email=email, hashed_password=hashed_password)
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
-
-# ---------- Resume CRUD ----------
-
-def create_resume(db: Session, filename: str, skills: str, user_id: int):
-    resume = Resume(filename=filename, skills=skills, user_id=user_id)
-    db.add(resume)
-    db.commit()
-    db.refresh(resume)
-    return resume
-
-def get_resumes_by_user(db: Session, user_id: int):
-    return db.query(Resume).filter(Resume.user_id == user_id).all()
-
-
-def update_user_verification_token(db: Session, email: str, token: str):
-    user = db.query(User).filter(User.email == email).first()
-    if user:
-        user.verification_token = token
-        db.commit()
-        db.refresh(user)
-
-def update_user_password_reset_token(db: Session, email: str, token: str):
-    user = db.query(User).filter(User.email == email).first()
-    if user:
-        user.password_reset_token = token
-        db.commit()
-        db.refresh(user)
-
-def get_user_by_password_reset_token(db: Session, token: str):
-    return db.query(User).filter(User.password_reset_token == token).first()
-
-def get_user_by_token(db: Session, token: str):
-    return db.query(User).filter(User.verification_token == token).first()
-
-
-def reset_all_user_api_calls(db: Session):
-    """Resets the api_calls_this_month counter for all users to 0."""
-    try:
-        num_rows_updated = db.query(User).update({User.api_calls_this_month: 0})
-        db.commit()
-        logger.info(f"Successfully reset API call counts for {num_rows_updated} users.")
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Error resetting API call counts: {e}")
-
-def increment_api_calls(db: Session, user: User):
-    user.api_calls_this_month += 1
-    # Optionally increment free_trial_calls here if you want to track all API usage
-    db.commit()
-    db.refresh(user)
-
-def check_api_limit(user: User, limit: int = 1000) -> bool:
-    return user.api_calls_this_month < limit
-
-def reset_api_calls(db: Session, user: User):
-    user.api_calls_this_month = 0
-    user.last_api_reset = datetime.utcnow().isoformat()
-    db.commit()
-    db.refresh(user)
-
-def check_and_reset_api_usage(db: Session, user: User):
-    """Checks if a user's billing cycle has reset and updates their API count."""
-    if not user.subscription_start_date:
-        return # Do nothing if they've never subscribed
-
-    # Check if one month has passed since the last reset
-    # A simple approach is to check if it's a new month relative to their start day
-    now = datetime.utcnow()
-    # A more accurate way is to see if 30 days have passed, or use a dateutil library.
-    # For simplicity, let's use a 30-day window.
-    if user.last_api_reset and (now - datetime.fromisoformat(user.last_api_reset)) > timedelta(days=30):
-        user.api_calls_this_month = 0
-        user.last_api_reset = now.isoformat()
-        db.commit()
-        db.refresh(user)
\ No newline at end of file
+from datetime import datetime, timedelta
+import logging
+logger = logging.getLogger("crud")
+logging.basicConfig(level=logging.INFO)
+from sqlalchemy import select, func, or_, and_
+from sqlalchemy.orm import Session
+from models import User, Resume, AnalysisCache, AnalysisJob, Skill, ResumeSkill, UserSkillCount, EmailOutbox, PaddleEvent, SchedulerLease
+from utils.skill_taxonomy import canonical_name
+from schemas import UserCreate
+from utils.hashing import get_password_hash, verify_password
+
+
+
+# ---------- User CRUD ----------
+
+def get_user_by_email(db: Session, email: str):
+    user = db.query(User).filter(User.email == email).first()
+    return user
+
+def create_user(db: Session, email: str, hashed_password: str):
+    db_user = User(email=email, hashed_password=hashed_password)
+    db.add(db_user)
+    db.commit()
+    db.refresh(db_user)
+    return db_user
+
+# ---------- Resume CRUD ----------
+
+def create_resume(db: Session, filename: str, skills: str, user_id: int, feedback: str | None = None, prompt_version: str | None = None,
+                  text_hash: str | None = None, sections: str | None = None, parent_id: int | None = None, skill_names: list[str] | None = None):
+    """skill_names, when given, are also stored in the normalized skill tables in the same transaction."""
+    resume = Resume(filename=filename, skills=skills, feedback=feedback, user_id=user_id, prompt_version=prompt_version,
+                    text_hash=text_hash, sections=sections, parent_id=parent_id)
+    db.add(resume)
+    if skill_names:
+        db.flush()
+        add_resume_skills(db, resume.id, user_id, skill_names)
+    db.commit()
+    db.refresh(resume)
+    return resume
+
+RESUME_LIST_COLUMNS = (Resume.id, Resume.filename, Resume.skills, Resume.prompt_version, Resume.parent_id)
+
+def get_resumes_by_user(db: Session, user_id: int, limit: int | None = None, before_id: int | None = None, include_feedback: bool = False):
+    """
+    The user's resumes, newest first, as lightweight rows rather than full
+    objects. Feedback text is only loaded when include_feedback is set. Pages
+    with before_id (keyset pagination) are served by ix_resumes_user_id_id,
+    so their cost doesn't depend on how many resumes the user has.
+    """
+    columns = RESUME_LIST_COLUMNS + ((Resume.feedback,) if include_feedback else ())
+    query = db.query(*columns).filter(Resume.user_id == user_id)
+    if before_id is not None:
+        query = query.filter(Resume.id < before_id)
+    query = query.order_by(Resume.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+def get_resume(db: Session, resume_id: int, user_id: int):
+    return db.query(Resume).filter(Resume.id == resume_id, Resume.user_id == user_id).first()
+
+def get_diffable_resumes(db: Session, user_id: int, prompt_version: str, limit: int):
+    """The user's most recent resumes that carry a section index from the same prompt version."""
+    return (
+        db.query(Resume.id, Resume.text_hash, Resume.sections, Resume.feedback)
+        .filter(Resume.user_id == user_id, Resume.prompt_version == prompt_version, Resume.sections.isnot(None))
+        .order_by(Resume.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+def get_latest_resume_id_by_text_hash(db: Session, user_id: int, text_hash: str) -> int | None:
+    return (db.query(Resume.id)
+            .filter(Resume.user_id == user_id, Resume.text_hash == text_hash)
+            .order_by(Resume.id.desc())
+            .limit(1)
+            .scalar())
+
+
+def update_user_verification_token(db: Session, email: str, token: str):
+    user = db.query(User).filter(User.email == email).first()
+    if user:
+        user.verification_token = token
+        db.commit()
+        db.refresh(user)
+
+def update_user_password_reset_token(db: Session, email: str, token: str):
+    user = db.query(User).filter(User.email == email).first()
+    if user:
+        user.password_reset_token = token
+        db.commit()
+        db.refresh(user)
+
+def get_user_by_password_reset_token(db: Session, token: str):
+    return db.query(User).filter(User.password_reset_token == token).first()
+
+def get_user_by_token(db: Session, token: str):
+    return db.query(User).filter(User.verification_token == token).first()
+
+
+def reset_expired_api_calls(db: Session, after_id: int, cutoff: datetime, batch_size: int) -> tuple[int, int] | None:
+    """
+    Resets api_calls_this_month for users whose billing window started before cutoff, over the next
+    batch_size user ids after after_id. Returns (last id covered, users reset), or None past the last user.
+    """
+    chunk = select(User.id).where(User.id > after_id).order_by(User.id).limit(batch_size).subquery()
+    upper = db.execute(select(func.max(chunk.c.id))).scalar()
+    if upper is None:
+        return None
+    reset = (db.query(User)
+             .filter(User.id > after_id, User.id <= upper,
+                     User.last_api_reset.isnot(None), User.last_api_reset < cutoff.isoformat())
+             .update({User.api_calls_this_month: 0, User.last_api_reset: datetime.utcnow().isoformat()},
+                     synchronize_session=False))
+    db.commit()
+    return upper, reset
+
+
+# ---------- Analysis Job CRUD ----------
+
+def create_analysis_job(db: Session, job_id: str, user_id: int, priority: int, filename: str, kind: str, sha256: str, content: bytes, callback_url: str | None):
+    job = AnalysisJob(id=job_id, user_id=user_id, priority=priority, filename=filename, kind=kind,
+                      sha256=sha256, content=content, callback_url=callback_url)
+    db.add(job)
+    db.commit()
+    return job
+
+def get_analysis_job(db: Session, job_id: str, user_id: int):
+    return db.query(AnalysisJob).filter(AnalysisJob.id == job_id, AnalysisJob.user_id == user_id).first()
+
+def claim_next_analysis_job(db: Session):
+    """Marks the highest-priority queued job as running and returns it, or None if the queue is empty."""
+    while True:
+        job_id = (db.query(AnalysisJob.id)
+                  .filter(AnalysisJob.status == "queued")
+                  .order_by(AnalysisJob.priority.desc(), AnalysisJob.created_at)
+                  .limit(1)
+                  .scalar())
+        if job_id is None:
+            return None
+        # Conditional update so two workers (or processes) never claim the same job
+        claimed = (db.query(AnalysisJob)
+                   .filter(AnalysisJob.id == job_id, AnalysisJob.status == "queued")
+                   .update({AnalysisJob.status: "running", AnalysisJob.started_at: datetime.utcnow(),
+                            AnalysisJob.attempts: AnalysisJob.attempts + 1}, synchronize_session=False))
+        db.commit()
+        if claimed:
+            return db.query(AnalysisJob).filter(AnalysisJob.id == job_id).first()
+
+def requeue_stale_analysis_jobs(db: Session, stale_after: timedelta, max_attempts: int) -> tuple[int, list[AnalysisJob]]:
+    """
+    Puts jobs whose worker died mid-run (e.g. a process restart) back on the
+    queue. Jobs that have already used max_attempts are failed instead, so a
+    file that keeps crashing its worker doesn't loop forever. Returns the
+    number requeued and the jobs failed here.
+    """
+    stale = (AnalysisJob.status == "running", AnalysisJob.started_at < datetime.utcnow() - stale_after)
+    requeued = (db.query(AnalysisJob)
+                .filter(*stale, AnalysisJob.attempts < max_attempts)
+                .update({AnalysisJob.status: "queued"}, synchronize_session=False))
+    db.commit()
+    failed = []
+    for job in db.query(AnalysisJob).filter(*stale, AnalysisJob.attempts >= max_attempts).all():
+        # Conditional so only one process fails (and refunds) each job
+        claimed = (db.query(AnalysisJob)
+                   .filter(AnalysisJob.id == job.id, AnalysisJob.status == "running")
+                   .update({AnalysisJob.status: "failed"}, synchronize_session=False))
+        db.commit()
+        if claimed:
+            db.refresh(job)
+            finish_analysis_job(db, job, "failed", error="Failed to analyze resume.")
+            failed.append(job)
+    return requeued, failed
+
+def finish_analysis_job(db: Session, job: AnalysisJob, status: str, skills: str | None = None, feedback: str | None = None, error: str | None = None, resume_id: int | None = None):
+    job.status = status
+    job.skills = skills
+    job.feedback = feedback
+    job.error = error
+    job.resume_id = resume_id
+    if status in ("done", "failed"):
+        job.finished_at = datetime.utcnow()
+        job.content = None
+        if job.callback_url:
+            job.callback_status = "pending"
+            job.callback_next_attempt_at = job.finished_at
+    db.commit()
+
+def claim_due_callback(db: Session, retry_seconds: float):
+    """
+    Takes the oldest due callback and schedules its next attempt
+    (retry_seconds, doubling per attempt) before it is sent, so a worker that
+    dies mid-send leaves it to be retried rather than lost. Returns the job,
+    or None if no callback is due.
+    """
+    now = datetime.utcnow()
+    while True:
+        row = (db.query(AnalysisJob.id, AnalysisJob.callback_attempts)
+               .filter(AnalysisJob.callback_status == "pending", AnalysisJob.callback_next_attempt_at <= now)
+               .order_by(AnalysisJob.callback_next_attempt_at)
+               .limit(1)
+               .first())
+        if row is None:
+            return None
+        attempts = row.callback_attempts or 0
+        claimed = (db.query(AnalysisJob)
+                   .filter(AnalysisJob.id == row.id, AnalysisJob.callback_status == "pending",
+                           AnalysisJob.callback_next_attempt_at <= now)
+                   .update({AnalysisJob.callback_attempts: attempts + 1,
+                            AnalysisJob.callback_next_attempt_at: now + timedelta(seconds=retry_seconds * 2 ** attempts)},
+                           synchronize_session=False))
+        db.commit()
+        if claimed:
+            return db.query(AnalysisJob).filter(AnalysisJob.id == row.id).first()
+
+def finish_callback(db: Session, job: AnalysisJob, status: str):
+    job.callback_status = status
+    job.callback_next_attempt_at = None
+    db.commit()
+
+# ---------- Email Outbox CRUD ----------
+
+def enqueue_email(db: Session, to_address: str, template: str, subject: str, body: str):
+    email = EmailOutbox(to_address=to_address, template=template, subject=subject, body=body, next_attempt_at=datetime.utcnow())
+    db.add(email)
+    db.commit()
+    return email
+
+def claim_due_emails(db: Session, limit: int, claim_token: str, stale_after: timedelta):
+    """
+    Marks up to `limit` due emails as sending under claim_token and returns
+    them. Emails stuck in sending for longer than stale_after (sender died)
+    are claimable again.
+    """
+    now = datetime.utcnow()
+    due = (db.query(EmailOutbox.id)
+           .filter(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now)
+           .order_by(EmailOutbox.next_attempt_at)
+           .limit(limit)
+           .subquery())
+    stale = (db.query(EmailOutbox.id)
+             .filter(EmailOutbox.status == "sending", EmailOutbox.claimed_at < now - stale_after)
+             .limit(limit)
+             .subquery())
+    # Conditional on the status we selected, so concurrent senders never claim the same row
+    (db.query(EmailOutbox)
+     .filter(or_(and_(EmailOutbox.id.in_(select(due.c.id)), EmailOutbox.status == "pending"),
+                 and_(EmailOutbox.id.in_(select(stale.c.id)), EmailOutbox.status == "sending")))
+     .update({EmailOutbox.status: "sending", EmailOutbox.claim_token: claim_token, EmailOutbox.claimed_at: now,
+              EmailOutbox.attempts: EmailOutbox.attempts + 1}, synchronize_session=False))
+    db.commit()
+    return db.query(EmailOutbox).filter(EmailOutbox.claim_token == claim_token, EmailOutbox.status == "sending").all()
+
+def mark_email_sent(db: Session, email: EmailOutbox):
+    email.status = "sent"
+    email.sent_at = datetime.utcnow()
+    email.last_error = None
+    db.commit()
+
+def mark_email_failed(db: Session, email: EmailOutbox, error: str, retry_at: datetime | None):
+    """Schedules a retry at retry_at, or gives up on the email when retry_at is None."""
+    email.status = "pending" if retry_at else "failed"
+    email.next_attempt_at = retry_at or email.next_attempt_at
+    email.last_error = error
+    db.commit()
+
+# ---------- Analysis Cache CRUD ----------
+
+def get_cache_entry(db: Session, cache_key: str):
+    return db.query(AnalysisCache).filter(AnalysisCache.cache_key == cache_key).first()
+
+def upsert_cache_entry(db: Session, cache_key: str, skills: str, feedback: str, prompt_version: str | None = None,
+                       text_hash: str | None = None, sections: str | None = None):
+    now = datetime.utcnow()
+    entry = db.merge(AnalysisCache(cache_key=cache_key, skills=skills, feedback=feedback, prompt_version=prompt_version,
+                                   text_hash=text_hash, sections=sections, created_at=now, last_used_at=now))
+    db.commit()
+    return entry
+
+def touch_cache_entry(db: Session, entry: AnalysisCache):
+    entry.last_used_at = datetime.utcnow()
+    db.commit()
+
+def delete_cache_entry(db: Session, entry: AnalysisCache):
+    db.delete(entry)
+    db.commit()
+
+def prune_cache_entries(db: Session, max_age: timedelta, max_rows: int) -> int:
+    """Deletes expired cache rows, then the least recently used rows above max_rows."""
+    removed = db.query(AnalysisCache).filter(AnalysisCache.created_at < datetime.utcnow() - max_age).delete(synchronize_session=False)
+    overflow = db.query(AnalysisCache).count() - max_rows
+    if overflow > 0:
+        stale_keys = db.query(AnalysisCache.cache_key).order_by(AnalysisCache.last_used_at).limit(overflow)
+        removed += db.query(AnalysisCache).filter(AnalysisCache.cache_key.in_(stale_keys.scalar_subquery())).delete(synchronize_session=False)
+    db.commit()
+    return removed
+
+
+# ---------- Skill CRUD ----------
+
+def _insert(db: Session):
+    """The dialect's INSERT, which supports ON CONFLICT on PostgreSQL and SQLite."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+def normalize_skill(name: str) -> tuple[str, str]:
+    """Returns (display_name, normalized_name) for a skill as extracted or searched for."""
+    display = canonical_name(name)
+    return display, display.lower()
+
+def get_or_create_skills(db: Session, names: list[str]) -> dict[str, int]:
+    """Maps each normalized skill name to its id, inserting unknown skills. Safe under concurrent inserts."""
+    wanted = {}
+    for name in names:
+        display, normalized = normalize_skill(name)
+        if normalized:
+            wanted.setdefault(normalized, display)
+    if not wanted:
+        return {}
+    insert = _insert(db)
+    db.execute(
+        insert(Skill)
+        .values([{"name": display, "normalized_name": normalized} for normalized, display in wanted.items()])
+        .on_conflict_do_nothing(index_elements=["normalized_name"])
+    )
+    rows = db.execute(select(Skill.normalized_name, Skill.id).where(Skill.normalized_name.in_(wanted)))
+    return dict(rows.all())
+
+def add_resume_skills(db: Session, resume_id: int, user_id: int, names: list[str]):
+    """Links a resume to its skills and bumps the user's per-skill counts. The caller commits."""
+    skill_ids = list(get_or_create_skills(db, names).values())
+    if not skill_ids:
+        return
+    insert = _insert(db)
+    db.execute(
+        insert(ResumeSkill)
+        .values([{"resume_id": resume_id, "skill_id": skill_id, "user_id": user_id} for skill_id in skill_ids])
+        .on_conflict_do_nothing(index_elements=["resume_id", "skill_id"])
+    )
+    stmt = insert(UserSkillCount).values([{"user_id": user_id, "skill_id": skill_id, "resume_count": 1} for skill_id in skill_ids])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["user_id", "skill_id"],
+        set_={"resume_count": UserSkillCount.resume_count + 1},
+    ))
+
+def find_skill_ids(db: Session, names: list[str]) -> dict[str, int | None]:
+    """Looks up skills by name without creating them; unknown names map to None."""
+    normalized = [normalize_skill(name)[1] for name in names]
+    rows = dict(db.execute(select(Skill.normalized_name, Skill.id).where(Skill.normalized_name.in_(normalized))).all())
+    return {name: rows.get(key) for name, key in zip(names, normalized)}
+
+def search_resumes_by_skills(db: Session, user_id: int, skill_ids: list[int], limit: int, before_id: int | None = None):
+    """The user's resumes that have every skill in skill_ids, newest first, paged by resume id."""
+    matching = (
+        select(ResumeSkill.resume_id)
+        .where(ResumeSkill.user_id == user_id, ResumeSkill.skill_id.in_(skill_ids))
+        .group_by(ResumeSkill.resume_id)
+        .having(func.count() == len(set(skill_ids)))
+    )
+    if before_id is not None:
+        matching = matching.where(ResumeSkill.resume_id < before_id)
+    matching = matching.order_by(ResumeSkill.resume_id.desc()).limit(limit).subquery()
+    stmt = (
+        select(Resume.id, Resume.filename)
+        .join(matching, Resume.id == matching.c.resume_id)
+        .order_by(Resume.id.desc())
+    )
+    return db.execute(stmt).all()
+
+def get_user_skill_counts(db: Session, user_id: int, limit: int | None = None, skill_ids: list[int] | None = None):
+    """(skill name, resume count) pairs for the user from the aggregate table, most common first."""
+    stmt = (
+        select(Skill.name, UserSkillCount.resume_count)
+        .join(Skill, Skill.id == UserSkillCount.skill_id)
+        .where(UserSkillCount.user_id == user_id, UserSkillCount.resume_count > 0)
+        .order_by(UserSkillCount.resume_count.desc(), Skill.name)
+    )
+    if skill_ids is not None:
+        stmt = stmt.where(UserSkillCount.skill_id.in_(skill_ids))
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return db.execute(stmt).all()
+
+
+# ---------- Paddle Event CRUD ----------
+
+def insert_paddle_event(db: Session, event_id: str, event_type: str, occurred_at: datetime, user_id: int | None, payload: str) -> bool:
+    """Stores a webhook event once; returns False if this event id was already received."""
+    insert = _insert(db)
+    result = db.execute(
+        insert(PaddleEvent)
+        .values(event_id=event_id, event_type=event_type, occurred_at=occurred_at, user_id=user_id, payload=payload,
+                status="pending", attempts=0, received_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=["event_id"])
+    )
+    db.commit()
+    return result.rowcount == 1
+
+def get_pending_paddle_events(db: Session, limit: int, received_before: datetime):
+    """Pending events in the order they happened at Paddle, not the order they arrived."""
+    return (db.query(PaddleEvent)
+            .filter(PaddleEvent.status == "pending", PaddleEvent.received_at <= received_before)
+            .order_by(PaddleEvent.occurred_at, PaddleEvent.event_id)
+            .limit(limit)
+            .all())
+
+def claim_paddle_event(db: Session, event: PaddleEvent) -> bool:
+    claimed = (db.query(PaddleEvent)
+               .filter(PaddleEvent.event_id == event.event_id, PaddleEvent.status == "pending")
+               .update({PaddleEvent.status: "processing", PaddleEvent.attempts: PaddleEvent.attempts + 1,
+                        PaddleEvent.processed_at: datetime.utcnow()}, synchronize_session=False))
+    db.commit()
+    db.refresh(event)
+    return claimed == 1
+
+def finish_paddle_event(db: Session, event: PaddleEvent, status: str, error: str | None = None):
+    event.status = status
+    event.error = error
+    event.processed_at = datetime.utcnow()
+    db.commit()
+
+def requeue_paddle_events(db: Session, statuses: tuple[str, ...], since: datetime | None = None, event_type: str | None = None,
+                          user_id: int | None = None, stale_before: datetime | None = None) -> int:
+    """Marks matching events pending again, for replay or to recover events whose processor died."""
+    query = db.query(PaddleEvent).filter(PaddleEvent.status.in_(statuses))
+    if since is not None:
+        query = query.filter(PaddleEvent.occurred_at >= since)
+    if event_type is not None:
+        query = query.filter(PaddleEvent.event_type == event_type)
+    if user_id is not None:
+        query = query.filter(PaddleEvent.user_id == user_id)
+    if stale_before is not None:
+        query = query.filter(PaddleEvent.processed_at < stale_before)
+    requeued = query.update({PaddleEvent.status: "pending", PaddleEvent.error: None}, synchronize_session=False)
+    db.commit()
+    return requeued
+
+
+# ---------- Scheduler Lease CRUD ----------
+
+def acquire_lease(db: Session, name: str, holder: str, ttl: timedelta) -> SchedulerLease | None:
+    """Takes the named lease if it is free or expired (or already ours); returns it, or None if another worker holds it."""
+    now = datetime.utcnow()
+    insert = _insert(db)
+    db.execute(insert(SchedulerLease).values(name=name, expires_at=now).on_conflict_do_nothing(index_elements=["name"]))
+    acquired = (db.query(SchedulerLease)
+                .filter(SchedulerLease.name == name, or_(SchedulerLease.expires_at <= now, SchedulerLease.holder == holder))
+                .update({SchedulerLease.holder: holder, SchedulerLease.expires_at: now + ttl}, synchronize_session=False))
+    db.commit()
+    if not acquired:
+        return None
+    return db.query(SchedulerLease).filter(SchedulerLease.name == name).populate_existing().one()
+
+def renew_lease(db: Session, name: str, holder: str, ttl: timedelta, checkpoint: str | None) -> bool:
+    """Extends our lease and records progress; False means it expired and another worker took over."""
+    renewed = (db.query(SchedulerLease)
+               .filter(SchedulerLease.name == name, SchedulerLease.holder == holder)
+               .update({SchedulerLease.expires_at: datetime.utcnow() + ttl, SchedulerLease.checkpoint: checkpoint},
+                       synchronize_session=False))
+    db.commit()
+    return renewed == 1
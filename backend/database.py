@@ -1,23 +1,197 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.orm import Session
-from typing import Generator
-
-from dotenv import load_dotenv
-import os
-
-load_dotenv()  # this loads .env variables
-
-DATABASE_URL = os.getenv("DATABASE_URL")
-
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
-Base = declarative_base()
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+from typing import Generator
+import logging
+import time
+from utils import metrics
+
+from dotenv import load_dotenv
+import os
+
+load_dotenv()  # this loads .env variables
+
+logger = logging.getLogger("database")
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+# ---------- Pool configuration ----------
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # below typical managed-Postgres idle cutoffs
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))
+DB_ASYNC_ENABLED = os.getenv("DB_ASYNC_ENABLED", "false").lower() == "true"
+
+
+class PoolMetrics:
+    """Counters fed by pool events and by InstrumentedQueuePool's checkout wait timing; mirrored to /metrics."""
+
+    def __init__(self):
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds: float):
+        self.wait_seconds_total += seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+        metrics.DB_POOL_WAIT_SECONDS.observe(seconds)
+
+    def record_event(self, name: str):
+        setattr(self, name, getattr(self, name) + 1)
+        metrics.DB_POOL_EVENTS.labels(name).inc()
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_metrics.record_event("timeouts")
+            raise
+        finally:
+            pool_metrics.record_wait(time.perf_counter() - start)
+
+
+def _engine_options(url) -> dict:
+    if url.get_backend_name() == "sqlite":
+        # SQLite picks its own pool class; the connection is shared with worker threads
+        return {"connect_args": {"check_same_thread": False}}
+    options = {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    if url.get_backend_name() == "postgresql" and DB_STATEMENT_TIMEOUT_MS:
+        options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+
+_url = make_url(DATABASE_URL)
+engine = create_engine(_url, **_engine_options(_url))
+SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+Base = declarative_base()
+
+
+def _set_pool_gauges():
+    pool = engine.pool
+    if isinstance(pool, QueuePool):
+        metrics.DB_POOL_CONNECTIONS.labels("checked_out").set(pool.checkedout())
+        metrics.DB_POOL_CONNECTIONS.labels("checked_in").set(pool.checkedin())
+        metrics.DB_POOL_CONNECTIONS.labels("overflow").set(max(pool.overflow(), 0))
+
+@event.listens_for(engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    pool_metrics.record_event("connects")
+
+@event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_metrics.checkouts += 1
+    _set_pool_gauges()
+
+@event.listens_for(engine, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    pool_metrics.checkins += 1
+    _set_pool_gauges()
+
+@event.listens_for(engine, "before_cursor_execute")
+def _on_before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+@event.listens_for(engine, "after_cursor_execute")
+def _on_after_execute(conn, cursor, statement, parameters, context, executemany):
+    metrics.observe_stage("db", time.perf_counter() - conn.info["query_started"].pop())
+
+@event.listens_for(engine, "handle_error")
+def _on_error(context):
+    # after_cursor_execute doesn't run for a failed statement, so its start time is popped here
+    started = context.connection.info.get("query_started") if context.connection is not None else None
+    if started:
+        metrics.observe_stage("db", time.perf_counter() - started.pop())
+
+@event.listens_for(engine, "invalidate")
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    pool_metrics.record_event("invalidations")
+
+
+def pool_stats() -> dict:
+    pool = engine.pool
+    stats = {
+        "connects": pool_metrics.connects,
+        "checkouts": pool_metrics.checkouts,
+        "checkins": pool_metrics.checkins,
+        "invalidations": pool_metrics.invalidations,
+        "timeouts": pool_metrics.timeouts,
+        "wait_seconds_total": round(pool_metrics.wait_seconds_total, 3),
+        "wait_seconds_max": round(pool_metrics.wait_seconds_max, 3),
+    }
+    if isinstance(pool, QueuePool):
+        stats.update({"size": pool.size(), "checked_out": pool.checkedout(), "overflow": pool.overflow(), "checked_in": pool.checkedin()})
+    return stats
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# ---------- Optional async engine ----------
+
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+async_engine = None
+AsyncSessionLocal = None
+
+if DB_ASYNC_ENABLED:
+    try:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+        async_url = _url.set(drivername=ASYNC_DRIVERS[_url.get_backend_name()])
+        async_options = {}
+        if _url.get_backend_name() == "postgresql":
+            async_options = {
+                "pool_size": DB_POOL_SIZE,
+                "max_overflow": DB_MAX_OVERFLOW,
+                "pool_timeout": DB_POOL_TIMEOUT,
+                "pool_recycle": DB_POOL_RECYCLE,
+                "pool_pre_ping": DB_POOL_PRE_PING,
+            }
+            if DB_STATEMENT_TIMEOUT_MS:
+                async_options["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+        async_engine = create_async_engine(async_url, **async_options)
+        AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+        # Async queries count towards the same connect, invalidation and per-query "db" figures
+        for name, listener in (("connect", _on_connect), ("invalidate", _on_invalidate),
+                               ("before_cursor_execute", _on_before_execute), ("after_cursor_execute", _on_after_execute),
+                               ("handle_error", _on_error)):
+            event.listen(async_engine.sync_engine, name, listener)
+    except Exception as e:  # driver not installed or backend without an async driver
+        logger.warning(f"Async database engine disabled: {e}")
+
+
+async def get_async_db():
+    """Async counterpart of get_db for async routes; requires DB_ASYNC_ENABLED and asyncpg/aiosqlite."""
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async database engine is not enabled (set DB_ASYNC_ENABLED=true and install asyncpg or aiosqlite)")
+    async with AsyncSessionLocal() as db:
+        yield db
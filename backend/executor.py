@@ -0,0 +1,120 @@
+import os
+import time
+import asyncio
+import logging
+import multiprocessing
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from utils import metrics
+
+logger = logging.getLogger("executor")
+
+# "process" runs CPU-bound stages in a process pool, "thread" in a thread pool,
+# and "inline" on the event loop (useful for debugging).
+EXECUTOR_MODE = os.getenv("EXECUTOR_MODE", "process")
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 2)))
+PARSE_CONCURRENCY = int(os.getenv("PARSE_CONCURRENCY", str(PARSE_WORKERS)))
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+PARSE_MP_START_METHOD = os.getenv("PARSE_MP_START_METHOD", "spawn")
+
+
+class Stage:
+    """Concurrency limit plus queue-depth and latency counters for one pipeline stage."""
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self._semaphore = asyncio.Semaphore(limit)
+        self.queued = 0
+        self.running = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_seconds = 0.0
+        self.busy_seconds = 0.0
+
+    @asynccontextmanager
+    async def slot(self):
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        queued_gauge = metrics.STAGE_IN_FLIGHT.labels(self.name, "queued")
+        queued_gauge.inc()
+        start = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+            queued_gauge.dec()
+        started = time.perf_counter()
+        self.wait_seconds += started - start
+        metrics.STAGE_WAIT_SECONDS.labels(self.name).observe(started - start)
+        self.running += 1
+        running_gauge = metrics.STAGE_IN_FLIGHT.labels(self.name, "running")
+        running_gauge.inc()
+        try:
+            yield
+            self.completed += 1
+        except BaseException:
+            self.failed += 1
+            raise
+        finally:
+            self.running -= 1
+            running_gauge.dec()
+            self.busy_seconds += time.perf_counter() - started
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "queued": self.queued,
+            "running": self.running,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+            "failed": self.failed,
+            "wait_seconds": round(self.wait_seconds, 3),
+            "busy_seconds": round(self.busy_seconds, 3),
+        }
+
+
+parse_stage = Stage("parse", PARSE_CONCURRENCY)
+llm_stage = Stage("llm", LLM_CONCURRENCY)
+
+_parse_pool = None
+
+
+def _get_parse_pool():
+    global _parse_pool
+    if _parse_pool is None:
+        if EXECUTOR_MODE == "process":
+            context = multiprocessing.get_context(PARSE_MP_START_METHOD)
+            _parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=context)
+        else:
+            _parse_pool = ThreadPoolExecutor(max_workers=PARSE_WORKERS, thread_name_prefix="parse")
+    return _parse_pool
+
+
+async def run_parse(fn, *args):
+    """Runs a CPU-bound parsing/OCR function off the event loop. fn must be picklable in process mode."""
+    async with parse_stage.slot():
+        if EXECUTOR_MODE == "inline":
+            return fn(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_parse_pool(), partial(fn, *args))
+
+
+async def run_llm(coro_fn, *args):
+    """Awaits an async LLM call while holding a slot of the LLM stage."""
+    async with llm_stage.slot():
+        return await coro_fn(*args)
+
+
+def shutdown():
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+
+
+def stats() -> dict:
+    return {"mode": EXECUTOR_MODE, "parse": parse_stage.stats(), "llm": llm_stage.stats()}
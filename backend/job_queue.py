@@ -0,0 +1,250 @@
+import os
+import json
+import time
+import hmac
+import socket
+import hashlib
+import asyncio
+import logging
+import ipaddress
+from datetime import timedelta
+from urllib.parse import urlparse
+import httpx
+from fastapi import HTTPException
+import crud
+import quota
+from database import SessionLocal
+from resume_pipeline import analyze_upload, store_result
+from utils.file_reader import IngestedUpload
+
+logger = logging.getLogger("job_queue")
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL_SECONDS = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "2"))
+JOB_STALE_AFTER_SECONDS = int(os.getenv("JOB_STALE_AFTER_SECONDS", "600"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_CALLBACK_SECRET = os.getenv("JOB_CALLBACK_SECRET")  # callbacks are disabled when unset
+CALLBACK_ATTEMPTS = int(os.getenv("CALLBACK_ATTEMPTS", "5"))
+CALLBACK_RETRY_SECONDS = float(os.getenv("CALLBACK_RETRY_SECONDS", "30"))  # doubles after each failed attempt
+
+ACTIVE_SUBSCRIBER_PRIORITY = 10
+DEFAULT_PRIORITY = 0
+
+
+def sign_callback(timestamp: str, body: bytes) -> str:
+    """HMAC-SHA256 over "<timestamp>.<body>", so receivers can verify and reject replays."""
+    return hmac.new(JOB_CALLBACK_SECRET.encode("utf-8"), f"{timestamp}.".encode("utf-8") + body, hashlib.sha256).hexdigest()
+
+
+async def check_callback_url(url: str) -> str:
+    """
+    Raises ValueError unless url is http(s) and every address its host
+    resolves to is public, so callbacks can't be aimed at loopback, private
+    networks or cloud metadata endpoints. Returns the first checked address,
+    which the sender connects to instead of resolving the host again.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise ValueError("callback_url must be an http(s) URL")
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    try:
+        addresses = await asyncio.get_running_loop().getaddrinfo(parsed.hostname, port, type=socket.SOCK_STREAM)
+    except socket.gaierror:
+        raise ValueError("callback_url host could not be resolved")
+    for *_, sockaddr in addresses:
+        ip = ipaddress.ip_address(sockaddr[0].split("%")[0])
+        if ip.version == 6 and ip.ipv4_mapped:
+            ip = ip.ipv4_mapped
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError("callback_url must point to a public address")
+    return addresses[0][4][0].split("%")[0]
+
+
+def pin_to_address(url: str, address: str) -> tuple[str, dict, dict]:
+    """
+    Rewrites url to connect to a checked address, returning (url, headers,
+    extensions). The Host header and the TLS server name (which the
+    certificate is verified against) keep the original host, so a DNS answer
+    that changes after the check can't redirect the request.
+    """
+    parsed = urlparse(url)
+    userinfo, _, hostport = parsed.netloc.rpartition("@")
+    netloc = (f"{userinfo}@" if userinfo else "") + (f"[{address}]" if ":" in address else address)
+    if parsed.port:
+        netloc += f":{parsed.port}"
+    extensions = {"sni_hostname": parsed.hostname} if parsed.scheme == "https" else {}
+    return parsed._replace(netloc=netloc).geturl(), {"Host": hostport}, extensions
+
+
+class JobQueue:
+    """
+    Database-backed queue of resume analyses, drained by a few asyncio workers
+    in each process. Queued and running jobs live in analysis_jobs, so they
+    survive restarts: a job left "running" by a dead worker is requeued after
+    JOB_STALE_AFTER_SECONDS. Callbacks are delivered by a separate task, and
+    failed deliveries are rescheduled in the table rather than slept on.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS):
+        self.workers = workers
+        self._tasks = []
+        self._wakeup = None
+        self._callback_wakeup = None
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._callback_wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._requeue_stale()))
+        self._tasks.append(asyncio.create_task(self._deliver_callbacks()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """Wakes idle workers after a submit instead of waiting for the next poll."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _worker(self, index: int):
+        while True:
+            try:
+                processed = await self._run_next()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker {index} error: {e}")
+                processed = False
+            if not processed:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=JOB_POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _requeue_stale(self):
+        while True:
+            await asyncio.sleep(JOB_STALE_AFTER_SECONDS / 2)
+            db = SessionLocal()
+            try:
+                requeued, failed = crud.requeue_stale_analysis_jobs(db, timedelta(seconds=JOB_STALE_AFTER_SECONDS), JOB_MAX_ATTEMPTS)
+                if requeued:
+                    logger.warning(f"Requeued {requeued} stale analysis jobs")
+                    self.notify()
+                for job in failed:
+                    logger.error(f"Analysis job {job.id} failed: its worker died on all {job.attempts} attempts")
+                    quota.refund(db, job.user_id, 1)
+                if any(job.callback_url for job in failed):
+                    self._callback_wakeup.set()
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Failed to requeue stale jobs: {e}")
+            finally:
+                db.close()
+
+    async def _run_next(self) -> bool:
+        db = SessionLocal()
+        try:
+            job = crud.claim_next_analysis_job(db)
+            if job is None:
+                return False
+            upload = IngestedUpload(filename=job.filename, content=job.content, sha256=job.sha256, kind=job.kind)
+            try:
+                analysis = await analyze_upload(db, upload, job.user_id)
+            except HTTPException as e:
+                crud.finish_analysis_job(db, job, "failed", error=e.detail)
+                quota.refund(db, job.user_id, 1)
+            except Exception as e:
+                db.rollback()  # the failure may have left the session unusable for recording it
+                logger.error(f"Analysis job {job.id} failed on attempt {job.attempts}: {e}")
+                if job.attempts < JOB_MAX_ATTEMPTS:
+                    crud.finish_analysis_job(db, job, "queued", error=str(e))
+                else:
+                    crud.finish_analysis_job(db, job, "failed", error="Failed to analyze resume.")
+                    quota.refund(db, job.user_id, 1)
+            else:
+                resume = store_result(db, job.filename, job.user_id, analysis)
+                crud.finish_analysis_job(db, job, "done", skills=json.dumps(analysis.skills), feedback=analysis.feedback, resume_id=resume.id)
+                if not analysis.ok:
+                    quota.refund(db, job.user_id, 1)
+            if job.callback_status == "pending":
+                self._callback_wakeup.set()
+            return True
+        finally:
+            db.close()
+
+    async def _deliver_callbacks(self):
+        async with httpx.AsyncClient(timeout=10) as client:
+            while True:
+                try:
+                    sent = await self._send_next_callback(client)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Callback delivery error: {e}")
+                    sent = False
+                if not sent:
+                    self._callback_wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._callback_wakeup.wait(), timeout=JOB_POLL_INTERVAL_SECONDS)
+                    except asyncio.TimeoutError:
+                        pass
+
+    async def _send_next_callback(self, client: httpx.AsyncClient) -> bool:
+        """Makes one delivery attempt for the oldest due callback; returns False if none was due."""
+        db = SessionLocal()
+        try:
+            job = crud.claim_due_callback(db, CALLBACK_RETRY_SECONDS)
+            if job is None:
+                return False
+            if job.callback_attempts > CALLBACK_ATTEMPTS:  # the last attempt's sender died mid-send
+                crud.finish_callback(db, job, "failed")
+                return True
+            body = json.dumps(job_payload(job)).encode("utf-8")
+            timestamp = str(int(time.time()))
+            headers = {
+                "Content-Type": "application/json",
+                "X-Job-Timestamp": timestamp,
+                "X-Job-Signature": f"sha256={sign_callback(timestamp, body)}",
+            }
+            try:
+                # Checked again at send time, in case the host now resolves somewhere private, and
+                # the connection goes to the address that passed rather than a fresh lookup
+                address = await check_callback_url(job.callback_url)
+                url, host_header, extensions = pin_to_address(job.callback_url, address)
+                response = await client.post(url, content=body, headers={**headers, **host_header}, extensions=extensions)
+                if response.status_code < 500:
+                    crud.finish_callback(db, job, "sent")
+                    return True
+                logger.warning(f"Callback for job {job.id} got HTTP {response.status_code} (attempt {job.callback_attempts})")
+            except ValueError as e:
+                logger.error(f"Refusing callback for job {job.id} to {job.callback_url}: {e}")
+                crud.finish_callback(db, job, "failed")
+                return True
+            except httpx.RequestError as e:
+                logger.warning(f"Callback for job {job.id} failed (attempt {job.callback_attempts}): {e}")
+            if job.callback_attempts >= CALLBACK_ATTEMPTS:
+                logger.error(f"Giving up on callback for job {job.id} to {job.callback_url}")
+                crud.finish_callback(db, job, "failed")
+            return True
+        finally:
+            db.close()
+
+
+def job_payload(job) -> dict:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "filename": job.filename,
+        "skills": json.loads(job.skills) if job.skills else None,
+        "feedback": job.feedback,
+        "error": job.error if job.status == "failed" else None,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+job_queue = JobQueue()
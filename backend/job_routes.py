@@ -0,0 +1,58 @@
+from uuid import uuid4
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
+from sqlalchemy.orm import Session
+from auth import get_current_user
+from database import get_db
+from crud import create_analysis_job, get_analysis_job
+import quota
+import rate_limit
+from job_queue import job_queue, job_payload, check_callback_url, ACTIVE_SUBSCRIBER_PRIORITY, DEFAULT_PRIORITY, JOB_CALLBACK_SECRET
+from utils.file_reader import ingest_upload
+from schemas import JobResponse, ErrorResponse
+
+router = APIRouter()
+
+@router.post("/jobs", response_model=JobResponse, status_code=202, responses={400: {"model": ErrorResponse}, 402: {"model": ErrorResponse}, 403: {"model": ErrorResponse}, 413: {"model": ErrorResponse}, 415: {"model": ErrorResponse}, 429: {"model": ErrorResponse}}, tags=["Jobs"])
+async def submit_job(
+    file: UploadFile = File(...),
+    callback_url: str | None = Form(None),
+    user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Queues a resume for analysis and returns a job id immediately. Poll
+    GET /api/jobs/{job_id}, or pass callback_url to receive the result as a
+    signed POST when the job finishes.
+    """
+    if not user.is_verified:
+        raise HTTPException(status_code=403, detail="Email not verified. Please verify your email to use this service.")
+    if callback_url and not JOB_CALLBACK_SECRET:
+        raise HTTPException(status_code=400, detail="Callbacks are not enabled on this server")
+    if callback_url:
+        try:
+            await check_callback_url(callback_url)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    upload = await ingest_upload(file)
+    rate_limit.charge_upload(user.id, rate_limit.upload_cost([upload.kind]))
+
+    quota.consume(db, user, 1)
+
+    priority = ACTIVE_SUBSCRIBER_PRIORITY if user.subscription_status == "active" else DEFAULT_PRIORITY
+    try:
+        job = create_analysis_job(db, job_id=uuid4().hex, user_id=user.id, priority=priority, filename=upload.filename,
+                                  kind=upload.kind, sha256=upload.sha256, content=upload.content, callback_url=callback_url)
+    except Exception:
+        db.rollback()
+        quota.refund(db, user.id, 1)  # the job was never queued
+        raise
+    job_queue.notify()
+    return JobResponse(**job_payload(job))
+
+@router.get("/jobs/{job_id}", response_model=JobResponse, responses={404: {"model": ErrorResponse}}, tags=["Jobs"])
+def get_job(job_id: str, user=Depends(get_current_user), db: Session = Depends(get_db)):
+    job = get_analysis_job(db, job_id, user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobResponse(**job_payload(job))
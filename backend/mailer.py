@@ -0,0 +1,133 @@
+"""
+Outbound email through a persistent outbox.
+
+Routes render a template and insert an email_outbox row, which is a single
+local write. A background sender thread claims due rows in batches and sends
+them over one reused SMTP connection. Failed sends are retried with
+exponential backoff. Because the outbox lives in the database, a restart
+loses nothing, and several app processes can share it.
+"""
+import os
+import uuid
+import random
+import smtplib
+import logging
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+import crud
+from database import SessionLocal
+from utils.email_utils import SMTPConnection, render_email, build_message, verification_link, password_reset_link
+
+logger = logging.getLogger("mailer")
+
+MAIL_SENDER_ENABLED = os.getenv("MAIL_SENDER_ENABLED", "true").lower() == "true"
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", "20"))
+MAIL_POLL_INTERVAL_SECONDS = float(os.getenv("MAIL_POLL_INTERVAL_SECONDS", "5"))
+MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", "6"))
+MAIL_RETRY_BASE_SECONDS = float(os.getenv("MAIL_RETRY_BASE_SECONDS", "30"))
+MAIL_RETRY_MAX_SECONDS = float(os.getenv("MAIL_RETRY_MAX_SECONDS", "3600"))
+MAIL_CLAIM_TIMEOUT = timedelta(minutes=10)  # a "sending" row older than this belonged to a dead sender
+
+# Rejections of this message or its recipients. Only their 5xx replies are final; 4xx replies are temporary
+REJECTION_ERRORS = (smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+def is_permanent(error: Exception) -> bool:
+    """True when the server rejected the message or every recipient with a 5xx reply, so retrying won't help."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return bool(codes) and all(500 <= code < 600 for code in codes)
+    if isinstance(error, REJECTION_ERRORS):
+        return 500 <= error.smtp_code < 600
+    return False
+
+
+class Mailer:
+    def __init__(self):
+        self.connection = SMTPConnection()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.counters = {"queued": 0, "sent": 0, "retried": 0, "failed": 0}
+
+    def enqueue(self, db: Session, to_address: str, template: str, **params):
+        subject, body = render_email(template, **params)
+        crud.enqueue_email(db, to_address, template, subject, body)
+        self.counters["queued"] += 1
+        self._wake.set()
+
+    def send_batch(self) -> int:
+        """Claims and sends one batch of due emails; returns how many were claimed."""
+        db = SessionLocal()
+        try:
+            emails = crud.claim_due_emails(db, MAIL_BATCH_SIZE, uuid.uuid4().hex, MAIL_CLAIM_TIMEOUT)
+            for email in emails:
+                try:
+                    self.connection.send(build_message(email.to_address, email.subject, email.body))
+                except Exception as e:
+                    self.connection.close()
+                    self._record_failure(db, email, e)
+                else:
+                    crud.mark_email_sent(db, email)
+                    self.counters["sent"] += 1
+            return len(emails)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Mail sender batch failed: {e}")
+            return 0
+        finally:
+            db.close()
+
+    def _record_failure(self, db: Session, email, error: Exception):
+        if not isinstance(error, smtplib.SMTPException):
+            # Not a delivery verdict but a bug on our side; retried like a transient failure
+            logger.error(f"Unexpected error sending email {email.id} ({email.template})", exc_info=error)
+        if is_permanent(error) or email.attempts >= MAIL_MAX_ATTEMPTS:
+            logger.error(f"Giving up on email {email.id} ({email.template}) after {email.attempts} attempts: {error}")
+            crud.mark_email_failed(db, email, str(error), None)
+            self.counters["failed"] += 1
+            return
+        delay = min(MAIL_RETRY_BASE_SECONDS * 2 ** (email.attempts - 1), MAIL_RETRY_MAX_SECONDS)
+        delay *= random.uniform(0.5, 1.0)  # jitter, so a recovering SMTP server isn't hit all at once
+        logger.warning(f"Email {email.id} failed on attempt {email.attempts}, retrying in {delay:.0f}s: {error}")
+        crud.mark_email_failed(db, email, str(error), datetime.utcnow() + timedelta(seconds=delay))
+        self.counters["retried"] += 1
+
+    def start(self):
+        if MAIL_SENDER_ENABLED and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="mail-sender", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                # A full batch means more are probably due, so go again straight away
+                if self.send_batch() < MAIL_BATCH_SIZE:
+                    self._wake.wait(MAIL_POLL_INTERVAL_SECONDS)
+                    self._wake.clear()
+        finally:
+            self.connection.close()
+
+    def stats(self) -> dict:
+        return {**self.counters, "smtp_connects": self.connection.connects, "running": self._thread is not None}
+
+
+mailer = Mailer()
+
+
+def send_verification_email(db: Session, email: str, token: str):
+    """Queues the verification email; the background sender delivers it."""
+    mailer.enqueue(db, email, "verify_email", link=verification_link(token))
+
+
+def send_password_reset_email(db: Session, email: str, token: str):
+    """Queues the password reset email; the background sender delivers it."""
+    mailer.enqueue(db, email, "password_reset", link=password_reset_link(token))
@@ -1,65 +1,137 @@
-from fastapi import FastAPI, Request
-from fastapi.middleware.cors import CORSMiddleware
-from slowapi import _rate_limit_exceeded_handler
-from rate_limit import limiter
-from slowapi.errors import RateLimitExceeded
-from apscheduler.schedulers.background import BackgroundScheduler
-from database import SessionLocal
-import crud
-
-from user_routes import router as user_router
-from resume_routes import router as resume_router
-from paddle_routes import router as paddle_router
-import create_tables
-import uvicorn
-
-
-app = FastAPI()
-
-# 2. Add the middleware and exception handler
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-
-# --- Monthly Reset Scheduler ---
-def monthly_api_reset():
-    """Function to be called by the scheduler."""
-    db = SessionLocal()
-    try:
-        crud.reset_all_user_api_calls(db)
-    finally:
-        db.close()
-
-scheduler = BackgroundScheduler()
-scheduler.add_job(monthly_api_reset, 'cron', day=1, hour=0) # Runs at midnight on the 1st of every month
-
-@app.on_event("startup")
-def startup_event():
-    scheduler.start()
-# --- End of Scheduler Setup ---
-
-
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[
-        "http://localhost:3000",  # Local development
-        "https://skills-five-nu.vercel.app",  # Deployed frontend URL
-        "https://skills-h2qytuj01-mohameds-projects-18c8d61d.vercel.app"  # Another deployed frontend URL (if applicable)
-    ],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-create_tables.create_tables()  # Creates tables on startup (optional)
-
-app.include_router(user_router, prefix="/api")
-app.include_router(resume_router, prefix="/api")
-app.include_router(paddle_router, prefix="/api")
-
-@app.get("/")
-def read_root():
-    return {"message": "Backend API is running"}
-
-if __name__ == "__main__":
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from fastapi.middleware.cors import CORSMiddleware
+from slowapi import _rate_limit_exceeded_handler
+from rate_limit import limiter
+from slowapi.errors import RateLimitExceeded
+from database import pool_stats, async_engine
+import executor
+import quota
+import auth
+from result_cache import result_cache
+from utils.llm_gateway import gateway as llm_gateway
+from utils.text_compactor import compaction_stats
+from utils.ocr import ocr_stats
+from utils import metrics
+from utils.file_reader import MAX_UPLOAD_BYTES
+import os
+
+from user_routes import router as user_router
+from resume_routes import router as resume_router, MAX_BATCH_BYTES
+from paddle_routes import router as paddle_router
+from job_routes import router as job_router
+from skill_routes import router as skill_router
+from job_queue import job_queue
+from mailer import mailer
+from scheduler import scheduler
+from paddle_client import paddle
+from paddle_events import processor as paddle_event_processor
+import create_tables
+import uvicorn
+import logging
+
+# Set LOG_LEVEL=DEBUG to also get a sampled per-stage timing line for DEBUG_LOG_SAMPLE_RATE of requests
+logging.getLogger().setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+# These log whole requests, prompts included, at DEBUG
+for noisy in ("openai", "httpx", "httpcore"):
+    logging.getLogger(noisy).setLevel(logging.WARNING)
+
+
+app = FastAPI()
+
+# 2. Add the middleware and exception handler
+app.state.limiter = limiter
+app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+# Reject oversized bodies from their Content-Length before Starlette spools the multipart form
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_BYTES", str(MAX_UPLOAD_BYTES + 1024 * 1024)))
+MAX_BATCH_REQUEST_BYTES = MAX_BATCH_BYTES + 1024 * 1024
+
+@app.middleware("http")
+async def limit_request_size(request: Request, call_next):
+    content_length = request.headers.get("content-length")
+    max_bytes = MAX_BATCH_REQUEST_BYTES if request.url.path.endswith("/upload-resumes/batch") else MAX_REQUEST_BYTES
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        return JSONResponse(status_code=413, content={"detail": "Request body too large."})
+    return await call_next(request)
+
+# Registered last so it runs first and its timing covers the whole request
+app.middleware("http")(metrics.instrument_request)
+
+# --- Scheduler Setup ---
+@app.on_event("startup")
+def startup_event():
+    metrics.setup_tracing()
+    scheduler.start()
+    quota.start()
+    mailer.start()
+    paddle_event_processor.start()
+
+@app.on_event("startup")
+async def start_job_workers():
+    job_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await job_queue.stop()
+    await paddle.aclose()
+    quota.stop()
+    mailer.stop()
+    paddle_event_processor.stop()
+    scheduler.shutdown(wait=False)
+    executor.shutdown()
+    if async_engine is not None:
+        await async_engine.dispose()
+    metrics.shutdown()
+# --- End of Scheduler Setup ---
+
+
+# Add CORS middleware
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=[
+        "http://localhost:3000",  # Local development
+        "https://skills-five-nu.vercel.app",  # Deployed frontend URL
+        "https://skills-h2qytuj01-mohameds-projects-18c8d61d.vercel.app"  # Another deployed frontend URL (if applicable)
+    ],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+create_tables.create_tables()  # Creates tables on startup (optional)
+
+app.include_router(user_router, prefix="/api")
+app.include_router(resume_router, prefix="/api")
+app.include_router(paddle_router, prefix="/api")
+app.include_router(job_router, prefix="/api")
+app.include_router(skill_router, prefix="/api")
+
+@app.get("/")
+def read_root():
+    return {"message": "Backend API is running"}
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    """Prometheus scrape endpoint."""
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/stats", include_in_schema=False)
+def read_stats():
+    """Internal counters: pipeline stage queue depth, cache hit rates and DB pool usage."""
+    return {
+        "executor": executor.stats(),
+        "result_cache": result_cache.stats(),
+        "principal_cache": auth.principal_cache.stats(),
+        "db_pool": pool_stats(),
+        "llm": llm_gateway.stats(),
+        "prompt_compaction": compaction_stats.stats(),
+        "ocr": ocr_stats.stats(),  # this process only; with EXECUTOR_MODE=process each parse worker keeps its own
+        "mail": mailer.stats(),
+        "paddle_events": paddle_event_processor.stats(),
+        "paddle_api": paddle.stats(),
+    }
+
+if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
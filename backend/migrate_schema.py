@@ -0,0 +1,58 @@
+"""
+Adds the columns and indexes the models define but an existing database lacks.
+
+create_tables.py (Base.metadata.create_all) only creates missing tables; it
+never changes a table that already exists, so columns such as
+users.subscription_event_at or resumes.text_hash and indexes such as
+ix_resumes_user_id_id have to be added here. Every statement checks first,
+so the script can be re-run safely. Run it before starting a new release:
+
+    python migrate_schema.py [--dry-run]
+"""
+import argparse
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
+from database import engine, Base
+import models  # Ensure all models are imported so they are registered
+
+
+def pending_statements() -> list[str]:
+    """ALTER TABLE / CREATE INDEX statements for the tables that already exist."""
+    inspector = inspect(engine)
+    # SQLite has no ADD COLUMN IF NOT EXISTS; the inspector check covers it there
+    if_not_exists = "IF NOT EXISTS " if engine.dialect.name == "postgresql" else ""
+    columns, indexes = [], []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue  # created, with its indexes, by create_all
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            ddl = f"{column.name} {column.type.compile(dialect=engine.dialect)}"
+            for foreign_key in column.foreign_keys:
+                ddl += f" REFERENCES {foreign_key.column.table.name} ({foreign_key.column.name})"
+            columns.append(f"ALTER TABLE {table.name} ADD COLUMN {if_not_exists}{ddl}")
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                indexes.append(str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect)))
+    return columns + indexes  # indexes may cover the new columns
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="print the statements without running them")
+    args = parser.parse_args()
+
+    statements = pending_statements()
+    if args.dry_run:
+        for statement in statements:
+            print(f"{statement};")
+    else:
+        with engine.begin() as conn:
+            for statement in statements:
+                print(statement)
+                conn.execute(text(statement))
+        Base.metadata.create_all(bind=engine)
+        print(f"Schema up to date ({len(statements)} statements applied)")
@@ -0,0 +1,65 @@
+"""
+Creates the normalized skill tables and backfills them from Resume.skills.
+
+Resumes that already have resume_skills rows are skipped, so the script can
+be re-run safely or resumed after an interruption. The per-user counts are
+rebuilt from resume_skills at the end.
+
+    python migrate_skills.py [--batch-size 500]
+"""
+import argparse
+from sqlalchemy import select, delete, insert, func, exists
+from database import engine, Base, SessionLocal
+import models  # Ensure all models are imported so they are registered
+from models import Resume, ResumeSkill, UserSkillCount
+import crud
+
+
+def backfill_resume_skills(batch_size: int) -> int:
+    """Links every unlinked resume to its skills, in id order, committing once per batch."""
+    migrated = 0
+    last_id = 0
+    db = SessionLocal()
+    try:
+        while True:
+            rows = db.execute(
+                select(Resume.id, Resume.user_id, Resume.skills)
+                .where(Resume.id > last_id, ~exists().where(ResumeSkill.resume_id == Resume.id))
+                .order_by(Resume.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            for row in rows:
+                names = [name.strip() for name in (row.skills or "").split(",") if name.strip()]
+                if names and row.user_id is not None:
+                    crud.add_resume_skills(db, row.id, row.user_id, names)
+            # add_resume_skills also bumps the counts; they're rebuilt from scratch below
+            db.commit()
+            migrated += len(rows)
+            last_id = rows[-1].id
+            print(f"Backfilled {migrated} resumes (up to id {last_id})")
+    finally:
+        db.close()
+    return migrated
+
+
+def rebuild_skill_counts():
+    """Recomputes user_skill_counts from resume_skills in one statement."""
+    with engine.begin() as conn:
+        conn.execute(delete(UserSkillCount))
+        conn.execute(insert(UserSkillCount).from_select(
+            ["user_id", "skill_id", "resume_count"],
+            select(ResumeSkill.user_id, ResumeSkill.skill_id, func.count()).group_by(ResumeSkill.user_id, ResumeSkill.skill_id),
+        ))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine, tables=[models.Skill.__table__, ResumeSkill.__table__, UserSkillCount.__table__])
+    count = backfill_resume_skills(args.batch_size)
+    rebuild_skill_counts()
+    print(f"Skill tables migrated ({count} resumes backfilled)")
@@ -1,32 +1,157 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, Boolean, DateTime
-from sqlalchemy.orm import relationship
-from database import Base
-
-class User(Base):
-    __tablename__ = "users"
-
-    id = Column(Integer, primary_key=True, index=True)
-    email = Column(String, unique=True, index=True, nullable=False)
-    hashed_password = Column(String, nullable=False)
-    is_verified = Column(Boolean, default=False)
-    verification_token = Column(String, nullable=True, index=True)  # for email verification
-    password_reset_token = Column(String, nullable=True, index=True)  # for password reset
-    api_calls_this_month = Column(Integer, default=0)  # Track API calls per month
-    last_api_reset = Column(String, nullable=True)  # Store last reset date (ISO string)
-    subscription_status = Column(String, default="inactive")  # Paddle subscription status
-    subscription_start_date = Column(DateTime, nullable=True) # Add this line
-    free_trial_calls = Column(Integer, default=0)  # Track free trial usage
-
-    resumes = relationship("Resume", back_populates="user")
-
-
-class Resume(Base):
-    __tablename__ = "resumes"
-
-    id = Column(Integer, primary_key=True, index=True)
-    filename = Column(String, nullable=False)
-    skills = Column(Text, nullable=True)  # Add this
-    feedback = Column(Text, nullable=True)  # Added feedback column
-    user_id = Column(Integer, ForeignKey("users.id"))
-
-    user = relationship("User", back_populates="resumes")
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, Boolean, DateTime, LargeBinary, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from database import Base
+
+class User(Base):
+    __tablename__ = "users"
+
+    id = Column(Integer, primary_key=True, index=True)
+    email = Column(String, unique=True, index=True, nullable=False)
+    hashed_password = Column(String, nullable=False)
+    is_verified = Column(Boolean, default=False)
+    verification_token = Column(String, nullable=True, index=True)  # for email verification
+    password_reset_token = Column(String, nullable=True, index=True)  # for password reset
+    api_calls_this_month = Column(Integer, default=0)  # Track API calls per month
+    last_api_reset = Column(String, nullable=True)  # Store last reset date (ISO string)
+    subscription_status = Column(String, default="inactive")  # Paddle subscription status
+    subscription_start_date = Column(DateTime, nullable=True) # Add this line
+    free_trial_calls = Column(Integer, default=0)  # Track free trial usage
+    subscription_event_at = Column(DateTime, nullable=True)  # occurred_at of the last applied Paddle event; older ones are skipped
+
+    resumes = relationship("Resume", back_populates="user")
+
+
+class Resume(Base):
+    __tablename__ = "resumes"
+    __table_args__ = (Index("ix_resumes_user_id_id", "user_id", "id"),)  # per-user history pages
+
+    id = Column(Integer, primary_key=True, index=True)
+    filename = Column(String, nullable=False)
+    skills = Column(Text, nullable=True)  # Add this
+    feedback = Column(Text, nullable=True)  # Added feedback column
+    prompt_version = Column(String, nullable=True)  # prompt that produced skills/feedback
+    user_id = Column(Integer, ForeignKey("users.id"))
+    text_hash = Column(String, nullable=True, index=True)  # hash of the normalized extracted text
+    sections = Column(Text, nullable=True)  # JSON SectionIndex: per-section hashes and skills
+    parent_id = Column(Integer, ForeignKey("resumes.id"), nullable=True)  # earlier version this one was diffed against
+
+    user = relationship("User", back_populates="resumes")
+
+
+class Skill(Base):
+    __tablename__ = "skills"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)  # display spelling, from the first resume that had it
+    normalized_name = Column(String, nullable=False, unique=True)  # canonical taxonomy name, lowercased
+
+
+class ResumeSkill(Base):
+    __tablename__ = "resume_skills"
+    __table_args__ = (
+        # "resumes of this user that have skill X" is an index range scan
+        Index("ix_resume_skills_user_skill", "user_id", "skill_id", "resume_id"),
+    )
+
+    resume_id = Column(Integer, ForeignKey("resumes.id", ondelete="CASCADE"), primary_key=True)
+    skill_id = Column(Integer, ForeignKey("skills.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)  # copied from the resume so searches skip the join
+
+
+class UserSkillCount(Base):
+    """Per-user number of resumes listing each skill, kept up to date as resumes are stored."""
+    __tablename__ = "user_skill_counts"
+    __table_args__ = (Index("ix_user_skill_counts_top", "user_id", "resume_count"),)
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    skill_id = Column(Integer, ForeignKey("skills.id"), primary_key=True)
+    resume_count = Column(Integer, nullable=False, default=0)
+
+
+class AnalysisJob(Base):
+    __tablename__ = "analysis_jobs"
+    __table_args__ = (
+        Index("ix_analysis_jobs_queue", "status", "priority", "created_at"),
+        Index("ix_analysis_jobs_callbacks", "callback_status", "callback_next_attempt_at"),
+    )
+
+    id = Column(String, primary_key=True)  # uuid4 hex, handed to the client
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    status = Column(String, default="queued")  # queued | running | done | failed
+    priority = Column(Integer, default=0)  # higher runs first
+    filename = Column(String, nullable=False)
+    kind = Column(String, nullable=False)  # sniffed upload format
+    sha256 = Column(String, nullable=False)
+    content = Column(LargeBinary, nullable=True)  # raw upload, cleared once the job finishes
+    callback_url = Column(String, nullable=True)
+    callback_status = Column(String, nullable=True)  # pending | sent | failed, once the job has finished
+    callback_attempts = Column(Integer, default=0)
+    callback_next_attempt_at = Column(DateTime, nullable=True)
+    skills = Column(Text, nullable=True)  # JSON-encoded list of skills
+    feedback = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, default=0)
+    resume_id = Column(Integer, ForeignKey("resumes.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class AnalysisCache(Base):
+    __tablename__ = "analysis_cache"
+
+    cache_key = Column(String, primary_key=True)  # "file:<mode>:<prompt version>:<sha256>" or "text:..."
+    skills = Column(Text, nullable=True)  # JSON-encoded list of skills
+    feedback = Column(Text, nullable=True)
+    prompt_version = Column(String, nullable=True)
+    text_hash = Column(String, nullable=True)  # lineage for Resume rows stored from a cache hit
+    sections = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    __table_args__ = (Index("ix_email_outbox_due", "status", "next_attempt_at"),)
+
+    id = Column(Integer, primary_key=True)
+    to_address = Column(String, nullable=False)
+    template = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)  # rendered when queued
+    status = Column(String, default="pending")  # pending | sending | sent | failed
+    attempts = Column(Integer, default=0)
+    claim_token = Column(String, nullable=True)  # set by the sender that claimed the row
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    claimed_at = Column(DateTime, nullable=True)
+    sent_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class PaddleEvent(Base):
+    """Every verified Paddle webhook, stored on receipt and applied by paddle_events.processor."""
+    __tablename__ = "paddle_events"
+    __table_args__ = (Index("ix_paddle_events_pending", "status", "occurred_at"),)
+
+    event_id = Column(String, primary_key=True)  # Paddle's evt_... id; redeliveries collide here
+    event_type = Column(String, nullable=False, index=True)
+    occurred_at = Column(DateTime, nullable=False)
+    user_id = Column(Integer, nullable=True, index=True)  # from custom_data, if present
+    payload = Column(Text, nullable=False)
+    status = Column(String, default="pending")  # pending | processing | applied | ignored | failed
+    attempts = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    received_at = Column(DateTime, default=datetime.utcnow)
+    processed_at = Column(DateTime, nullable=True)
+
+
+class SchedulerLease(Base):
+    """One row per scheduled job. Only the worker holding an unexpired lease runs the job."""
+    __tablename__ = "scheduler_leases"
+
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=True)  # hostname:pid of the current leader
+    expires_at = Column(DateTime, nullable=False)
+    checkpoint = Column(String, nullable=True)  # progress of an interrupted run, resumed by the next leader
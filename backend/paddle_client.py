@@ -0,0 +1,94 @@
+"""
+One pooled HTTP client for the Paddle API, shared for the app's lifetime.
+
+Connections stay open between requests (over HTTP/2 when the h2 package is
+installed), so checkout and portal requests skip the DNS lookup and TLS
+handshake. Every request has explicit timeouts. A request is retried only
+when Paddle cannot have acted on it: a failed connect, or a 429/503 refusal.
+Point PADDLE_API_BASE_URL at a local mock server for load tests.
+"""
+import os
+import random
+import asyncio
+import logging
+import httpx
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger("paddle_client")
+
+PADDLE_API_BASE_URL = os.getenv("PADDLE_API_BASE_URL", "https://sandbox-api.paddle.com")
+PADDLE_CONNECT_TIMEOUT_SECONDS = float(os.getenv("PADDLE_CONNECT_TIMEOUT_SECONDS", "5"))
+PADDLE_TIMEOUT_SECONDS = float(os.getenv("PADDLE_TIMEOUT_SECONDS", "15"))
+PADDLE_MAX_RETRIES = int(os.getenv("PADDLE_MAX_RETRIES", "2"))
+PADDLE_MAX_CONNECTIONS = int(os.getenv("PADDLE_MAX_CONNECTIONS", "20"))
+# Portal links stay valid for a while after Paddle issues them, so one per user is reused until then
+PADDLE_PORTAL_URL_TTL_SECONDS = float(os.getenv("PADDLE_PORTAL_URL_TTL_SECONDS", "600"))
+
+# Paddle refused these before doing anything, so a non-idempotent POST is still safe to resend
+RETRYABLE_STATUSES = (429, 503)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class PaddleClient:
+    def __init__(self):
+        self._client = None
+        self.portal_urls = TTLCache(maxsize=10_000, ttl=PADDLE_PORTAL_URL_TTL_SECONDS)
+        self.counters = {"requests": 0, "retries": 0, "errors": 0}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created on first use so that it binds to the running event loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=PADDLE_API_BASE_URL,
+                timeout=httpx.Timeout(PADDLE_TIMEOUT_SECONDS, connect=PADDLE_CONNECT_TIMEOUT_SECONDS),
+                # Connect failures are retried by the transport; the request never reached Paddle.
+                # The pool settings go on the transport too: the client ignores its own once one is passed.
+                transport=httpx.AsyncHTTPTransport(
+                    http2=HTTP2_AVAILABLE,
+                    retries=PADDLE_MAX_RETRIES,
+                    limits=httpx.Limits(max_connections=PADDLE_MAX_CONNECTIONS, keepalive_expiry=60),
+                ),
+            )
+        return self._client
+
+    async def post(self, path: str, api_key: str, payload: dict) -> httpx.Response:
+        """POSTs JSON to the Paddle API; raises httpx.RequestError if Paddle can't be reached."""
+        headers = {
+            "Authorization": f"Bearer {api_key.strip()}",
+            "Content-Type": "application/json",
+        }
+        for attempt in range(PADDLE_MAX_RETRIES + 1):
+            self.counters["requests"] += 1
+            try:
+                response = await self.client.post(path, headers=headers, json=payload)
+            except httpx.RequestError:
+                self.counters["errors"] += 1
+                raise
+            if response.status_code not in RETRYABLE_STATUSES or attempt == PADDLE_MAX_RETRIES:
+                return response
+            self.counters["retries"] += 1
+            delay = _retry_after(response) or 0.5 * 2 ** attempt * random.uniform(0.5, 1.0)
+            logger.warning(f"Paddle returned {response.status_code} for {path}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        return {**self.counters, "http2": HTTP2_AVAILABLE, "portal_url_cache": self.portal_urls.stats()}
+
+
+def _retry_after(response: httpx.Response) -> float | None:
+    value = response.headers.get("retry-after", "")
+    return min(float(value), PADDLE_TIMEOUT_SECONDS) if value.isdigit() else None
+
+
+paddle = PaddleClient()
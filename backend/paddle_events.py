@@ -0,0 +1,197 @@
+"""
+Background application of stored Paddle webhook events.
+
+The webhook route only verifies the signature and inserts the event into
+paddle_events, keyed by Paddle's event id, so redeliveries are dropped at the
+insert. This processor applies pending events in occurred_at order. Each
+user's subscription_event_at records the newest event applied to them, and
+the user update is conditional on it. An event older than that (e.g. a
+delayed transaction.completed arriving after subscription.canceled) is
+skipped, which also makes re-applying an event a no-op.
+
+Replay stored events with:
+    python paddle_events.py replay [--since 2025-01-01] [--type subscription.canceled] [--user-id 42] [--include-applied]
+"""
+import os
+import re
+import json
+import logging
+import argparse
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import update, case, or_
+from sqlalchemy.orm import Session
+import crud
+import auth
+from database import SessionLocal
+from models import User
+
+logger = logging.getLogger("paddle_events")
+
+PADDLE_EVENT_BATCH_SIZE = int(os.getenv("PADDLE_EVENT_BATCH_SIZE", "50"))
+PADDLE_EVENT_POLL_INTERVAL_SECONDS = float(os.getenv("PADDLE_EVENT_POLL_INTERVAL_SECONDS", "5"))
+# Events wait this long after arrival so near-simultaneous deliveries can be applied in occurred_at order
+PADDLE_EVENT_SETTLE_SECONDS = float(os.getenv("PADDLE_EVENT_SETTLE_SECONDS", "2"))
+PADDLE_EVENT_MAX_ATTEMPTS = int(os.getenv("PADDLE_EVENT_MAX_ATTEMPTS", "5"))
+PADDLE_EVENT_STALE_AFTER = timedelta(minutes=5)
+
+
+def parse_timestamp(value: str | None) -> datetime:
+    """Paddle's RFC 3339 timestamps ("2024-04-12T10:18:49.621022Z") as naive UTC."""
+    if not value:
+        return datetime.utcnow()
+    value = value.replace("Z", "+00:00")
+    if "." in value:
+        # fromisoformat takes at most six fractional digits before Python 3.11
+        head, rest = value.split(".", 1)
+        digits = re.match(r"\d*", rest).group()
+        value = f"{head}.{digits[:6].ljust(6, '0')}{rest[len(digits):]}"
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = (parsed - parsed.utcoffset()).replace(tzinfo=None)
+    return parsed
+
+
+def event_user_id(payload: dict) -> int | None:
+    user_id = ((payload.get("data") or {}).get("custom_data") or {}).get("user_id")
+    try:
+        return int(user_id) if user_id is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _apply_to_user(db: Session, user_id: int, occurred_at: datetime, values: dict) -> str | None:
+    """Updates the user unless a newer event was already applied; returns their email if the update happened."""
+    stmt = (
+        update(User)
+        .where(User.id == user_id, or_(User.subscription_event_at.is_(None), User.subscription_event_at < occurred_at))
+        .values(subscription_event_at=occurred_at, **values)
+        .returning(User.email)
+        .execution_options(synchronize_session=False)
+    )
+    email = db.execute(stmt).scalar()
+    db.commit()
+    return email
+
+
+def apply_event(db: Session, event) -> str:
+    """Applies one event and returns its final status: "applied" or "ignored"."""
+    payload = json.loads(event.payload)
+    data = payload.get("data") or {}
+    if event.user_id is None:
+        return "ignored"
+
+    if event.event_type == "transaction.completed":
+        is_subscription = any((item.get("price") or {}).get("type") == "recurring" for item in data.get("items", []))
+        if not is_subscription or data.get("status") != "completed":
+            return "ignored"
+        values = {
+            # The start date is only set when they weren't already active
+            "subscription_start_date": case((User.subscription_status != "active", event.occurred_at), else_=User.subscription_start_date),
+            "subscription_status": "active",
+            "api_calls_this_month": 0,  # Also reset their count immediately on payment
+            "last_api_reset": event.occurred_at.isoformat(),  # and start their billing window
+        }
+    elif event.event_type == "subscription.canceled":
+        values = {"subscription_status": "canceled"}
+    else:
+        return "ignored"
+
+    email = _apply_to_user(db, event.user_id, event.occurred_at, values)
+    if email is None:
+        logger.info(f"Skipped {event.event_type} {event.event_id}: user {event.user_id} missing or has a newer event")
+        return "ignored"
+    auth.invalidate_user(email)
+    logger.info(f"Applied {event.event_type} {event.event_id} to user {email}")
+    return "applied"
+
+
+class PaddleEventProcessor:
+    def __init__(self):
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.counters = {"received": 0, "duplicates": 0, "applied": 0, "ignored": 0, "retried": 0, "failed": 0}
+
+    def record_receipt(self, inserted: bool):
+        self.counters["received" if inserted else "duplicates"] += 1
+        if inserted:
+            self._wake.set()
+
+    def process_batch(self) -> int:
+        """Applies one batch of settled pending events; returns how many were looked at."""
+        db = SessionLocal()
+        try:
+            crud.requeue_paddle_events(db, ("processing",), stale_before=datetime.utcnow() - PADDLE_EVENT_STALE_AFTER)
+            settled = datetime.utcnow() - timedelta(seconds=PADDLE_EVENT_SETTLE_SECONDS)
+            events = crud.get_pending_paddle_events(db, PADDLE_EVENT_BATCH_SIZE, settled)
+            for event in events:
+                if not crud.claim_paddle_event(db, event):
+                    continue  # another process took it
+                try:
+                    status = apply_event(db, event)
+                except Exception as e:
+                    db.rollback()
+                    retry = event.attempts < PADDLE_EVENT_MAX_ATTEMPTS
+                    logger.error(f"Failed to apply Paddle event {event.event_id} (attempt {event.attempts}): {e}")
+                    crud.finish_paddle_event(db, event, "pending" if retry else "failed", error=str(e))
+                    self.counters["retried" if retry else "failed"] += 1
+                else:
+                    crud.finish_paddle_event(db, event, status)
+                    self.counters[status] += 1
+            return len(events)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Paddle event batch failed: {e}")
+            return 0
+        finally:
+            db.close()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="paddle-events", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.process_batch() < PADDLE_EVENT_BATCH_SIZE:
+                # Wake early for new events, but not before they've settled
+                if self._wake.wait(PADDLE_EVENT_POLL_INTERVAL_SECONDS):
+                    self._wake.clear()
+                    self._stop.wait(PADDLE_EVENT_SETTLE_SECONDS)
+
+    def stats(self) -> dict:
+        return {**self.counters, "running": self._thread is not None}
+
+
+processor = PaddleEventProcessor()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-apply stored Paddle webhook events.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    replay = subcommands.add_parser("replay", help="mark matching events pending and apply them now")
+    replay.add_argument("--since", type=parse_timestamp, help="only events that occurred at or after this time")
+    replay.add_argument("--type", dest="event_type")
+    replay.add_argument("--user-id", type=int)
+    replay.add_argument("--include-applied", action="store_true",
+                        help="also replay applied events; they only take effect for users whose newer state was lost")
+    args = parser.parse_args()
+
+    statuses = ("failed", "ignored", "applied") if args.include_applied else ("failed", "ignored")
+    db = SessionLocal()
+    try:
+        count = crud.requeue_paddle_events(db, statuses, since=args.since, event_type=args.event_type, user_id=args.user_id)
+    finally:
+        db.close()
+    print(f"Requeued {count} events")
+    while processor.process_batch():
+        pass
+    print(f"Replay finished: {processor.stats()}")
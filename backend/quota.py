@@ -0,0 +1,220 @@
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from sqlalchemy import update, select, case, and_, or_, func, bindparam
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import User
+
+logger = logging.getLogger("quota")
+
+API_CALL_LIMIT = int(os.getenv("API_CALL_LIMIT", "1000"))
+FREE_TRIAL_LIMIT = int(os.getenv("FREE_TRIAL_LIMIT", "5"))
+BILLING_CYCLE = timedelta(days=30)
+
+# Write-behind mode admits calls against in-process counters and flushes them
+# in bulk. It trades exactness across workers for zero writes on the hot path.
+QUOTA_WRITE_BEHIND = os.getenv("QUOTA_WRITE_BEHIND", "false").lower() == "true"
+QUOTA_FLUSH_INTERVAL_SECONDS = float(os.getenv("QUOTA_FLUSH_INTERVAL_SECONDS", "5"))
+QUOTA_STATE_TTL_SECONDS = float(os.getenv("QUOTA_STATE_TTL_SECONDS", "60"))
+
+
+def _raise_refusal(db: Session, user_id: int, count: int):
+    """Works out which limit refused the charge. Only runs on the failure path."""
+    row = db.execute(select(User.subscription_status, User.free_trial_calls).where(User.id == user_id)).first()
+    if row and row.subscription_status != "active" and (row.free_trial_calls or 0) + count > FREE_TRIAL_LIMIT:
+        raise HTTPException(status_code=402, detail="Free trial ended. Please subscribe to continue using the service.")
+    raise HTTPException(status_code=429, detail="API call limit reached for this billing period.")
+
+
+def consume_atomic(db: Session, user_id: int, count: int = 1):
+    """
+    Charges `count` API calls with one conditional UPDATE ... RETURNING that
+    applies the 30-day billing reset, the free-trial cap and the monthly limit
+    together, so concurrent requests can't lose updates or overshoot.
+    Returns the row's api_calls_this_month, free_trial_calls and subscription_status after the charge.
+    """
+    now = datetime.utcnow()
+    calls = func.coalesce(User.api_calls_this_month, 0)
+    trial_calls = func.coalesce(User.free_trial_calls, 0)
+    is_active = User.subscription_status == "active"
+    # Each user's 30-day window is reset lazily on their first call after it ends. A user with no
+    # window yet starts one now, keeping their count; the daily sweep in scheduler.py catches idle users.
+    reset_due = and_(
+        User.last_api_reset.isnot(None),
+        User.last_api_reset < (now - BILLING_CYCLE).isoformat(),  # ISO strings sort chronologically
+    )
+    stmt = (
+        update(User)
+        .where(
+            User.id == user_id,
+            or_(is_active, trial_calls + count <= FREE_TRIAL_LIMIT),
+            or_(reset_due, calls + count <= API_CALL_LIMIT),
+        )
+        .values(
+            api_calls_this_month=case((reset_due, count), else_=calls + count),
+            last_api_reset=case((or_(reset_due, User.last_api_reset.is_(None)), now.isoformat()), else_=User.last_api_reset),
+            free_trial_calls=case((is_active, trial_calls), else_=trial_calls + count),
+        )
+        .returning(User.api_calls_this_month, User.free_trial_calls, User.subscription_status)
+        .execution_options(synchronize_session=False)
+    )
+    row = db.execute(stmt).first()
+    db.commit()
+    if row is None:
+        _raise_refusal(db, user_id, count)
+    return row
+
+
+def refund_atomic(db: Session, user_id: int, count: int = 1):
+    """Gives back `count` calls charged by consume_atomic, e.g. when the analysis they paid for failed."""
+    calls = func.coalesce(User.api_calls_this_month, 0)
+    trial_calls = func.coalesce(User.free_trial_calls, 0)
+    stmt = (
+        update(User)
+        .where(User.id == user_id)
+        .values(
+            api_calls_this_month=case((calls > count, calls - count), else_=0),
+            free_trial_calls=case((User.subscription_status == "active", trial_calls), (trial_calls > count, trial_calls - count), else_=0),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(stmt)
+    db.commit()
+
+
+class WriteBehindQuota:
+    """
+    In-memory quota counters seeded from consume_atomic() and flushed to the
+    users table in one bulk UPDATE every QUOTA_FLUSH_INTERVAL_SECONDS. Each
+    user's state is re-seeded from the database after QUOTA_STATE_TTL_SECONDS,
+    which also picks up billing resets and subscription changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = {}  # user_id -> [calls, trial_calls, is_active, seeded_at]
+        self._pending = {}  # user_id -> [calls, trial_calls] not yet written
+        self._stop = threading.Event()
+        self._thread = None
+
+    def consume(self, db: Session, user_id: int, count: int):
+        with self._lock:
+            state = self._state.get(user_id)
+            if state and time.monotonic() - state[3] < QUOTA_STATE_TTL_SECONDS:
+                calls, trial_calls, is_active, _ = state
+                if not is_active and trial_calls + count > FREE_TRIAL_LIMIT:
+                    raise HTTPException(status_code=402, detail="Free trial ended. Please subscribe to continue using the service.")
+                if calls + count > API_CALL_LIMIT:
+                    raise HTTPException(status_code=429, detail="API call limit reached for this billing period.")
+                state[0] += count
+                pending = self._pending.setdefault(user_id, [0, 0])
+                pending[0] += count
+                if not is_active:
+                    state[1] += count
+                    pending[1] += count
+                return
+
+        # Unknown or expired state: write pending counts, then charge and re-seed in one round trip
+        self.flush(user_id)
+        row = consume_atomic(db, user_id, count)
+        with self._lock:
+            self._state[user_id] = [row.api_calls_this_month, row.free_trial_calls, row.subscription_status == "active", time.monotonic()]
+
+    def refund(self, db: Session, user_id: int, count: int):
+        with self._lock:
+            state = self._state.get(user_id)
+            if state:
+                state[0] = max(state[0] - count, 0)
+                pending = self._pending.setdefault(user_id, [0, 0])
+                pending[0] -= count
+                if not state[2]:
+                    state[1] = max(state[1] - count, 0)
+                    pending[1] -= count
+                return
+        self.flush(user_id)
+        refund_atomic(db, user_id, count)
+
+    def flush(self, user_id: int | None = None):
+        """Writes pending counts for every user, or just user_id, in one executemany UPDATE."""
+        with self._lock:
+            if user_id is None:
+                pending, self._pending = self._pending, {}
+            else:
+                pending = {user_id: self._pending.pop(user_id)} if user_id in self._pending else {}
+        if not pending:
+            return
+        db = SessionLocal()
+        try:
+            stmt = (
+                update(User)
+                .where(User.id == bindparam("uid"))
+                .values(
+                    api_calls_this_month=func.coalesce(User.api_calls_this_month, 0) + bindparam("calls"),
+                    free_trial_calls=func.coalesce(User.free_trial_calls, 0) + bindparam("trial_calls"),
+                )
+            )
+            params = [{"uid": uid, "calls": calls, "trial_calls": trial} for uid, (calls, trial) in pending.items()]
+            db.connection().execute(stmt, params)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Quota flush failed, re-queuing {len(pending)} users: {e}")
+            with self._lock:
+                for uid, (calls, trial) in pending.items():
+                    current = self._pending.setdefault(uid, [0, 0])
+                    current[0] += calls
+                    current[1] += trial
+        finally:
+            db.close()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="quota-flush", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(QUOTA_FLUSH_INTERVAL_SECONDS):
+            self.flush()
+
+
+write_behind = WriteBehindQuota()
+
+
+def consume(db: Session, user, count: int = 1):
+    """Charges `count` API calls to user or raises 402 (free trial used up) / 429 (monthly limit)."""
+    if QUOTA_WRITE_BEHIND:
+        write_behind.consume(db, user.id, count)
+    else:
+        consume_atomic(db, user.id, count)
+
+
+def refund(db: Session, user_id: int, count: int = 1):
+    """Undoes a consume() for work that was charged but never delivered."""
+    if count <= 0:
+        return
+    try:
+        if QUOTA_WRITE_BEHIND:
+            write_behind.refund(db, user_id, count)
+        else:
+            refund_atomic(db, user_id, count)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to refund {count} calls to user {user_id}: {e}")
+
+
+def start():
+    if QUOTA_WRITE_BEHIND:
+        write_behind.start()
+
+
+def stop():
+    if QUOTA_WRITE_BEHIND:
+        write_behind.stop()
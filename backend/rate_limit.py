@@ -1,4 +1,77 @@
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-
-limiter = Limiter(key_func=get_remote_address)
+"""
+Request rate limits, shared by every worker and replica.
+
+Counters live in RATE_LIMIT_STORAGE_URI, which takes any `limits` storage URI
+(e.g. redis://redis:6379/0). The default memory:// store only counts within
+one process, so a multi-worker deployment must point this at a shared store.
+If that store goes down, slowapi's decorators fall back to per-process
+in-memory counters, and upload charges are let through rather than failing
+the request.
+
+Auth routes are keyed by client IP, taken from X-Forwarded-For behind
+TRUSTED_PROXY_HOPS reverse proxies. Uploads are keyed by the authenticated
+user and weighted by format, because OCR'ing a scan costs far more than
+parsing a DOCX.
+"""
+import os
+import time
+import logging
+from fastapi import HTTPException, Request
+from limits import parse
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+
+logger = logging.getLogger("rate_limit")
+
+RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI", "memory://")
+# moving-window counts every hit in the trailing window; fixed-window is cheaper but allows bursts at window edges
+RATE_LIMIT_STRATEGY = os.getenv("RATE_LIMIT_STRATEGY", "moving-window")
+# How many proxies in front of the app append to X-Forwarded-For; 0 trusts only the socket address
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+UPLOAD_RATE_LIMIT = os.getenv("UPLOAD_RATE_LIMIT", "60/minute")
+
+# Units charged against UPLOAD_RATE_LIMIT per file, roughly in proportion to the work each takes
+UPLOAD_COSTS = {"docx": 1, "pdf": 2, "png": 5, "jpeg": 5, "tiff": 5, "heic": 5}
+
+
+def client_ip(request: Request) -> str:
+    """The caller's address; with TRUSTED_PROXY_HOPS set, the one our outermost proxy saw."""
+    if TRUSTED_PROXY_HOPS:
+        forwarded = [part.strip() for part in request.headers.get("x-forwarded-for", "").split(",") if part.strip()]
+        # Entries left of the ones our proxies appended are client-controlled
+        if len(forwarded) >= TRUSTED_PROXY_HOPS:
+            return forwarded[-TRUSTED_PROXY_HOPS]
+    return get_remote_address(request)
+
+
+limiter = Limiter(
+    key_func=client_ip,
+    storage_uri=RATE_LIMIT_STORAGE_URI,
+    strategy=RATE_LIMIT_STRATEGY,
+    in_memory_fallback_enabled=True,
+)
+
+
+def upload_cost(kinds) -> int:
+    return sum(UPLOAD_COSTS.get(kind, 1) for kind in kinds)
+
+
+def charge_upload(user_id: int, cost: int):
+    """Counts `cost` units against the user's upload limit, or raises 429 with Retry-After."""
+    item = parse(UPLOAD_RATE_LIMIT)
+    key = f"upload:user:{user_id}"
+    if cost > item.amount:
+        # Could never pass, however long the client waits, so there is no Retry-After
+        raise HTTPException(status_code=429, detail=f"Upload weighs {cost} units, more than the rate limit allows at once "
+                                                    f"({UPLOAD_RATE_LIMIT}). Split the batch into smaller ones.")
+    try:
+        allowed = limiter.limiter.hit(item, key, cost=cost)
+        if allowed:
+            return
+        reset_at, _ = limiter.limiter.get_window_stats(item, key)
+    except Exception as e:
+        logger.error(f"Rate limit storage unavailable, allowing upload for user {user_id}: {e}")
+        return
+    retry_after = max(1, int(reset_at - time.time()))
+    raise HTTPException(status_code=429, detail=f"Upload rate limit exceeded ({UPLOAD_RATE_LIMIT}).",
+                        headers={"Retry-After": str(retry_after)})
@@ -0,0 +1,106 @@
+import os
+import json
+import hashlib
+import logging
+import unicodedata
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+import crud
+from utils.ttl_cache import TTLCache
+from utils.skill_extractor import SKILL_EXTRACTION_MODE, PROMPT_VERSION, AnalysisResult
+from utils.section_diff import SectionIndex
+
+logger = logging.getLogger("result_cache")
+
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+RESULT_CACHE_MEMORY_SIZE = int(os.getenv("RESULT_CACHE_MEMORY_SIZE", "512"))
+RESULT_CACHE_MAX_ROWS = int(os.getenv("RESULT_CACHE_MAX_ROWS", "50000"))
+RESULT_CACHE_PRUNE_EVERY = int(os.getenv("RESULT_CACHE_PRUNE_EVERY", "500"))  # writes between DB prunes
+TOUCH_INTERVAL = timedelta(hours=1)  # limits last_used_at writes on hot keys
+
+
+# Results from different extraction modes or prompt versions never share cache entries
+KEY_NAMESPACE = f"{SKILL_EXTRACTION_MODE}:{PROMPT_VERSION}"
+
+
+def file_key(sha256_hex: str) -> str:
+    """Key for a raw upload, from the digest computed while it was ingested."""
+    return f"file:{KEY_NAMESPACE}:{sha256_hex}"
+
+def text_hash(text: str) -> str:
+    """Digest of the text with Unicode and whitespace differences normalized away."""
+    normalized = " ".join(unicodedata.normalize("NFKC", text).split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+def text_key(text: str) -> str:
+    return f"text:{KEY_NAMESPACE}:" + text_hash(text)
+
+
+class ResultCache:
+    """
+    Two-tier cache of AnalysisResults: an in-process LRU in front of
+    the analysis_cache table. Keys come from file_key() and text_key().
+    """
+
+    def __init__(self):
+        self.memory = TTLCache(maxsize=RESULT_CACHE_MEMORY_SIZE, ttl=RESULT_CACHE_TTL_SECONDS)
+        self.ttl = timedelta(seconds=RESULT_CACHE_TTL_SECONDS)
+        self.counters = {"memory_hits": 0, "db_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    def get(self, db: Session, key: str):
+        """Returns the cached AnalysisResult for key, or None on a miss."""
+        if not RESULT_CACHE_ENABLED:
+            return None
+        result = self.memory.get(key)
+        if result is not None:
+            self.counters["memory_hits"] += 1
+            return result
+        try:
+            entry = crud.get_cache_entry(db, key)
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            now = datetime.utcnow()
+            if now - entry.created_at > self.ttl:
+                crud.delete_cache_entry(db, entry)
+                self.counters["misses"] += 1
+                self.counters["evictions"] += 1
+                return None
+            if now - entry.last_used_at > TOUCH_INTERVAL:
+                crud.touch_cache_entry(db, entry)
+            result = AnalysisResult(json.loads(entry.skills or "[]"), entry.feedback or "", entry.prompt_version or PROMPT_VERSION,
+                                    text_hash=entry.text_hash,
+                                    sections=SectionIndex.from_json(entry.sections) if entry.sections else None)
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Result cache lookup failed for {key}: {e}")
+            self.counters["misses"] += 1
+            return None
+        self.memory.set(key, result)
+        self.counters["db_hits"] += 1
+        return result
+
+    def set(self, db: Session, keys: list[str], result: AnalysisResult):
+        """Stores a successful result, with its text hash and section index, under every key in keys, in both tiers."""
+        if not RESULT_CACHE_ENABLED or not result.ok:
+            return
+        result = AnalysisResult(list(result.skills), result.feedback, result.prompt_version, text_hash=result.text_hash, sections=result.sections)
+        encoded_skills = json.dumps(result.skills)
+        encoded_sections = result.sections.to_json() if result.sections is not None else None
+        try:
+            for key in keys:
+                self.memory.set(key, result)
+                crud.upsert_cache_entry(db, key, encoded_skills, result.feedback, result.prompt_version, result.text_hash, encoded_sections)
+                self.counters["writes"] += 1
+            if self.counters["writes"] % RESULT_CACHE_PRUNE_EVERY < len(keys):
+                self.counters["evictions"] += crud.prune_cache_entries(db, self.ttl, RESULT_CACHE_MAX_ROWS)
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Result cache write failed: {e}")
+
+    def stats(self) -> dict:
+        return {**self.counters, "memory": self.memory.stats()}
+
+
+result_cache = ResultCache()
@@ -0,0 +1,177 @@
+import os
+import asyncio
+import logging
+from dataclasses import replace
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+import crud
+from utils.skill_extractor import extract_skills_and_feedback_from_text, AnalysisResult, SKILL_EXTRACTION_MODE, PROMPT_VERSION
+from utils import section_diff
+from utils.text_compactor import compact, compaction_stats, PROMPT_TOKEN_BUDGET
+from utils.file_reader import parse_resume, IngestedUpload
+from utils.pdf_extractor import extract_pages
+from result_cache import result_cache, file_key, text_key, text_hash
+from executor import run_parse, run_llm
+from utils import metrics
+
+logger = logging.getLogger("resume_pipeline")
+
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+# Stop PDF extraction once enough raw text for the prompt is collected. Off by
+# default because the full text feeds the cache key and stored results.
+PDF_EARLY_STOP = os.getenv("PDF_EARLY_STOP", "false").lower() == "true"
+# Raw text is roughly half noise before compaction, so collect about twice the prompt budget
+PDF_EARLY_STOP_CHARS = int(os.getenv("PDF_EARLY_STOP_CHARS", str(PROMPT_TOKEN_BUDGET * 8)))
+
+# Re-uploads that share at least INCREMENTAL_MIN_OVERLAP of their sections with
+# one of the user's last INCREMENTAL_CANDIDATES resumes only send the changed
+# sections to the model
+INCREMENTAL_ANALYSIS = os.getenv("INCREMENTAL_ANALYSIS", "true").lower() == "true"
+INCREMENTAL_CANDIDATES = int(os.getenv("INCREMENTAL_CANDIDATES", "10"))
+INCREMENTAL_MIN_OVERLAP = float(os.getenv("INCREMENTAL_MIN_OVERLAP", "0.5"))
+
+
+async def extract_text(upload: IngestedUpload) -> str:
+    """
+    Extracts text in the parse pool. PDFs longer than PDF_PAGES_PER_TASK pages
+    are split into page ranges that run on separate workers; each worker
+    receives its own copy of the document bytes.
+    """
+    if upload.kind != "pdf":
+        return await run_parse(parse_resume, upload.kind, upload.content)
+
+    budget = PDF_EARLY_STOP_CHARS if PDF_EARLY_STOP else None
+    texts, page_count = await run_parse(extract_pages, upload.content, 0, PDF_PAGES_PER_TASK, budget)
+    ranges = [(start, min(start + PDF_PAGES_PER_TASK, page_count)) for start in range(PDF_PAGES_PER_TASK, page_count, PDF_PAGES_PER_TASK)]
+
+    if budget is not None:
+        # Sequential ranges, so we can stop as soon as the budget is met
+        collected = sum(len(text) for text in texts)
+        for start, stop in ranges:
+            if collected >= budget:
+                break
+            more, _ = await run_parse(extract_pages, upload.content, start, stop, budget - collected)
+            texts.extend(more)
+            collected += sum(len(text) for text in more)
+    elif ranges:
+        results = await asyncio.gather(*(run_parse(extract_pages, upload.content, start, stop) for start, stop in ranges))
+        for more, _ in results:
+            texts.extend(more)
+    return "".join(texts)
+
+
+async def analyze_upload(db: Session, upload: IngestedUpload, user_id: int | None = None) -> AnalysisResult:
+    """
+    Parses an ingested upload and extracts skills and feedback, going through
+    the result cache. With a user_id, an edited version of one of the user's
+    earlier resumes only has its changed sections analyzed. A result with
+    ok=False was not produced by the model (failure or invalid output) and
+    should not be charged for.
+    """
+    # Identical uploads skip parsing and the LLM call entirely. Entries cached
+    # before lineage was stored have no sections and go through the text key.
+    content_key = file_key(upload.sha256)
+    cached = result_cache.get(db, content_key)
+    if cached is not None and cached.sections is not None:
+        return _with_parent(db, replace(cached), user_id)
+
+    # Read the uploaded file
+    with metrics.stage("parse", kind=upload.kind):
+        text = await extract_text(upload)
+    if not text:
+        raise HTTPException(status_code=400, detail="No text could be extracted from the file")
+    sections, hashes = await run_parse(section_diff.split, text)
+
+    # Same text from a different file (e.g. re-exported PDF) still skips the LLM call
+    content_text_key = text_key(text)
+    cached = result_cache.get(db, content_text_key)
+    if cached is not None:
+        result = await _with_lineage(replace(cached), text, sections)
+        result_cache.set(db, [content_key], result)
+        return _with_parent(db, result, user_id)
+
+    if user_id is not None and INCREMENTAL_ANALYSIS and SKILL_EXTRACTION_MODE != "local":
+        result = await _analyze_incrementally(db, user_id, upload, text, sections, hashes)
+        if result is not None:
+            return result
+
+    result = await _with_lineage(await _extract(upload, text), text, sections)
+    result_cache.set(db, [content_key, content_text_key], result)
+    return result
+
+
+async def _extract(upload: IngestedUpload, text: str, previous_feedback: str | None = None) -> AnalysisResult:
+    # Cut the prompt down to the token budget, in the parse pool since it's CPU-bound
+    prompt_text = None
+    if SKILL_EXTRACTION_MODE != "local":
+        with metrics.stage("compact"):
+            compacted = await run_parse(compact, text)
+        compaction_stats.record(compacted)
+        logger.info(f"Compacted {upload.filename}: {compacted.original_tokens} -> {compacted.tokens} prompt tokens "
+                    f"({compacted.tokens_saved} saved, {compacted.sections_kept}/{compacted.sections_total} sections)")
+        prompt_text = compacted.text
+
+    # Extract skills and feedback; failed results are not cached
+    result = await run_llm(extract_skills_and_feedback_from_text, text, prompt_text, previous_feedback)
+    if prompt_text is not None:
+        result.usage["prompt_tokens_saved"] = compacted.tokens_saved
+    return result
+
+
+async def _with_lineage(result: AnalysisResult, text: str, sections: list[str]) -> AnalysisResult:
+    """Attaches the text hash and section index that later versions will be diffed against."""
+    result.text_hash = text_hash(text)
+    if result.ok:
+        result.sections = await run_parse(section_diff.build_index, sections, result.skills)
+    return result
+
+
+def _with_parent(db: Session, result: AnalysisResult, user_id: int | None) -> AnalysisResult:
+    """Links a cached result to the user's latest resume with the same text, as an unchanged re-upload would be."""
+    if user_id is not None and result.text_hash is not None:
+        result.parent_id = crud.get_latest_resume_id_by_text_hash(db, user_id, result.text_hash)
+    return result
+
+
+async def _analyze_incrementally(db: Session, user_id: int, upload: IngestedUpload, text: str, sections: list[str], hashes: list[str]) -> AnalysisResult | None:
+    """
+    Finds the user's earlier resume that shares the most sections with this
+    one and sends only the changed sections to the extractor, with the
+    earlier version's feedback for the model to update. Returns None when no
+    earlier version is similar enough.
+    """
+    current_hash = text_hash(text)
+    best, best_index, best_overlap = None, None, 0.0
+    for row in crud.get_diffable_resumes(db, user_id, PROMPT_VERSION, INCREMENTAL_CANDIDATES):
+        index = section_diff.SectionIndex.from_json(row.sections)
+        score = 1.0 if row.text_hash == current_hash else section_diff.overlap(index, hashes)
+        if score > best_overlap:
+            best, best_index, best_overlap = row, index, score
+    if best is None or best_overlap < INCREMENTAL_MIN_OVERLAP:
+        return None
+
+    changed = section_diff.changed_sections(best_index, hashes)
+    if not changed:
+        # Same sections, maybe reordered or with sections removed: nothing for the model to see
+        index = section_diff.merge(best_index, hashes, [], section_diff.SectionIndex([], []))
+        logger.info(f"Re-upload of resume {best.id} by user {user_id} has no changed sections; reusing its analysis")
+        return AnalysisResult(index.all_skills(), best.feedback or "", text_hash=current_hash, sections=index, parent_id=best.id)
+
+    logger.info(f"Re-analyzing {len(changed)}/{len(hashes)} changed sections of resume {best.id} for user {user_id}")
+    delta_text = "\n".join(sections[i] for i in changed)
+    delta = await _extract(upload, delta_text, best.feedback or None)
+    delta_index = await run_parse(section_diff.build_index, [sections[i] for i in changed], delta.skills)
+    index = section_diff.merge(best_index, hashes, changed, delta_index)
+    delta.usage["sections_reanalyzed"] = len(changed)
+    return AnalysisResult(index.all_skills(), delta.feedback, ok=delta.ok, usage=delta.usage, text_hash=current_hash,
+                          sections=index if delta.ok else None, parent_id=best.id)
+
+
+def store_result(db: Session, filename: str, user_id: int, result: AnalysisResult):
+    """Saves an analysis as a Resume row, with the lineage needed to diff later versions against it."""
+    return crud.create_resume(
+        db, filename=filename, skills=", ".join(result.skills), user_id=user_id, feedback=result.feedback,
+        prompt_version=result.prompt_version, text_hash=result.text_hash,
+        sections=result.sections.to_json() if result.sections is not None else None, parent_id=result.parent_id,
+        skill_names=result.skills,
+    )
@@ -1,58 +1,180 @@
-
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
-from utils.skill_extractor import extract_skills_and_feedback_from_text
-from utils.file_reader import read_resume
-from auth import get_current_user
-from database import get_db
-from sqlalchemy.orm import Session
-from crud import create_resume, check_api_limit, increment_api_calls, check_and_reset_api_usage
-from schemas import ResumeFeedback, ErrorResponse
-
-router = APIRouter()
-
-@router.post("/upload-resume/", response_model=ResumeFeedback, responses={400: {"model": ErrorResponse}, 403: {"model": ErrorResponse}, 402: {"model": ErrorResponse}, 429: {"model": ErrorResponse}, 500: {"model": ErrorResponse}}, tags=["Resume"])
-async def upload_resume(
-    file: UploadFile = File(...),
-    user=Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    # Check if the user's email is verified
-    if not user.is_verified:
-        raise HTTPException(status_code=403, detail="Email not verified. Please verify your email to use this service.")
-
-
-    # Free trial logic: allow up to 5 free calls for non-subscribed users
-    if user.subscription_status != "active":
-        if user.free_trial_calls < 5:
-            user.free_trial_calls += 1
-            db.commit()
-        else:
-            raise HTTPException(status_code=402, detail="Free trial ended. Please subscribe to continue using the service.")
-
-    # NEW: Check if the user's billing cycle has reset
-    check_and_reset_api_usage(db, user)
-
-    # Enforce API call limit
-    if not check_api_limit(user, limit=1000):
-        raise HTTPException(status_code=429, detail="API call limit reached for this billing period.")
-
-    # Increment API usage
-    increment_api_calls(db, user)
-
-    # Read the uploaded file
-    text = await read_resume(file)
-    if not text:
-        raise HTTPException(status_code=400, detail="Unsupported file or empty content")
-
-    # Extract skills and feedback
-    skills, feedback = extract_skills_and_feedback_from_text(text)
-
-    # Ensure skills are properly formatted
-    formatted_skills = ", ".join(skills)
-
-    # Store resume data in the database
-    resume = create_resume(db, filename=file.filename, skills=formatted_skills, user_id=user.id)
-    resume.feedback = feedback
-    db.commit()
-
-    return ResumeFeedback(filename=file.filename, skills=skills, feedback=feedback)
+
+import os
+import json
+import asyncio
+import hashlib
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse, Response
+from utils.file_reader import ingest_upload, expand_zip, SUPPORTED_FORMATS, UploadBudget, BatchTooLarge
+from resume_pipeline import analyze_upload, store_result
+from auth import get_current_user
+from database import get_db, SessionLocal
+from sqlalchemy.orm import Session
+import quota
+import crud
+import rate_limit
+from schemas import ResumeFeedback, ResumeSummary, ResumeListResponse, ErrorResponse
+
+router = APIRouter()
+
+MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", "50"))
+MAX_BATCH_BYTES = int(os.getenv("MAX_BATCH_BYTES", str(100 * 1024 * 1024)))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))  # per-batch cap on top of the global stage limits
+MAX_PAGE_SIZE = 100
+
+@router.post("/upload-resume/", response_model=ResumeFeedback, responses={400: {"model": ErrorResponse}, 403: {"model": ErrorResponse}, 402: {"model": ErrorResponse}, 413: {"model": ErrorResponse}, 415: {"model": ErrorResponse}, 429: {"model": ErrorResponse}, 500: {"model": ErrorResponse}}, tags=["Resume"])
+async def upload_resume(
+    file: UploadFile = File(...),
+    user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # Check if the user's email is verified
+    if not user.is_verified:
+        raise HTTPException(status_code=403, detail="Email not verified. Please verify your email to use this service.")
+
+    # Read the upload in capped chunks; oversized or unsupported files are rejected before they cost quota
+    upload = await ingest_upload(file)
+    rate_limit.charge_upload(user.id, rate_limit.upload_cost([upload.kind]))
+
+    # Free trial, billing-cycle reset and monthly limit are enforced in one atomic UPDATE
+    quota.consume(db, user, 1)
+
+    try:
+        analysis = await analyze_upload(db, upload, user.id)
+    except Exception:
+        quota.refund(db, user.id, 1)
+        raise
+    if not analysis.ok:
+        # The model failed or returned invalid output; whatever fallback we return is free
+        quota.refund(db, user.id, 1)
+
+    # Store resume data in the database
+    store_result(db, file.filename, user.id, analysis)
+
+    return ResumeFeedback(filename=file.filename, skills=analysis.skills, feedback=analysis.feedback, prompt_version=analysis.prompt_version)
+
+@router.post("/upload-resumes/batch", responses={200: {"content": {"application/x-ndjson": {}}}, 400: {"model": ErrorResponse}, 403: {"model": ErrorResponse}, 402: {"model": ErrorResponse}, 413: {"model": ErrorResponse}, 429: {"model": ErrorResponse}}, tags=["Resume"])
+async def upload_resumes_batch(
+    files: list[UploadFile] = File(...),
+    user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Analyzes many resumes (or zip archives of resumes) in one request.
+    Results stream back as NDJSON, one line per file, in completion order.
+    """
+    if not user.is_verified:
+        raise HTTPException(status_code=403, detail="Email not verified. Please verify your email to use this service.")
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"Too many files. Maximum is {MAX_BATCH_FILES} per batch.")
+
+    # Resumes are capped per file while they're read; everything held in memory at once is capped per batch
+    budget = UploadBudget(MAX_BATCH_BYTES)
+    uploads, errors = [], []
+    for file in files:
+        try:
+            upload = await ingest_upload(file, allowed_formats=SUPPORTED_FORMATS + ("zip",), archive_max_bytes=MAX_BATCH_BYTES, budget=budget)
+        except BatchTooLarge:
+            raise
+        except HTTPException as e:
+            errors.append({"filename": file.filename, "status": e.status_code, "detail": e.detail})
+            continue
+        if upload.kind == "zip":
+            unpacked, unpack_errors = expand_zip(upload, max_files=MAX_BATCH_FILES, budget=budget)
+            uploads.extend(unpacked)
+            errors.extend(unpack_errors)
+        else:
+            uploads.append(upload)
+
+    if len(uploads) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"Too many files. Maximum is {MAX_BATCH_FILES} per batch.")
+
+    # Charge the rate limit and quota for every accepted file, the quota in a single transaction
+    if uploads:
+        rate_limit.charge_upload(user.id, rate_limit.upload_cost(upload.kind for upload in uploads))
+        quota.consume(db, user, len(uploads))
+
+    return StreamingResponse(_stream_batch(uploads, errors, user.id), media_type="application/x-ndjson")
+
+async def _stream_batch(uploads, errors, user_id: int):
+    # The request-scoped session is closed before the body streams, so the batch gets its own
+    db = SessionLocal()
+    batch_slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+    charged = 0  # files that produced a model result; the rest are refunded at the end
+
+    async def analyze(upload):
+        nonlocal charged
+        async with batch_slots:
+            try:
+                analysis = await analyze_upload(db, upload, user_id)
+                store_result(db, upload.filename, user_id, analysis)
+            except HTTPException as e:
+                return {"filename": upload.filename, "status": e.status_code, "detail": e.detail}
+            except Exception:
+                db.rollback()  # keep the shared session usable for the other files
+                return {"filename": upload.filename, "status": 500, "detail": "Failed to analyze resume."}
+        if analysis.ok:
+            charged += 1
+        return {"filename": upload.filename, "status": 200, "skills": analysis.skills, "feedback": analysis.feedback, "prompt_version": analysis.prompt_version}
+
+    tasks = [asyncio.create_task(analyze(upload)) for upload in uploads]
+    try:
+        for error in errors:
+            yield json.dumps(error) + "\n"
+        for next_result in asyncio.as_completed(tasks):
+            yield json.dumps(await next_result) + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Also covers files left unanalyzed because the client disconnected
+        quota.refund(db, user_id, len(uploads) - charged)
+        db.close()
+
+@router.get("/resumes", response_model=ResumeListResponse, responses={304: {"description": "Not modified"}}, tags=["Resume"])
+def list_resumes(
+    request: Request,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    before_id: int | None = Query(None, description="next_before_id from the previous page"),
+    include_feedback: bool = Query(False, description="Also return each resume's feedback text"),
+    user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Your analyzed resumes, newest first. Fetch one resume for its feedback, or pass include_feedback."""
+    rows = crud.get_resumes_by_user(db, user.id, limit=limit, before_id=before_id, include_feedback=include_feedback)
+    page = ResumeListResponse(
+        resumes=[_summary(row) for row in rows],
+        next_before_id=rows[-1].id if len(rows) == limit else None,
+    )
+    return _conditional_json(request, page)
+
+@router.get("/resumes/{resume_id}", response_model=ResumeSummary, responses={304: {"description": "Not modified"}, 404: {"model": ErrorResponse}}, tags=["Resume"])
+def get_resume(
+    resume_id: int,
+    request: Request,
+    user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    resume = crud.get_resume(db, resume_id, user.id)
+    if resume is None:
+        raise HTTPException(status_code=404, detail="Resume not found")
+    return _conditional_json(request, _summary(resume))
+
+def _summary(row) -> ResumeSummary:
+    return ResumeSummary(
+        id=row.id,
+        filename=row.filename,
+        skills=[skill.strip() for skill in (row.skills or "").split(",") if skill.strip()],
+        prompt_version=row.prompt_version,
+        parent_id=row.parent_id,
+        feedback=getattr(row, "feedback", None),
+    )
+
+def _conditional_json(request: Request, model) -> Response:
+    """Serializes model with an ETag and answers 304 when the client already has this exact body."""
+    body = model.model_dump_json().encode("utf-8")
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*" or etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
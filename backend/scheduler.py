@@ -0,0 +1,69 @@
+"""
+Scheduled maintenance jobs, safe to start in every worker.
+
+Each uvicorn worker runs its own APScheduler, so every job is guarded by a
+lease row in scheduler_leases. Only the worker holding an unexpired lease does
+the work. The leader renews the lease after every chunk and records its
+progress there, so if it dies, the next run resumes from the checkpoint
+instead of starting over.
+
+Quota windows are reset lazily per user by quota.consume_atomic. The daily
+sweep here only catches users who made no calls since their window ended. It
+works through users in id order, in short chunked UPDATEs, so it never locks
+the whole users table.
+"""
+import os
+import time
+import socket
+import logging
+from datetime import datetime, timedelta
+from apscheduler.schedulers.background import BackgroundScheduler
+import crud
+from database import SessionLocal
+from quota import BILLING_CYCLE
+
+logger = logging.getLogger("scheduler")
+
+RESET_SWEEP_BATCH_SIZE = int(os.getenv("RESET_SWEEP_BATCH_SIZE", "1000"))
+RESET_SWEEP_PAUSE_SECONDS = float(os.getenv("RESET_SWEEP_PAUSE_SECONDS", "0.1"))  # lets user traffic in between chunks
+# Must outlast one chunk. After a run finishes the leader keeps the lease until it expires, so the
+# other workers, whose copies of the job fire at the same moment, find it taken and skip the run.
+LEASE_TTL = timedelta(seconds=int(os.getenv("SCHEDULER_LEASE_TTL_SECONDS", "300")))
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def billing_reset_sweep():
+    """Resets the monthly count of every user whose 30-day billing window has ended."""
+    db = SessionLocal()
+    try:
+        lease = crud.acquire_lease(db, "billing_reset_sweep", WORKER_ID, LEASE_TTL)
+        if lease is None:
+            return  # another worker is running it
+        after_id = int(lease.checkpoint or 0)
+        if after_id:
+            logger.info(f"Resuming billing reset sweep after user {after_id}")
+        cutoff = datetime.utcnow() - BILLING_CYCLE
+        total = 0
+        while True:
+            chunk = crud.reset_expired_api_calls(db, after_id, cutoff, RESET_SWEEP_BATCH_SIZE)
+            if chunk is None:
+                break
+            after_id, reset = chunk
+            total += reset
+            if not crud.renew_lease(db, "billing_reset_sweep", WORKER_ID, LEASE_TTL, checkpoint=str(after_id)):
+                logger.warning(f"Lost the billing reset sweep lease after user {after_id}; stopping")
+                return
+            time.sleep(RESET_SWEEP_PAUSE_SECONDS)
+        crud.renew_lease(db, "billing_reset_sweep", WORKER_ID, LEASE_TTL, checkpoint=None)
+        logger.info(f"Billing reset sweep finished: reset {total} users")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Billing reset sweep failed: {e}")
+    finally:
+        db.close()
+
+
+scheduler = BackgroundScheduler()
+# Windows are per user, so the sweep runs daily rather than once for everyone on the 1st
+scheduler.add_job(billing_reset_sweep, 'cron', hour=0, minute=5, misfire_grace_time=3600, coalesce=True)
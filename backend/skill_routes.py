@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from auth import get_current_user
+from database import get_db
+import crud
+from schemas import SkillCount, SkillSearchResponse, ResumeMatch, ErrorResponse
+
+router = APIRouter()
+
+MAX_SEARCH_SKILLS = 10
+MAX_PAGE_SIZE = 100
+
+
+@router.get("/skills/search", response_model=SkillSearchResponse, responses={400: {"model": ErrorResponse}}, tags=["Skills"])
+def search_resumes(
+    skill: list[str] = Query(..., description="Repeat to require several skills, e.g. ?skill=Python&skill=Docker"),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    before_id: int | None = Query(None, description="next_before_id from the previous page"),
+    user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Your resumes that list every one of the given skills, newest first."""
+    if len(skill) > MAX_SEARCH_SKILLS:
+        raise HTTPException(status_code=400, detail=f"Too many skills. Maximum is {MAX_SEARCH_SKILLS}.")
+    skill_ids = crud.find_skill_ids(db, skill)
+    if None in skill_ids.values():
+        # A skill no resume has ever listed can't match anything
+        return SkillSearchResponse(skills=skill, resumes=[])
+
+    rows = crud.search_resumes_by_skills(db, user.id, list(skill_ids.values()), limit, before_id)
+    resumes = [ResumeMatch(id=row.id, filename=row.filename) for row in rows]
+    next_before_id = resumes[-1].id if len(resumes) == limit else None
+    return SkillSearchResponse(skills=skill, resumes=resumes, next_before_id=next_before_id)
+
+
+@router.get("/skills/frequency", response_model=list[SkillCount], tags=["Skills"])
+def skill_frequency(
+    skill: list[str] | None = Query(None, description="Only count these skills"),
+    user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """How many of your resumes list each skill, most common first."""
+    skill_ids = None
+    if skill:
+        skill_ids = [skill_id for skill_id in crud.find_skill_ids(db, skill).values() if skill_id is not None]
+    rows = crud.get_user_skill_counts(db, user.id, skill_ids=skill_ids)
+    return [SkillCount(skill=row.name, count=row.resume_count) for row in rows]
+
+
+@router.get("/skills/top", response_model=list[SkillCount], tags=["Skills"])
+def top_skills(
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Your most common skills across all your resumes."""
+    rows = crud.get_user_skill_counts(db, user.id, limit=limit)
+    return [SkillCount(skill=row.name, count=row.resume_count) for row in rows]
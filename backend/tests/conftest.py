@@ -0,0 +1,39 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# Tests run from the backend directory against a throwaway SQLite database and a fake OpenAI key
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='extractor-tests-'), 'test.db')}")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+
+@pytest.fixture
+def db():
+    """A session on freshly created tables, dropped again after the test."""
+    from database import engine, Base, SessionLocal
+    import models  # noqa: F401 - registers the tables
+
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def user(db):
+    import crud
+
+    return crud.create_user(db, "jane@example.com", "not-a-real-hash")
+
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    """Rate limit counters live in process memory; start every test with a clean window."""
+    yield
+    from rate_limit import limiter
+    limiter.reset()
@@ -0,0 +1,22 @@
+import sqlite3
+import pytest
+from sqlalchemy import exc
+from database import InstrumentedQueuePool, pool_metrics
+
+
+def test_only_checkout_timeouts_count_as_timeouts():
+    pool = InstrumentedQueuePool(lambda: sqlite3.connect(":memory:"), pool_size=1, max_overflow=0, timeout=0.01)
+    held = pool.connect()
+    before = pool_metrics.timeouts
+    with pytest.raises(exc.TimeoutError):
+        pool.connect()
+    assert pool_metrics.timeouts == before + 1
+    held.close()
+
+    def refuse():
+        raise sqlite3.OperationalError("connection refused")
+
+    broken = InstrumentedQueuePool(refuse, pool_size=1, max_overflow=0, timeout=0.01)
+    with pytest.raises(sqlite3.OperationalError):
+        broken.connect()
+    assert pool_metrics.timeouts == before + 1
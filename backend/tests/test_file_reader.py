@@ -0,0 +1,47 @@
+import io
+import os
+import hashlib
+import zipfile
+import pytest
+from utils import file_reader
+
+
+def test_default_spool_threshold_is_below_the_upload_cap():
+    assert file_reader.PARSE_SPOOL_THRESHOLD_BYTES < file_reader.MAX_UPLOAD_BYTES
+
+
+def test_large_uploads_are_spooled_to_disk():
+    with file_reader._spooled(b"x" * 16, ".pdf") as path:
+        assert path is None
+    with file_reader._spooled(b"x" * (file_reader.PARSE_SPOOL_THRESHOLD_BYTES + 1), ".pdf") as path:
+        assert path.endswith(".pdf") and os.path.getsize(path) == file_reader.PARSE_SPOOL_THRESHOLD_BYTES + 1
+    assert not os.path.exists(path)
+
+
+def zip_of(entries: dict[str, bytes]) -> file_reader.IngestedUpload:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, content in entries.items():
+            zf.writestr(name, content)
+    content = buffer.getvalue()
+    return file_reader.IngestedUpload("resumes.zip", content, hashlib.sha256(content).hexdigest(), "zip")
+
+
+def test_archive_charge_is_replaced_by_its_entries():
+    pdf = b"%PDF-1.4\n" + b"x" * 4000
+    archive = zip_of({"a.pdf": pdf, "b.pdf": pdf})
+    budget = file_reader.UploadBudget(len(pdf) * 2)  # room for the entries, not for the entries and the archive
+    budget.take(len(archive.content))
+
+    uploads, errors = file_reader.expand_zip(archive, max_files=10, budget=budget)
+    assert [upload.filename for upload in uploads] == ["a.pdf", "b.pdf"] and errors == []
+    assert budget.used == len(pdf) * 2
+
+
+def test_archive_entries_over_the_budget_fail_the_batch():
+    pdf = b"%PDF-1.4\n" + b"x" * 4000
+    archive = zip_of({"a.pdf": pdf, "b.pdf": pdf})
+    budget = file_reader.UploadBudget(len(pdf) + 1)
+    budget.take(len(archive.content))
+    with pytest.raises(file_reader.BatchTooLarge):
+        file_reader.expand_zip(archive, max_files=10, budget=budget)
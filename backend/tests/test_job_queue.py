@@ -0,0 +1,61 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import crud
+import job_queue
+import job_routes
+from auth import get_current_user
+from database import get_db
+from models import AnalysisJob, User
+
+
+def test_callback_url_must_resolve_to_a_public_address():
+    assert asyncio.run(job_queue.check_callback_url("https://93.184.216.34/hook")) == "93.184.216.34"
+    for url in ("http://127.0.0.1/hook", "http://10.0.0.5/hook", "http://169.254.169.254/latest", "ftp://93.184.216.34/"):
+        with pytest.raises(ValueError):
+            asyncio.run(job_queue.check_callback_url(url))
+
+
+def test_callbacks_connect_to_the_checked_address():
+    url, headers, extensions = job_queue.pin_to_address("https://user:pw@hooks.example.com:8443/done?x=1", "93.184.216.34")
+    assert url == "https://user:pw@93.184.216.34:8443/done?x=1"
+    assert headers == {"Host": "hooks.example.com:8443"}
+    assert extensions == {"sni_hostname": "hooks.example.com"}
+
+    url, headers, extensions = job_queue.pin_to_address("http://hooks.example.com/done", "2606:2800:220:1::1")
+    assert url == "http://[2606:2800:220:1::1]/done"
+    assert headers == {"Host": "hooks.example.com"} and extensions == {}
+
+
+def test_failure_is_recorded_after_a_database_error(db, user, monkeypatch):
+    crud.create_analysis_job(db, job_id="job1", user_id=user.id, priority=0, filename="cv.pdf", kind="pdf",
+                             sha256="abc", content=b"%PDF-1.4", callback_url=None)
+
+    async def broken_analysis(session, upload, user_id):
+        session.add(AnalysisJob(id="bad", filename=None, kind="pdf", sha256="x"))
+        session.flush()  # IntegrityError leaves the session needing a rollback
+
+    monkeypatch.setattr(job_queue, "analyze_upload", broken_analysis)
+    assert asyncio.run(job_queue.JobQueue()._run_next())
+    db.expire_all()
+    job = db.get(AnalysisJob, "job1")
+    assert job.status == "queued" and "NOT NULL" in job.error  # retried, not stuck in "running"
+
+
+def test_quota_is_refunded_when_the_job_cannot_be_created(db, user, monkeypatch):
+    app = FastAPI()
+    app.include_router(job_routes.router, prefix="/api")
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=user.id, is_verified=True, subscription_status=None)
+    app.dependency_overrides[get_db] = lambda: db
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(job_routes, "create_analysis_job", fail)
+    with pytest.raises(RuntimeError):
+        TestClient(app).post("/api/jobs", files={"file": ("cv.pdf", b"%PDF-1.4\n%%EOF", "application/pdf")})
+    db.expire_all()
+    charged = db.get(User, user.id)
+    assert (charged.api_calls_this_month or 0, charged.free_trial_calls or 0) == (0, 0)
@@ -0,0 +1,64 @@
+import time
+import asyncio
+from types import SimpleNamespace
+import pytest
+from utils.llm_gateway import CircuitBreaker, CircuitOpenError, LLMGateway
+
+
+class FakeCompletions:
+    def __init__(self, outcome):
+        self.outcome = outcome
+        self.calls = 0
+
+    async def create(self, **params):
+        self.calls += 1
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+
+def make_gateway(outcome) -> LLMGateway:
+    return LLMGateway(client=SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(outcome))))
+
+
+def half_open(breaker: CircuitBreaker):
+    breaker.failures = breaker.failure_threshold
+    breaker.opened_at = time.monotonic() - breaker.cooldown
+
+
+def test_breaker_opens_after_threshold_and_allows_one_probe():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=30)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    half_open(breaker)
+    assert breaker.allow()
+    assert not breaker.allow()  # only one probe at a time
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_unexpected_error_during_probe_releases_it():
+    gateway = make_gateway(ValueError("malformed response"))
+    half_open(gateway.breaker)
+
+    with pytest.raises(ValueError):
+        asyncio.run(gateway.complete(model="m", messages=[]))
+    assert not gateway.breaker._probing
+    assert gateway.breaker.state == "open"  # the failed probe starts another cooldown
+
+    half_open(gateway.breaker)
+    gateway.client.chat.completions.outcome = SimpleNamespace(usage=None, choices=[])
+    asyncio.run(gateway.complete(model="m", messages=[]))
+    assert gateway.breaker.state == "closed"
+
+
+def test_open_breaker_short_circuits_without_calling_the_provider():
+    gateway = make_gateway(SimpleNamespace(usage=None, choices=[]))
+    gateway.breaker.opened_at = time.monotonic()
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(gateway.complete(model="m", messages=[]))
+    assert gateway.client.chat.completions.calls == 0
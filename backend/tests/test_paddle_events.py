@@ -0,0 +1,46 @@
+import json
+from datetime import datetime
+from types import SimpleNamespace
+from models import User
+from paddle_events import apply_event, parse_timestamp
+
+
+def event(event_type: str, occurred_at: datetime, user_id: int, **data):
+    payload = {"event_type": event_type, "data": {"custom_data": {"user_id": str(user_id)}, **data}}
+    return SimpleNamespace(event_id=f"evt_{event_type}_{occurred_at:%H%M%S}", event_type=event_type,
+                           occurred_at=occurred_at, user_id=user_id, payload=json.dumps(payload))
+
+
+def completed(occurred_at: datetime, user_id: int):
+    return event("transaction.completed", occurred_at, user_id, status="completed",
+                 items=[{"price": {"type": "recurring"}}])
+
+
+def status_of(db, user_id: int) -> str:
+    db.expire_all()
+    return db.get(User, user_id).subscription_status
+
+
+def test_events_apply_in_order(db, user):
+    assert apply_event(db, completed(datetime(2025, 1, 1, 10), user.id)) == "applied"
+    assert status_of(db, user.id) == "active"
+    assert apply_event(db, event("subscription.canceled", datetime(2025, 2, 1, 10), user.id)) == "applied"
+    assert status_of(db, user.id) == "canceled"
+
+
+def test_older_event_arriving_late_is_skipped(db, user):
+    assert apply_event(db, event("subscription.canceled", datetime(2025, 2, 1, 10), user.id)) == "applied"
+    # A delayed transaction.completed from before the cancellation must not reactivate the user
+    assert apply_event(db, completed(datetime(2025, 1, 1, 10), user.id)) == "ignored"
+    assert status_of(db, user.id) == "canceled"
+
+
+def test_reapplying_an_event_is_a_no_op(db, user):
+    activation = completed(datetime(2025, 1, 1, 10), user.id)
+    assert apply_event(db, activation) == "applied"
+    assert apply_event(db, activation) == "ignored"
+
+
+def test_parse_timestamp_normalizes_to_naive_utc():
+    assert parse_timestamp("2024-04-12T10:18:49.621022Z") == datetime(2024, 4, 12, 10, 18, 49, 621022)
+    assert parse_timestamp("2024-04-12T12:18:49.621022123+02:00") == datetime(2024, 4, 12, 10, 18, 49, 621022)
@@ -0,0 +1,35 @@
+import itertools
+import pytest
+from fastapi import HTTPException
+from limits import parse
+import rate_limit
+
+user_ids = itertools.count(1)
+
+
+def test_upload_cost_weights_by_format():
+    assert rate_limit.upload_cost(["docx"]) == 1
+    assert rate_limit.upload_cost(["docx", "pdf", "png"]) == 8
+    assert rate_limit.upload_cost(["unknown"]) == 1
+
+
+def test_charges_accumulate_until_the_limit():
+    user_id = next(user_ids)
+    limit = parse(rate_limit.UPLOAD_RATE_LIMIT).amount
+    rate_limit.charge_upload(user_id, limit - 1)
+    rate_limit.charge_upload(user_id, 1)
+
+    with pytest.raises(HTTPException) as error:
+        rate_limit.charge_upload(user_id, 1)
+    assert error.value.status_code == 429
+    assert int(error.value.headers["Retry-After"]) >= 1
+
+
+def test_batch_heavier_than_the_limit_is_rejected_not_clamped():
+    user_id = next(user_ids)
+    limit = parse(rate_limit.UPLOAD_RATE_LIMIT).amount
+    with pytest.raises(HTTPException) as error:
+        rate_limit.charge_upload(user_id, rate_limit.upload_cost(["png"] * 50))
+    assert error.value.status_code == 429
+    assert not error.value.headers  # waiting wouldn't help
+    rate_limit.charge_upload(user_id, limit)  # nothing was counted for the rejected batch
@@ -0,0 +1,44 @@
+from result_cache import ResultCache, file_key, text_key, KEY_NAMESPACE
+from utils.skill_extractor import AnalysisResult
+from utils.section_diff import SectionIndex
+
+
+def test_keys_are_namespaced_by_mode_and_prompt_version():
+    assert file_key("abc") == f"file:{KEY_NAMESPACE}:abc"
+    assert text_key("x").startswith(f"text:{KEY_NAMESPACE}:")
+
+
+def test_text_key_ignores_whitespace_and_unicode_form():
+    assert text_key("Python  developer\n\nFastAPI") == text_key("Python developer FastAPI")
+    assert text_key("ﬁnance") == text_key("finance")  # NFKC folds the ligature
+    assert text_key("Python developer") != text_key("Java developer")
+
+
+def test_result_is_served_from_memory_then_database(db):
+    cache = ResultCache()
+    sections = SectionIndex(["h1"], [["Python"]], [["Leadership"]])
+    cache.set(db, ["k1", "k2"], AnalysisResult(["Python", "Leadership"], "Good.", text_hash="t1", sections=sections))
+
+    assert cache.get(db, "k1").skills == ["Python", "Leadership"]
+    assert cache.counters["memory_hits"] == 1
+
+    cache.memory.clear()
+    from_db = cache.get(db, "k2")
+    assert cache.counters["db_hits"] == 1
+    assert (from_db.skills, from_db.feedback, from_db.text_hash) == (["Python", "Leadership"], "Good.", "t1")
+    assert from_db.sections == sections
+
+
+def test_failed_results_are_not_cached(db):
+    cache = ResultCache()
+    cache.set(db, ["k"], AnalysisResult([], "Unable to generate feedback.", ok=False))
+    assert cache.get(db, "k") is None
+    assert cache.counters["writes"] == 0
+
+
+def test_cached_copy_is_not_shared_with_the_caller(db):
+    cache = ResultCache()
+    result = AnalysisResult(["Python"], "Good.")
+    cache.set(db, ["k"], result)
+    result.skills.append("Docker")
+    assert cache.get(db, "k").skills == ["Python"]
@@ -0,0 +1,66 @@
+from types import SimpleNamespace
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import crud
+import resume_routes
+from auth import get_current_user
+from database import get_db
+
+
+@pytest.fixture
+def client(db, user):
+    app = FastAPI()
+    app.include_router(resume_routes.router, prefix="/api")
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=user.id, is_verified=True)
+    app.dependency_overrides[get_db] = lambda: db
+    return TestClient(app)
+
+
+def add_resumes(db, user_id: int, count: int) -> list[int]:
+    return [crud.create_resume(db, f"resume-{i}.pdf", "Python, SQL", user_id, feedback="Good.").id for i in range(count)]
+
+
+def test_history_pages_with_before_id(client, db, user):
+    ids = add_resumes(db, user.id, 5)
+
+    first = client.get("/api/resumes", params={"limit": 2}).json()
+    assert [r["id"] for r in first["resumes"]] == ids[:-3:-1]
+    assert first["next_before_id"] == ids[3]
+
+    second = client.get("/api/resumes", params={"limit": 2, "before_id": first["next_before_id"]}).json()
+    assert [r["id"] for r in second["resumes"]] == [ids[2], ids[1]]
+
+    last = client.get("/api/resumes", params={"limit": 2, "before_id": second["next_before_id"]}).json()
+    assert [r["id"] for r in last["resumes"]] == [ids[0]]
+    assert last["next_before_id"] is None
+
+
+def test_feedback_only_on_request(client, db, user):
+    add_resumes(db, user.id, 1)
+    assert client.get("/api/resumes").json()["resumes"][0]["feedback"] is None
+    assert client.get("/api/resumes", params={"include_feedback": True}).json()["resumes"][0]["feedback"] == "Good."
+
+
+def test_etag_answers_304_until_the_list_changes(client, db, user):
+    add_resumes(db, user.id, 2)
+    response = client.get("/api/resumes")
+    etag = response.headers["etag"]
+
+    cached = client.get("/api/resumes", headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.content == b""
+
+    add_resumes(db, user.id, 1)
+    changed = client.get("/api/resumes", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+
+
+def test_single_resume_is_scoped_to_its_owner(client, db, user):
+    other = crud.create_user(db, "other@example.com", "not-a-real-hash")
+    (mine,) = add_resumes(db, user.id, 1)
+    (theirs,) = add_resumes(db, other.id, 1)
+
+    response = client.get(f"/api/resumes/{mine}")
+    assert response.status_code == 200 and response.json()["feedback"] == "Good."
+    assert client.get(f"/api/resumes/{mine}", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+    assert client.get(f"/api/resumes/{theirs}").status_code == 404
@@ -0,0 +1,28 @@
+import json
+from utils.section_diff import SectionIndex, build_index, changed_sections, merge, overlap, section_hash
+
+
+def test_skills_are_attributed_to_the_sections_that_name_them():
+    index = build_index(["Built APIs in Python", "Managed a team of five"], ["Python", "Leadership"])
+    assert index.skills == [["Python"], []]
+    assert index.inferred == [["Leadership"], ["Leadership"]]
+    assert index.all_skills() == ["Python", "Leadership"]
+
+
+def test_merge_keeps_unchanged_sections_and_drops_removed_ones():
+    parent = SectionIndex(["a", "b", "c"], [["Python"], ["SQL"], ["Excel"]], [[], [], ["Leadership"]])
+    hashes = ["a", "d", "b"]  # "c" was deleted, "d" is new
+    assert overlap(parent, hashes) == 2 / 3
+    assert changed_sections(parent, hashes) == [1]
+
+    merged = merge(parent, hashes, [1], SectionIndex(["d"], [["Docker"]], [["Mentoring"]]))
+    assert merged.skills == [["Python"], ["Docker"], ["SQL"]]
+    assert merged.all_skills() == ["Python", "Docker", "SQL", "Mentoring"]  # Excel and Leadership went with "c"
+
+
+def test_from_json_reads_the_older_flat_inferred_format():
+    hashes = [section_hash("one"), section_hash("two")]
+    old = json.dumps({"hashes": hashes, "skills": [["Python"], []], "inferred": ["Leadership"]})
+    assert SectionIndex.from_json(old).inferred == [["Leadership"], ["Leadership"]]
+    index = SectionIndex(hashes, [["Python"], []], [[], ["Leadership"]])
+    assert SectionIndex.from_json(index.to_json()) == index
@@ -0,0 +1,31 @@
+import pytest
+from utils.text_compactor import normalize_lines, strip_contact
+
+
+@pytest.mark.parametrize("line", [
+    "Senior Engineer, Acme 2015 - 2019",
+    "Acme Corp (2018 - 2021)",
+    "Software Engineer | 2019-2023",
+    "GPA 3.8 (2012 - 2016)",
+    "2018-01 - 2021-03",
+    "01.2018 - 03.2021",
+    "Data Analyst, 2018-01-15 - 2021-03-31",
+    "Call 123-4567 after 5pm",
+])
+def test_strip_contact_keeps_dates_and_short_numbers(line):
+    assert strip_contact(line) == line
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("Phone: +1 (555) 123-4567", ""),
+    ("+44 20 7946 0958", ""),
+    ("Jane Doe | 555-123-4567 | jane@example.com", "Jane Doe"),
+    ("Tel: 555.123.4567", ""),
+])
+def test_strip_contact_removes_phone_numbers(line, expected):
+    assert strip_contact(line) == expected
+
+
+def test_normalize_lines_drops_page_numbers_but_keeps_dates():
+    text = "Experience\n2019\n05/2019\nPage 2 of 3\n2 / 3\n3\n- 2021 -\nEducation"
+    assert normalize_lines(text) == ["Experience", "2019", "05/2019", "- 2021 -", "Education"]
@@ -1,41 +1,106 @@
-import os
-import logging
-logger = logging.getLogger("email_utils")
-logging.basicConfig(level=logging.INFO)
-from email.mime.text import MIMEText
-import smtplib
-
-def send_password_reset_email(email: str, token: str):
-    base_url = os.getenv("API_BASE_URL", "http://localhost:8000")
-    link = f"{base_url}/reset-password?token={token}"
-    body = f"Click this link to reset your password:\n{link}"
-    msg = MIMEText(body)
-    msg["Subject"] = "Reset your password"
-    msg["From"] = os.getenv("EMAIL_ADDRESS")
-    msg["To"] = email
-    try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as smtp:
-            smtp.login(os.getenv("EMAIL_ADDRESS"), os.getenv("EMAIL_PASSWORD"))
-            smtp.send_message(msg)
-    except smtplib.SMTPException as e:
-        logger.error(f"SMTP error occurred: {e}")
-    except Exception as e:
-        logger.error(f"Error sending password reset email: {e}")
-
-
-def send_verification_email(email: str, token: str):
-    base_url = os.getenv("API_BASE_URL", "http://localhost:8000")
-    link = f"{base_url}/verify-email?token={token}"
-    body = f"Click this link to verify your email:\n{link}"
-    msg = MIMEText(body)
-    msg["Subject"] = "Verify your email"
-    msg["From"] = os.getenv("EMAIL_ADDRESS")
-    msg["To"] = email
-    try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as smtp:
-            smtp.login(os.getenv("EMAIL_ADDRESS"), os.getenv("EMAIL_PASSWORD"))
-            smtp.send_message(msg)
-    except smtplib.SMTPException as e:
-        logger.error(f"SMTP error occurred: {e}")
-    except Exception as e:
-        logger.error(f"Error sending verification email: {e}")
+import os
+import smtplib
+import logging
+import time
+from string import Template
+from email.message import EmailMessage
+
+logger = logging.getLogger("email_utils")
+
+# Defaults match the original Gmail setup. For local testing, run
+#   python -m aiosmtpd -n -l localhost:8025
+# and set SMTP_HOST=localhost SMTP_PORT=8025 SMTP_USE_SSL=false SMTP_USERNAME=
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_USE_SSL = os.getenv("SMTP_USE_SSL", "true").lower() == "true"
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "false").lower() == "true"  # for port 587 when SMTP_USE_SSL is false
+SMTP_USERNAME = os.getenv("SMTP_USERNAME", os.getenv("EMAIL_ADDRESS", ""))
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", os.getenv("EMAIL_PASSWORD", ""))
+SMTP_TIMEOUT_SECONDS = float(os.getenv("SMTP_TIMEOUT_SECONDS", "15"))
+# Close the connection after this long unused, before the server drops it on us
+SMTP_IDLE_SECONDS = float(os.getenv("SMTP_IDLE_SECONDS", "60"))
+EMAIL_FROM = os.getenv("EMAIL_FROM", os.getenv("EMAIL_ADDRESS", ""))
+API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
+
+# name -> (subject, body), compiled once at import
+TEMPLATES = {
+    "verify_email": (
+        Template("Verify your email"),
+        Template("Click this link to verify your email:\n$link"),
+    ),
+    "password_reset": (
+        Template("Reset your password"),
+        Template("Click this link to reset your password:\n$link"),
+    ),
+}
+
+
+def render_email(template: str, **params) -> tuple[str, str]:
+    """Returns (subject, body) for a template; raises KeyError for unknown templates or missing params."""
+    subject, body = TEMPLATES[template]
+    return subject.substitute(params), body.substitute(params)
+
+
+def verification_link(token: str) -> str:
+    return f"{API_BASE_URL}/verify-email?token={token}"
+
+
+def password_reset_link(token: str) -> str:
+    return f"{API_BASE_URL}/reset-password?token={token}"
+
+
+def build_message(to_address: str, subject: str, body: str) -> EmailMessage:
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = EMAIL_FROM
+    msg["To"] = to_address
+    msg.set_content(body)
+    return msg
+
+
+class SMTPConnection:
+    """
+    One logged-in SMTP session reused across messages. It reconnects
+    transparently when the server has dropped it, and closes itself after
+    SMTP_IDLE_SECONDS without use. Not thread-safe; owned by the mail sender.
+    """
+
+    def __init__(self):
+        self._smtp = None
+        self._last_used = 0.0
+        self.connects = 0
+
+    def _connect(self):
+        if SMTP_USE_SSL:
+            smtp = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT_SECONDS)
+        else:
+            smtp = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT_SECONDS)
+            if SMTP_STARTTLS:
+                smtp.starttls()
+        if SMTP_USERNAME:
+            smtp.login(SMTP_USERNAME, SMTP_PASSWORD)
+        self._smtp = smtp
+        self.connects += 1
+
+    def send(self, msg: EmailMessage):
+        if self._smtp is not None and time.monotonic() - self._last_used > SMTP_IDLE_SECONDS:
+            self.close()
+        if self._smtp is None:
+            self._connect()
+        try:
+            self._smtp.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # Dropped while idle: one fresh connection, then give up
+            self.close()
+            self._connect()
+            self._smtp.send_message(msg)
+        self._last_used = time.monotonic()
+
+    def close(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except Exception:
+            pass
+        self._smtp = None
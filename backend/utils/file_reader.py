@@ -1,41 +1,192 @@
-import os
-import fitz  # PyMuPDF
-import docx
-import pytesseract
-from PIL import Image
-from fastapi import UploadFile
-import tempfile
-
-async def read_resume(file: UploadFile) -> str:
-    ext = os.path.splitext(file.filename)[1].lower()
-    content = await file.read()
-
-    if ext == ".pdf":
-        with tempfile.TemporaryDirectory() as tmpdir:
-            temp_path = os.path.join(tmpdir, "temp_resume.pdf")
-            with open(temp_path, "wb") as f:
-                f.write(content)
-            doc = fitz.open(temp_path)
-            text = ""
-            for page in doc:
-                text += page.get_text()
-            doc.close()  # IMPORTANT: close file before cleanup!
-            return text
-
-    elif ext == ".docx":
-        with tempfile.TemporaryDirectory() as tmpdir:
-            temp_path = os.path.join(tmpdir, "temp_resume.docx")
-            with open(temp_path, "wb") as f:
-                f.write(content)
-            doc = docx.Document(temp_path)
-            return "\n".join([para.text for para in doc.paragraphs])
-
-    elif ext in [".png", ".jpg", ".jpeg"]:
-        with tempfile.TemporaryDirectory() as tmpdir:
-            temp_path = os.path.join(tmpdir, "temp_resume_img.png")
-            with open(temp_path, "wb") as f:
-                f.write(content)
-            img = Image.open(temp_path)
-            return pytesseract.image_to_string(img)
-
-    return ""
+import os
+import io
+import hashlib
+import zipfile
+from dataclasses import dataclass
+from fastapi import UploadFile, HTTPException
+from contextlib import contextmanager
+from utils.pdf_extractor import extract_pages
+from utils.ocr import HEIF_AVAILABLE
+from utils import metrics
+import tempfile
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+# Uploads up to this size are parsed straight from memory; larger ones are
+# spooled to a temp file so the parsers can page through them from disk.
+# Defaults to half the upload cap so the disk path is reachable out of the box.
+PARSE_SPOOL_THRESHOLD_BYTES = int(os.getenv("PARSE_SPOOL_THRESHOLD_BYTES", str(MAX_UPLOAD_BYTES // 2)))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+IMAGE_FORMATS = ("png", "jpeg", "tiff") + (("heic",) if HEIF_AVAILABLE else ())
+SUPPORTED_FORMATS = ("pdf", "docx") + IMAGE_FORMATS
+FORMAT_EXTENSIONS = {"pdf": ".pdf", "docx": ".docx", "png": ".png", "jpeg": ".jpg", "tiff": ".tif", "heic": ".heic"}
+UNSUPPORTED_TYPE_DETAIL = "Unsupported file type. Upload a PDF, DOCX or image (PNG, JPEG, TIFF" + (", HEIC" if HEIF_AVAILABLE else "") + ") file."
+# ISO base media "ftyp" brands used by HEIC/HEIF photos
+HEIF_BRANDS = (b"heic", b"heix", b"hevc", b"hevx", b"heim", b"heis", b"mif1", b"msf1")
+
+
+@dataclass
+class IngestedUpload:
+    filename: str
+    content: bytes
+    sha256: str
+    kind: str
+
+
+class BatchTooLarge(HTTPException):
+    """The files of one request together went over their shared byte budget."""
+
+
+class UploadBudget:
+    """Bytes a multi-file request may still hold in memory, shared by all of its files."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.used = 0
+
+    def take(self, size: int):
+        self.used += size
+        if self.used > self.max_bytes:
+            raise BatchTooLarge(status_code=413, detail=f"Batch too large. Maximum is {self.max_bytes // (1024 * 1024)} MB per batch.")
+
+    def release(self, size: int):
+        self.used -= size
+
+
+def sniff_format(head: bytes) -> str | None:
+    """Detects the document type from its leading bytes rather than the filename."""
+    if b"%PDF-" in head[:1024]:
+        return "pdf"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith((b"II*\x00", b"MM\x00*")):
+        return "tiff"
+    if head[4:8] == b"ftyp" and head[8:12] in HEIF_BRANDS:
+        return "heic"
+    if head.startswith(b"PK\x03\x04"):
+        # DOCX is a zip container; its first entries are the content-types manifest and word/ parts
+        if b"[Content_Types].xml" in head or b"word/" in head:
+            return "docx"
+        return "zip"
+    return None
+
+
+async def ingest_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES, allowed_formats=SUPPORTED_FORMATS,
+                        archive_max_bytes: int | None = None, budget: UploadBudget | None = None) -> IngestedUpload:
+    """
+    Reads an upload in chunks, hashing as it goes. Raises 413 as soon as the
+    byte cap is crossed and 415 as soon as the first chunk has an unsupported
+    format, so nothing downstream ever sees those files. Zip archives, when
+    allowed, are capped at archive_max_bytes instead of max_bytes. A budget
+    is charged chunk by chunk and raises BatchTooLarge once it runs out.
+    """
+    limit = max(max_bytes, archive_max_bytes or 0)  # the format isn't known yet
+    if file.size is not None and file.size > limit:
+        raise HTTPException(status_code=413, detail=f"File too large. Maximum size is {limit // (1024 * 1024)} MB.")
+
+    with metrics.stage("read"):
+        digest = hashlib.sha256()
+        chunks = []
+        total = 0
+        kind = None
+        try:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                if kind is None:
+                    kind = sniff_format(chunk)
+                    if kind not in allowed_formats:
+                        raise HTTPException(status_code=415, detail=UNSUPPORTED_TYPE_DETAIL)
+                    limit = archive_max_bytes if kind == "zip" and archive_max_bytes is not None else max_bytes
+                total += len(chunk)
+                if total > limit:
+                    raise HTTPException(status_code=413, detail=f"File too large. Maximum size is {limit // (1024 * 1024)} MB.")
+                if budget is not None:
+                    budget.take(len(chunk))
+                digest.update(chunk)
+                chunks.append(chunk)
+        except HTTPException:
+            if budget is not None:
+                budget.release(sum(len(chunk) for chunk in chunks))  # rejected files are dropped, not held
+            raise
+
+    if total == 0:
+        raise HTTPException(status_code=400, detail="Uploaded file is empty")
+    return IngestedUpload(filename=file.filename, content=b"".join(chunks), sha256=digest.hexdigest(), kind=kind)
+
+
+def expand_zip(archive: IngestedUpload, max_files: int, max_bytes: int = MAX_UPLOAD_BYTES,
+               budget: UploadBudget | None = None) -> tuple[list[IngestedUpload], list[dict]]:
+    """
+    Unpacks a zip of resumes into individual uploads. Entries are sniffed and
+    size-checked like direct uploads; the declared uncompressed size is
+    checked before anything is decompressed. If a budget is given, the
+    archive's own bytes (charged while it was read) are released first and
+    the unpacked entries are charged in their place.
+    """
+    if budget is not None:
+        budget.release(len(archive.content))
+    uploads, errors = [], []
+    try:
+        with zipfile.ZipFile(io.BytesIO(archive.content)) as zf:
+            entries = [info for info in zf.infolist() if not info.is_dir() and not os.path.basename(info.filename).startswith(".")]
+            if len(entries) > max_files:
+                raise HTTPException(status_code=400, detail=f"Too many files in archive. Maximum is {max_files}.")
+            for info in entries:
+                name = os.path.basename(info.filename)
+                if info.file_size > max_bytes:
+                    errors.append({"filename": name, "status": 413, "detail": "File too large."})
+                    continue
+                with zf.open(info) as member:
+                    content = member.read(max_bytes + 1)
+                kind = sniff_format(content[:UPLOAD_CHUNK_SIZE])
+                if len(content) > max_bytes:
+                    errors.append({"filename": name, "status": 413, "detail": "File too large."})
+                elif kind not in SUPPORTED_FORMATS:
+                    errors.append({"filename": name, "status": 415, "detail": "Unsupported file type."})
+                else:
+                    if budget is not None:
+                        budget.take(len(content))
+                    uploads.append(IngestedUpload(filename=name, content=content, sha256=hashlib.sha256(content).hexdigest(), kind=kind))
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="Invalid zip archive")
+    return uploads, errors
+
+
+async def read_resume(file: UploadFile) -> str:
+    upload = await ingest_upload(file)
+    return parse_resume(upload.kind, upload.content)
+
+
+def parse_resume(kind: str, content: bytes) -> str:
+    # Parsers are imported lazily so the web process never loads them for rejected uploads
+    if kind == "pdf":
+        with _spooled(content, ".pdf") as path:
+            texts, _ = extract_pages(path or content)
+            return "".join(texts)
+
+    elif kind == "docx":
+        import docx
+        with _spooled(content, ".docx") as path:
+            doc = docx.Document(path or io.BytesIO(content))
+            return "\n".join([para.text for para in doc.paragraphs])
+
+    elif kind in IMAGE_FORMATS:
+        from utils.ocr import ocr_image
+        with _spooled(content, FORMAT_EXTENSIONS[kind]) as path:
+            return ocr_image(path or content)
+
+    return ""
+
+
+@contextmanager
+def _spooled(content: bytes, suffix: str):
+    """Yields None for in-memory parsing, or a temp file path for uploads above the spool threshold."""
+    if len(content) <= PARSE_SPOOL_THRESHOLD_BYTES:
+        yield None
+        return
+    with tempfile.TemporaryDirectory() as tmpdir:
+        temp_path = os.path.join(tmpdir, "temp_resume" + suffix)
+        with open(temp_path, "wb") as f:
+            f.write(content)
+        yield temp_path
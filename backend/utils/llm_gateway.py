@@ -0,0 +1,216 @@
+"""
+Resilient wrapper around the OpenAI chat completions API.
+
+Every call gets an overall deadline, jittered retries on 429/5xx/timeouts,
+an optional hedged second request once the first is slower than the recent
+latency percentile, and single-flight coalescing of identical in-flight
+requests. A circuit breaker fails fast while the provider is unhealthy.
+Point OPENAI_BASE_URL at a local stub server to exercise it offline.
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import logging
+from collections import deque
+import openai
+from openai import AsyncOpenAI
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "30"))
+LLM_ATTEMPT_TIMEOUT_SECONDS = float(os.getenv("LLM_ATTEMPT_TIMEOUT_SECONDS", "20"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_DELAY_SECONDS = float(os.getenv("LLM_RETRY_BASE_DELAY_SECONDS", "0.5"))
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError, asyncio.TimeoutError)
+
+
+class LLMUnavailableError(Exception):
+    """The provider could not produce a response within the deadline and retry budget."""
+
+
+class CircuitOpenError(LLMUnavailableError):
+    """The circuit breaker is open, so the call was not attempted."""
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures, then lets a single probe through once the cooldown has passed."""
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURE_THRESHOLD, cooldown: float = LLM_BREAKER_COOLDOWN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def release_probe(self):
+        """Called when a probe is cancelled without an outcome, so the next call can probe instead."""
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.failures >= self.failure_threshold or self.opened_at is not None:
+            self.opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    def __init__(self, size: int = 200):
+        self.samples = deque(maxlen=size)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, p: float) -> float | None:
+        if len(self.samples) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+class LLMGateway:
+    def __init__(self, client: AsyncOpenAI | None = None):
+        self.client = client or AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=os.getenv("OPENAI_BASE_URL") or None,
+            max_retries=0,  # retries are handled here, with jitter and a shared deadline
+            timeout=LLM_ATTEMPT_TIMEOUT_SECONDS,
+        )
+        self.breaker = CircuitBreaker()
+        self.latency = LatencyTracker()
+        self._inflight = {}
+        self.counters = {"calls": 0, "coalesced": 0, "retries": 0, "hedges": 0, "failures": 0, "short_circuited": 0}
+
+    async def complete(self, **params):
+        """chat.completions.create with deadline, retries, hedging, coalescing and circuit breaking."""
+        key = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.counters["coalesced"] += 1
+            return await asyncio.shield(inflight)
+
+        task = asyncio.ensure_future(self._call_with_retries(params))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded so one caller disconnecting doesn't cancel the call for the others
+        return await asyncio.shield(task)
+
+    async def _call_with_retries(self, params: dict):
+        if not self.breaker.allow():
+            self.counters["short_circuited"] += 1
+            raise CircuitOpenError("LLM circuit breaker is open")
+
+        self.counters["calls"] += 1
+        deadline = time.monotonic() + LLM_DEADLINE_SECONDS
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                response = await asyncio.wait_for(self._hedged(params), timeout=min(remaining, LLM_ATTEMPT_TIMEOUT_SECONDS))
+                self.breaker.record_success()
+                return response
+            except RETRYABLE_ERRORS as e:
+                delay = random.uniform(0, LLM_RETRY_BASE_DELAY_SECONDS * 2 ** attempt)  # full jitter
+                if attempt >= LLM_MAX_RETRIES or time.monotonic() + delay >= deadline:
+                    self.counters["failures"] += 1
+                    self.breaker.record_failure()
+                    raise LLMUnavailableError(f"LLM call failed after {attempt + 1} attempts: {e}") from e
+                attempt += 1
+                self.counters["retries"] += 1
+                logger.warning("Retrying LLM call (attempt %d) after %s", attempt + 1, type(e).__name__)
+                await asyncio.sleep(delay)
+            except openai.APIStatusError:
+                # Other 4xx responses are our fault, not a sign the provider is unhealthy
+                self.counters["failures"] += 1
+                self.breaker.record_success()
+                raise
+            except asyncio.CancelledError:
+                self.breaker.release_probe()
+                raise
+            except Exception:
+                # Anything else (e.g. a malformed response) also counts against the provider,
+                # and must not leave a half-open probe claimed forever
+                self.counters["failures"] += 1
+                self.breaker.record_failure()
+                raise
+
+    async def _timed_call(self, params: dict):
+        model = params.get("model", "")
+        start = time.monotonic()
+        try:
+            with metrics.stage("llm", model=model):
+                response = await self.client.chat.completions.create(**params)
+        except asyncio.CancelledError:
+            metrics.LLM_REQUESTS.labels(model, "cancelled").inc()  # lost a hedge race or hit the deadline
+            raise
+        except Exception:
+            metrics.LLM_REQUESTS.labels(model, "error").inc()
+            raise
+        self.latency.record(time.monotonic() - start)
+        metrics.record_llm_response(model, response)
+        return response
+
+    async def _hedged(self, params: dict):
+        hedge_after = self.latency.percentile(LLM_HEDGE_PERCENTILE) if LLM_HEDGE_ENABLED else None
+        if hedge_after is None:
+            return await self._timed_call(params)
+
+        tasks = [asyncio.create_task(self._timed_call(params))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if done:
+                return tasks[0].result()
+
+            self.counters["hedges"] += 1
+            tasks.append(asyncio.create_task(self._timed_call(params)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            # Both failed: surface the original request's error
+            return tasks[0].result()
+        finally:
+            # Also runs when the attempt timeout cancels us, so no request outlives its attempt
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> dict:
+        p50 = self.latency.percentile(0.5)
+        p95 = self.latency.percentile(0.95)
+        return {**self.counters, "breaker": self.breaker.state, "inflight": len(self._inflight),
+                "latency_p50": round(p50, 3) if p50 else None, "latency_p95": round(p95, 3) if p95 else None}
+
+
+gateway = LLMGateway()
@@ -0,0 +1,163 @@
+"""
+Prometheus metrics and optional OpenTelemetry tracing.
+
+stage() times one step of the resume pipeline (read, parse, ocr, compact, llm,
+db) into the resume_stage_seconds histogram. With tracing on, it also opens a
+span under the request's span. The per-request breakdown is kept as well, so
+a sampled DEBUG line shows where a slow request spent its time without
+logging every request.
+
+Metrics are per process. OCR runs in the parse worker processes when
+EXECUTOR_MODE=process, and several uvicorn workers each keep their own
+counts. For either setup, point PROMETHEUS_MULTIPROC_DIR at an empty directory
+shared by all processes, so /metrics reports their sum.
+
+Tracing is enabled when OTEL_EXPORTER_OTLP_ENDPOINT is set, e.g. to a local
+collector at http://localhost:4318. It needs the opentelemetry-sdk and
+opentelemetry-exporter-otlp-proto-http packages.
+"""
+import os
+import time
+import random
+import logging
+import contextvars
+from contextlib import contextmanager, nullcontext
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client import multiprocess
+
+logger = logging.getLogger("metrics")
+
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+OTEL_EXPORTER_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "extractor-api")
+OTEL_TRACE_SAMPLE_RATE = float(os.getenv("OTEL_TRACE_SAMPLE_RATE", "1.0"))
+# Share of requests whose stage breakdown is logged when the log level is DEBUG
+DEBUG_LOG_SAMPLE_RATE = float(os.getenv("DEBUG_LOG_SAMPLE_RATE", "0.01"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+STAGE_SECONDS = Histogram("resume_stage_seconds", "Time spent in each resume pipeline stage", ["stage"], buckets=LATENCY_BUCKETS)
+STAGE_WAIT_SECONDS = Histogram("resume_stage_wait_seconds", "Time spent waiting for a parse or LLM slot", ["stage"], buckets=LATENCY_BUCKETS)
+STAGE_IN_FLIGHT = Gauge("resume_stage_in_flight", "Work queued for or running in a pipeline stage", ["stage", "state"], multiprocess_mode="livesum")
+OCR_STEP_SECONDS = Histogram("ocr_step_seconds", "Time spent in each OCR step", ["step"], buckets=LATENCY_BUCKETS)
+HTTP_REQUEST_SECONDS = Histogram("http_request_seconds", "HTTP request latency", ["method", "route", "status"], buckets=LATENCY_BUCKETS)
+LLM_REQUESTS = Counter("llm_requests", "LLM API requests, retries and hedges included", ["model", "outcome"])
+LLM_TOKENS = Counter("llm_tokens", "Tokens billed by the LLM API", ["model", "kind"])
+PROMPT_TOKENS_SAVED = Counter("prompt_tokens_saved", "Prompt tokens removed by compaction before the LLM call")
+DB_POOL_CONNECTIONS = Gauge("db_pool_connections", "Database pool connections by state", ["state"], multiprocess_mode="livesum")
+DB_POOL_WAIT_SECONDS = Histogram("db_pool_wait_seconds", "Time spent waiting to check out a database connection", buckets=LATENCY_BUCKETS)
+DB_POOL_EVENTS = Counter("db_pool_events", "Database pool connects, invalidations and checkout timeouts", ["event"])
+
+try:
+    from opentelemetry import trace, propagate
+    OTEL_AVAILABLE = True
+except ImportError:
+    OTEL_AVAILABLE = False
+
+_tracer = None
+_tracer_provider = None
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def setup_tracing():
+    """Starts exporting spans over OTLP when OTEL_EXPORTER_OTLP_ENDPOINT is set. Call once at startup."""
+    global _tracer, _tracer_provider
+    if not OTEL_EXPORTER_OTLP_ENDPOINT or _tracer is not None:
+        return
+    if not OTEL_AVAILABLE:
+        logger.warning("OTEL_EXPORTER_OTLP_ENDPOINT is set but opentelemetry is not installed; tracing is off")
+        return
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+    _tracer_provider = TracerProvider(
+        resource=Resource.create({"service.name": OTEL_SERVICE_NAME}),
+        sampler=ParentBased(TraceIdRatioBased(OTEL_TRACE_SAMPLE_RATE)),
+    )
+    # The exporter reads the endpoint from the environment and posts to its /v1/traces
+    _tracer_provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(_tracer_provider)
+    _tracer = trace.get_tracer("extractor_api")
+    logger.info(f"Exporting traces to {OTEL_EXPORTER_OTLP_ENDPOINT}")
+
+
+def shutdown():
+    if _tracer_provider is not None:
+        _tracer_provider.shutdown()  # flushes buffered spans
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def observe_stage(name: str, seconds: float):
+    STAGE_SECONDS.labels(name).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str, **attributes):
+    """Times the block as pipeline stage `name`, in a span of its own when tracing is on."""
+    span = _tracer.start_as_current_span(name, attributes=attributes) if _tracer is not None else nullcontext()
+    start = time.perf_counter()
+    with span:
+        try:
+            yield
+        finally:
+            observe_stage(name, time.perf_counter() - start)
+
+
+def record_llm_response(model: str, response):
+    LLM_REQUESTS.labels(model, "ok").inc()
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        LLM_TOKENS.labels(model, "prompt").inc(usage.prompt_tokens or 0)
+        LLM_TOKENS.labels(model, "completion").inc(usage.completion_tokens or 0)
+
+
+async def instrument_request(request, call_next):
+    """HTTP middleware: request latency histogram, a server span, and the sampled stage breakdown."""
+    timings = {}
+    token = _request_timings.set(timings)
+    status = 500
+    start = time.perf_counter()
+    if _tracer is not None:
+        span = _tracer.start_as_current_span(f"{request.method} {request.url.path}", context=propagate.extract(request.headers),
+                                             kind=trace.SpanKind.SERVER)
+    else:
+        span = nullcontext()
+    try:
+        with span as current:
+            response = await call_next(request)
+            status = response.status_code
+            if current is not None:
+                current.set_attribute("http.status_code", status)
+                current.update_name(f"{request.method} {_route(request)}")
+            return response
+    finally:
+        _request_timings.reset(token)
+        elapsed = time.perf_counter() - start
+        route = _route(request)
+        HTTP_REQUEST_SECONDS.labels(request.method, route, str(status)).observe(elapsed)
+        if timings and logger.isEnabledFor(logging.DEBUG) and random.random() < DEBUG_LOG_SAMPLE_RATE:
+            breakdown = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in timings.items())
+            logger.debug(f"{request.method} {route} {status} in {elapsed * 1000:.0f} ms: {breakdown}")
+
+
+def _route(request) -> str:
+    # The route template, not the raw path, so ids don't explode the label set
+    route = request.scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+
+def render() -> tuple[bytes, str]:
+    """The /metrics body and its content type."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,240 @@
+"""
+OCR for uploaded images and scanned PDF pages.
+
+Images are prepared before recognition: EXIF rotation is applied, they are
+converted to grayscale, scaled to OCR_TARGET_DPI when their resolution is
+known, capped at OCR_MAX_DIMENSION pixels and binarized with Otsu's
+threshold. Phone photos are mostly downscaled, which is where most of the time
+goes.
+
+Recognition uses a pool of tesserocr API handles when tesserocr is
+installed. The handles are created once per process and reused, with the
+language data already loaded. Without tesserocr, pytesseract runs the
+tesseract binary for each image. Multi-frame TIFFs are read frame by frame.
+HEIC/HEIF photos are supported when pillow-heif is installed.
+"""
+import io
+import os
+import time
+import queue
+import logging
+import threading
+import importlib.util
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+OCR_ENGINE = os.getenv("OCR_ENGINE", "auto")  # auto | tesserocr | pytesseract
+OCR_LANG = os.getenv("OCR_LANG", "eng")  # tesseract language codes, e.g. "eng+deu"
+OCR_PSM = int(os.getenv("OCR_PSM", "3"))  # page segmentation mode; 3 = fully automatic, 4 = single column, 6 = single block
+OCR_POOL_SIZE = int(os.getenv("OCR_POOL_SIZE", "1"))  # tesserocr handles per process; raise for the thread executor
+OCR_TIMEOUT_SECONDS = float(os.getenv("OCR_TIMEOUT_SECONDS", "60"))  # pytesseract only
+OCR_TARGET_DPI = int(os.getenv("OCR_TARGET_DPI", "300"))
+OCR_MAX_DIMENSION = int(os.getenv("OCR_MAX_DIMENSION", "3000"))  # longest side in pixels after scaling
+OCR_MAX_UPSCALE = 2.0
+OCR_BINARIZE = os.getenv("OCR_BINARIZE", "true").lower() == "true"
+OCR_MAX_FRAMES = int(os.getenv("OCR_MAX_FRAMES", "20"))  # multi-frame TIFF pages read per upload
+
+HEIF_AVAILABLE = importlib.util.find_spec("pillow_heif") is not None
+_heif_registered = False
+
+
+class OCRStats:
+    """Per-process totals for each OCR stage."""
+
+    STAGES = ("decode", "preprocess", "recognize")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.images = 0
+        self.frames = 0
+        self.seconds = dict.fromkeys(self.STAGES, 0.0)
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            self.seconds[stage] += seconds
+
+    def count(self, images: int = 0, frames: int = 0):
+        with self._lock:
+            self.images += images
+            self.frames += frames
+
+    def stats(self) -> dict:
+        return {"engine": _engine_name(), "images": self.images, "frames": self.frames,
+                **{f"{stage}_seconds": round(seconds, 3) for stage, seconds in self.seconds.items()}}
+
+
+ocr_stats = OCRStats()
+
+
+class _Timer:
+    def __init__(self, stage: str, timings: dict):
+        self.stage = stage
+        self.timings = timings
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.timings[self.stage] = self.timings.get(self.stage, 0.0) + elapsed
+        ocr_stats.record(self.stage, elapsed)
+        metrics.OCR_STEP_SECONDS.labels(self.stage).observe(elapsed)
+
+
+# ---------- Preprocessing ----------
+
+def otsu_threshold(histogram: list[int]) -> int:
+    """Threshold that best separates a 256-bin grayscale histogram into ink and background."""
+    total = sum(histogram)
+    weighted_total = sum(level * count for level, count in enumerate(histogram))
+    background_weight = 0
+    background_sum = 0
+    best_level, best_variance = 127, -1.0
+    for level, count in enumerate(histogram):
+        background_weight += count
+        if background_weight == 0:
+            continue
+        foreground_weight = total - background_weight
+        if foreground_weight == 0:
+            break
+        background_sum += level * count
+        background_mean = background_sum / background_weight
+        foreground_mean = (weighted_total - background_sum) / foreground_weight
+        variance = background_weight * foreground_weight * (background_mean - foreground_mean) ** 2
+        if variance > best_variance:
+            best_level, best_variance = level, variance
+    return best_level
+
+
+def preprocess(img, dpi: float | None = None):
+    """Grayscale, DPI normalization, downscaling and binarization. dpi overrides the image's own metadata."""
+    from PIL import Image, ImageOps
+
+    if dpi is None:
+        dpi = (img.info.get("dpi") or (None,))[0]
+    img = ImageOps.exif_transpose(img)
+    if img.mode != "L":
+        img = img.convert("L")
+
+    scale = OCR_TARGET_DPI / dpi if dpi and dpi >= 50 else 1.0
+    scale = min(scale, OCR_MAX_UPSCALE, OCR_MAX_DIMENSION / max(img.size))
+    if abs(scale - 1.0) > 0.05:
+        size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        img = img.resize(size, Image.LANCZOS if scale < 1 else Image.BICUBIC)
+
+    if OCR_BINARIZE:
+        threshold = otsu_threshold(img.histogram())
+        img = img.point([0 if level <= threshold else 255 for level in range(256)])
+    return img
+
+
+# ---------- Engines ----------
+
+class TesserocrPool:
+    """Reusable tesserocr API handles; each handle is used by one thread at a time."""
+
+    def __init__(self, size: int = OCR_POOL_SIZE, lang: str = OCR_LANG, psm: int = OCR_PSM):
+        import tesserocr
+        self._apis = queue.Queue()
+        for _ in range(max(1, size)):
+            self._apis.put(tesserocr.PyTessBaseAPI(lang=lang, psm=psm))
+
+    def recognize(self, img) -> str:
+        api = self._apis.get()
+        try:
+            api.SetImage(img)
+            return api.GetUTF8Text()
+        finally:
+            api.Clear()
+            self._apis.put(api)
+
+    def close(self):
+        while not self._apis.empty():
+            self._apis.get_nowait().End()
+
+
+class PytesseractEngine:
+    """Runs the tesseract binary once per image."""
+
+    def __init__(self, lang: str = OCR_LANG, psm: int = OCR_PSM):
+        self.lang = lang
+        self.config = f"--psm {psm}"
+
+    def recognize(self, img) -> str:
+        import pytesseract
+        return pytesseract.image_to_string(img, lang=self.lang, config=self.config, timeout=OCR_TIMEOUT_SECONDS)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """Creates the OCR engine on first use in this process and reuses it afterwards."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = _create_engine()
+    return _engine
+
+
+def _create_engine():
+    if OCR_ENGINE in ("auto", "tesserocr"):
+        try:
+            engine = TesserocrPool()
+            logger.info(f"OCR using tesserocr pool of {max(1, OCR_POOL_SIZE)} (lang={OCR_LANG}, psm={OCR_PSM})")
+            return engine
+        except Exception as e:  # not installed, or tessdata for OCR_LANG missing
+            if OCR_ENGINE == "tesserocr":
+                raise
+            logger.info(f"tesserocr unavailable, falling back to pytesseract: {e}")
+    return PytesseractEngine()
+
+
+def _engine_name() -> str | None:
+    return type(_engine).__name__ if _engine is not None else None
+
+
+# ---------- Entry points ----------
+
+def open_image(source: bytes | str):
+    from PIL import Image
+    global _heif_registered
+    if HEIF_AVAILABLE and not _heif_registered:
+        import pillow_heif
+        pillow_heif.register_heif_opener()
+        _heif_registered = True
+    return Image.open(source if isinstance(source, str) else io.BytesIO(source))
+
+
+def recognize(img, dpi: float | None = None, timings: dict | None = None) -> str:
+    """Preprocesses and OCRs one PIL image."""
+    timings = {} if timings is None else timings
+    with metrics.stage("ocr"):
+        with _Timer("preprocess", timings):
+            img = preprocess(img, dpi)
+        with _Timer("recognize", timings):
+            return get_engine().recognize(img)
+
+
+def ocr_image(source: bytes | str) -> str:
+    """OCRs an image file given as bytes or a path, every frame of a multi-frame TIFF included."""
+    from PIL import ImageSequence
+
+    timings = {}
+    texts = []
+    with _Timer("decode", timings):
+        img = open_image(source)
+    with img:
+        for index, frame in enumerate(ImageSequence.Iterator(img)):
+            if index >= OCR_MAX_FRAMES:
+                logger.warning(f"Image has more than {OCR_MAX_FRAMES} frames; the rest are skipped")
+                break
+            with _Timer("decode", timings):
+                frame.load()
+            texts.append(recognize(frame, timings=timings))
+    ocr_stats.count(images=1, frames=len(texts))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("OCR of %d frame(s): %s", len(texts), ", ".join(f"{stage} {seconds * 1000:.0f} ms" for stage, seconds in timings.items()))
+    return "\n".join(texts)
@@ -0,0 +1,49 @@
+import os
+
+PDF_OCR_DPI = int(os.getenv("PDF_OCR_DPI", "300"))
+PDF_OCR_ENABLED = os.getenv("PDF_OCR_ENABLED", "true").lower() == "true"
+# A page with less extractable text than this but with embedded images is treated as a scan
+IMAGE_ONLY_TEXT_THRESHOLD = int(os.getenv("PDF_IMAGE_ONLY_TEXT_THRESHOLD", "20"))
+
+
+def extract_pages(source: bytes | str, start: int = 0, stop: int | None = None, char_budget: int | None = None, ocr: bool = PDF_OCR_ENABLED) -> tuple[list[str], int]:
+    """
+    Extracts the text of pages [start, stop) from a PDF given as bytes or a
+    path. Image-only pages are OCR'd. Stops early once char_budget characters
+    have been collected. Returns (page_texts, total_page_count).
+
+    Runs in a parse worker, so it only takes picklable arguments.
+    """
+    import fitz  # PyMuPDF
+    doc = fitz.open(source) if isinstance(source, str) else fitz.open(stream=source, filetype="pdf")
+    try:
+        page_count = doc.page_count
+        stop = page_count if stop is None else min(stop, page_count)
+        texts = []
+        collected = 0
+        for number in range(start, stop):
+            page = doc.load_page(number)
+            text = page.get_text()
+            if ocr and is_image_only(page, text):
+                text = ocr_page(page)
+            texts.append(text)
+            collected += len(text)
+            if char_budget is not None and collected >= char_budget:
+                break
+        return texts, page_count
+    finally:
+        doc.close()
+
+
+def is_image_only(page, text: str) -> bool:
+    """Cheap scan detection: almost no text layer, but at least one embedded image."""
+    return len(text.strip()) < IMAGE_ONLY_TEXT_THRESHOLD and bool(page.get_images(full=False))
+
+
+def ocr_page(page) -> str:
+    import fitz  # PyMuPDF
+    from PIL import Image
+    from utils.ocr import recognize
+    pix = page.get_pixmap(dpi=PDF_OCR_DPI, colorspace=fitz.csGRAY)
+    img = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+    return recognize(img, dpi=PDF_OCR_DPI)
@@ -0,0 +1,103 @@
+"""
+Section-level lineage for incremental re-analysis.
+
+A SectionIndex records, for one analyzed resume, a hash of every section
+(as cleaned by text_compactor) and which of the extracted skills were found
+in it. Skills the model inferred without naming them in any section are
+recorded on every section that was analyzed in the same call. When the user
+uploads an edited version, only the sections whose hash is new need to go to
+the extractor; unchanged sections carry their skills over from the previous
+version, and skills of deleted or rewritten sections are dropped.
+"""
+import re
+import json
+import hashlib
+from dataclasses import dataclass, field
+from utils.skill_taxonomy import get_matcher
+from utils.text_compactor import clean_sections
+
+
+@dataclass
+class SectionIndex:
+    hashes: list[str]
+    skills: list[list[str]]  # skills found in each section, parallel to hashes
+    inferred: list[list[str]] = field(default_factory=list)  # inferred skills per section, parallel to hashes
+
+    def all_skills(self) -> list[str]:
+        return _dedupe([skill for section in self.skills for skill in section] +
+                       [skill for section in self.inferred for skill in section])
+
+    def to_json(self) -> str:
+        return json.dumps({"hashes": self.hashes, "skills": self.skills, "inferred": self.inferred})
+
+    @classmethod
+    def from_json(cls, value: str) -> "SectionIndex":
+        data = json.loads(value)
+        inferred = data.get("inferred", [])
+        if all(isinstance(skill, str) for skill in inferred):
+            inferred = [list(inferred) for _ in data["hashes"]]  # older rows kept one list for the whole resume
+        return cls(data["hashes"], data["skills"], inferred)
+
+
+def split(text: str) -> tuple[list[str], list[str]]:
+    """Returns (section_texts, section_hashes) for text."""
+    sections = ["\n".join(lines) for lines in clean_sections(text)]
+    return sections, [section_hash(section) for section in sections]
+
+
+def section_hash(section: str) -> str:
+    return hashlib.sha256(section.lower().encode("utf-8")).hexdigest()[:32]
+
+
+def build_index(sections: list[str], skills: list[str]) -> SectionIndex:
+    """
+    Attributes each skill to the sections that mention it by name or by a
+    taxonomy alias. Skills no section mentions were inferred from the
+    sections as a whole, so they are recorded on each of them.
+    """
+    matcher = get_matcher()
+    patterns = {skill: re.compile(r"(?<![\w+#])" + re.escape(skill) + r"(?![\w+#])", re.IGNORECASE) for skill in skills}
+    per_section = []
+    placed = set()
+    for section in sections:
+        matched = {name.lower() for name in matcher.extract(section)}
+        found = [skill for skill in skills if skill.lower() in matched or patterns[skill].search(section)]
+        placed.update(found)
+        per_section.append(found)
+    inferred = [skill for skill in skills if skill not in placed]
+    return SectionIndex([section_hash(section) for section in sections], per_section, [list(inferred) for _ in sections])
+
+
+def overlap(parent: SectionIndex, hashes: list[str]) -> float:
+    """Fraction of the new version's sections that are unchanged from parent."""
+    if not hashes:
+        return 0.0
+    known = set(parent.hashes)
+    return sum(h in known for h in hashes) / len(hashes)
+
+
+def changed_sections(parent: SectionIndex, hashes: list[str]) -> list[int]:
+    known = set(parent.hashes)
+    return [i for i, h in enumerate(hashes) if h not in known]
+
+
+def merge(parent: SectionIndex, hashes: list[str], changed: list[int], delta: SectionIndex) -> SectionIndex:
+    """
+    Index for the new version: unchanged sections keep the parent's found
+    and inferred skills, changed sections (in order) take delta's. Sections
+    the new version no longer has take their skills with them.
+    """
+    carried = dict(zip(parent.hashes, zip(parent.skills, parent.inferred)))
+    fresh = dict(zip(changed, zip(delta.skills, delta.inferred)))
+    merged = [fresh[i] if i in fresh else carried[h] for i, h in enumerate(hashes)]
+    return SectionIndex(list(hashes), [list(found) for found, _ in merged], [list(inferred) for _, inferred in merged])
+
+
+def _dedupe(skills: list[str]) -> list[str]:
+    seen = set()
+    result = []
+    for skill in skills:
+        if skill.lower() not in seen:
+            seen.add(skill.lower())
+            result.append(skill)
+    return result
@@ -1,65 +1,176 @@
-import os
-from openai import OpenAI
-from dotenv import load_dotenv
-import logging
-import ast
-
-load_dotenv()
-
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
-logger = logging.getLogger(__name__)
-
-def extract_skills_and_feedback_from_text(text: str) -> tuple[list[str], str]:
-    prompt = (
-        "Extract a comprehensive list of all relevant skills from this resume text, including technical skills, soft skills, and domain-specific skills. "
-        "Return them as a Python list of strings labeled 'Skills'. Also provide feedback labeled 'Feedback' on how the resume can be improved. "
-        "Ensure the response is structured as follows:\n\nSkills: [skill1, skill2, skill3]\nFeedback: Your feedback here\n\n" +
-        "If skills are not explicitly listed, infer them from the text and provide them in the 'Skills' section. "
-        "Ensure to include all types of skills, even if they are scattered throughout the text.\n\n" + text[:3000]
-    )
-
-    try:
-        logger.debug("Prompt sent to OpenAI: %s", prompt)  # Log the prompt
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",  # Use a cheaper model
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0,
-            max_tokens=500,
-        )
-        content = response.choices[0].message.content.strip()
-
-        logger.debug("Raw OpenAI response: %s", content)  # Debugging log
-
-        if "Feedback:" in content:
-            try:
-                skills_part, feedback_part = content.split("Feedback:", 1)
-                feedback = feedback_part.strip()
-
-                # --- START OF THE FIX ---
-                # Make parsing more robust
-                skills_str = skills_part.replace("Skills:", "", 1).strip()
-
-                # Clean up the string by removing list-like characters and quotes
-                skills_str = skills_str.strip("[]'\" ")
-
-                # Split by comma and clean up each item
-                skills = [skill.strip().strip("'\"") for skill in skills_str.split(',') if skill.strip()]
-                # --- END OF THE FIX ---
-
-            except Exception as parse_error:
-                logger.error("Error parsing response: %s", parse_error)
-                skills = []
-                feedback = "Unable to parse feedback from the AI response."
-        else:
-            logger.warning("Response does not contain 'Feedback:'")
-            skills = []
-            feedback = "Feedback not provided in the AI response."
-
-        return skills, feedback
-
-    except Exception as e:
-        logger.error("Error generating response: %s", e)
-        return [], "Unable to generate feedback."
+import os
+from dataclasses import dataclass, field
+from dotenv import load_dotenv
+import logging
+from pydantic import ValidationError
+from schemas import ResumeAnalysis
+from utils.skill_taxonomy import get_matcher
+from utils.llm_gateway import gateway, LLMUnavailableError
+from utils.text_compactor import compact
+from utils.section_diff import SectionIndex
+
+load_dotenv()
+
+# "llm": the model extracts skills and writes feedback (default)
+# "local": skills come from the taxonomy matcher, no model call at all
+# "hybrid": skills come from the matcher, the model only writes feedback
+SKILL_EXTRACTION_MODE = os.getenv("SKILL_EXTRACTION_MODE", "llm")
+LOCAL_MODE_FEEDBACK = "Feedback is not available when skills are extracted locally."
+FEEDBACK_UNAVAILABLE = "Unable to generate feedback."
+# When the LLM is unavailable (circuit open, retries exhausted), return locally matched skills instead of nothing
+LLM_DEGRADED_FALLBACK = os.getenv("LLM_DEGRADED_FALLBACK", "true").lower() == "true"
+
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
+# "json_object" works with gpt-3.5-turbo; "json_schema" (strict structured
+# outputs) needs a model that supports it, e.g. gpt-4o-mini
+LLM_RESPONSE_FORMAT = os.getenv("LLM_RESPONSE_FORMAT", "json_object")
+ANALYSIS_MAX_TOKENS = int(os.getenv("ANALYSIS_MAX_TOKENS", "350"))
+
+# Bump these whenever a prompt changes. The version is stored with every
+# result and is part of the cache key, so results from different prompts are
+# never mixed and can be compared side by side.
+ANALYSIS_PROMPT_VERSION = "analysis-json-v1"
+FEEDBACK_PROMPT_VERSION = "feedback-v1"
+LOCAL_PROMPT_VERSION = "local"
+PROMPT_VERSION = {"local": LOCAL_PROMPT_VERSION, "hybrid": FEEDBACK_PROMPT_VERSION}.get(SKILL_EXTRACTION_MODE, ANALYSIS_PROMPT_VERSION)
+
+# Sent with the changed sections of a re-uploaded resume, followed by the feedback on the earlier version
+REVISION_INSTRUCTIONS = (
+    "This is a revised version of a resume that was reviewed before. Only its changed sections are shown; "
+    "the other sections are unchanged. Take skills from the sections shown only. Write feedback for the whole "
+    "resume: keep the earlier points that still apply and replace those the revised sections address.\n"
+    "Earlier feedback: "
+)
+
+ANALYSIS_JSON_SCHEMA = {
+    "name": "resume_analysis",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "skills": {"type": "array", "items": {"type": "string"}},
+            "feedback": {"type": "string"},
+        },
+        "required": ["skills", "feedback"],
+        "additionalProperties": False,
+    },
+}
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class AnalysisResult:
+    skills: list[str]
+    feedback: str
+    prompt_version: str = PROMPT_VERSION
+    # False when the model failed or returned unusable output: the result is
+    # not cached and the caller refunds the quota it charged
+    ok: bool = True
+    usage: dict = field(default_factory=dict)
+    # Filled in by resume_pipeline so later versions of the resume can be diffed against this one
+    text_hash: str | None = None
+    sections: SectionIndex | None = None
+    parent_id: int | None = None
+
+async def extract_skills_and_feedback_from_text(text: str, prompt_text: str | None = None, previous_feedback: str | None = None) -> AnalysisResult:
+    """
+    text is the full resume text. prompt_text is what the model sees, normally
+    text already reduced by text_compactor.compact(); it is compacted here when
+    not given. previous_feedback marks text as the changed sections of a
+    revised resume, so the model updates that feedback instead of reviewing
+    the sections on their own.
+    """
+    if SKILL_EXTRACTION_MODE == "local":
+        return AnalysisResult(extract_skills_locally(text), LOCAL_MODE_FEEDBACK)
+    if prompt_text is None:
+        prompt_text = compact(text).text
+    if SKILL_EXTRACTION_MODE == "hybrid":
+        skills = extract_skills_locally(text)
+        feedback = await generate_feedback(prompt_text, skills, previous_feedback)
+        return AnalysisResult(skills, feedback, ok=feedback != FEEDBACK_UNAVAILABLE)
+    return await extract_skills_and_feedback_with_llm(prompt_text, previous_feedback)
+
+def extract_skills_locally(text: str) -> list[str]:
+    """Matches the whole text against the skill taxonomy; no network call and no character cap."""
+    return get_matcher().extract(text)
+
+async def generate_feedback(text: str, skills: list[str], previous_feedback: str | None = None) -> str:
+    """Asks the model for feedback only, passing the locally extracted skills so it doesn't have to list them."""
+    prompt = (
+        "You are reviewing a resume. These skills were already extracted from it: " + ", ".join(skills) + ".\n"
+        "Do not list skills. Give concise, specific feedback on how the resume can be improved.\n\n"
+    )
+    if previous_feedback:
+        prompt += REVISION_INSTRUCTIONS + previous_feedback + "\n\n"
+    prompt += text
+    try:
+        response = await gateway.complete(
+            model=LLM_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0,
+            max_tokens=250,
+        )
+        return response.choices[0].message.content.strip()
+    except Exception as e:
+        logger.error("Error generating feedback: %s", e)
+        return FEEDBACK_UNAVAILABLE
+
+def _response_format() -> dict:
+    if LLM_RESPONSE_FORMAT == "json_schema":
+        return {"type": "json_schema", "json_schema": ANALYSIS_JSON_SCHEMA}
+    return {"type": "json_object"}
+
+def _clean_skills(skills: list[str]) -> list[str]:
+    """Strips whitespace and drops empty and duplicate entries (case-insensitively), keeping order."""
+    seen = set()
+    cleaned = []
+    for skill in skills:
+        skill = skill.strip()
+        if skill and skill.lower() not in seen:
+            seen.add(skill.lower())
+            cleaned.append(skill)
+    return cleaned
+
+async def extract_skills_and_feedback_with_llm(text: str, previous_feedback: str | None = None) -> AnalysisResult:
+    messages = [
+        {
+            "role": "system",
+            "content": (
+                "You analyze resumes. Reply with a JSON object of the form "
+                '{"skills": ["..."], "feedback": "..."}. '
+                "skills lists every technical, soft and domain-specific skill in the resume, including ones that are "
+                "only implied by the experience, each as a short name. feedback is at most 80 words of specific advice "
+                "on how the resume can be improved."
+            ),
+        },
+        {"role": "user", "content": text},
+    ]
+    if previous_feedback:
+        messages.insert(1, {"role": "system", "content": REVISION_INSTRUCTIONS + previous_feedback})
+
+    try:
+        response = await gateway.complete(
+            model=LLM_MODEL,
+            messages=messages,
+            temperature=0,
+            max_tokens=ANALYSIS_MAX_TOKENS,
+            response_format=_response_format(),
+        )
+    except LLMUnavailableError as e:
+        logger.error("LLM unavailable: %s", e)
+        skills = extract_skills_locally(text) if LLM_DEGRADED_FALLBACK else []
+        return AnalysisResult(skills, FEEDBACK_UNAVAILABLE, ok=False)
+    except Exception as e:
+        logger.error("Error generating response: %s", e)
+        return AnalysisResult([], FEEDBACK_UNAVAILABLE, ok=False)
+
+    usage = response.usage.model_dump() if response.usage else {}
+    choice = response.choices[0]
+    try:
+        analysis = ResumeAnalysis.model_validate_json(choice.message.content or "")
+    except ValidationError as e:
+        # Usually a truncated object (finish_reason "length") or a refusal
+        logger.error("Invalid structured response (finish_reason=%s): %s", choice.finish_reason, e)
+        return AnalysisResult([], FEEDBACK_UNAVAILABLE, ok=False, usage=usage)
+
+    return AnalysisResult(_clean_skills(analysis.skills), analysis.feedback.strip(), usage=usage)
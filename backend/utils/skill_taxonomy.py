@@ -0,0 +1,123 @@
+"""
+Deterministic skill matcher built from a skill taxonomy.
+
+The taxonomy is a JSON object mapping each canonical skill name to a list of
+aliases, e.g. {"PostgreSQL": ["postgres", "psql"]}. Matching is
+case-insensitive, except for aliases written as "=Alias", which only match
+that exact spelling. Listing "=Name" under a skill makes the name itself
+case-sensitive, which keeps short or common words ("Go", "R", "Excel") from
+matching ordinary prose.
+"""
+import os
+import re
+import json
+import logging
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+SKILL_TAXONOMY_PATH = os.getenv(
+    "SKILL_TAXONOMY_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "skill_taxonomy.json"),
+)
+
+# Tokens may contain inner ".+#/-_" so "node.js", "c++", "c#" and ".net" survive
+# while sentence punctuation ("Python.") is dropped.
+_TOKEN_RE = re.compile(r"\.?[A-Za-z0-9](?:[A-Za-z0-9+#._-]*[A-Za-z0-9+#])?")
+_EXACT = "="  # prefix of case-sensitive trie keys
+
+
+@dataclass(frozen=True)
+class SkillMatch:
+    skill: str
+    start: int
+    end: int
+
+
+def tokenize(text: str):
+    return [(m.group(), m.start(), m.end()) for m in _TOKEN_RE.finditer(text)]
+
+
+class SkillMatcher:
+    """Token-level trie over every skill name and alias; find() is one left-to-right pass with longest match."""
+
+    def __init__(self, taxonomy: dict[str, list[str]]):
+        self._root = {}
+        self.max_depth = 0
+        for name, aliases in taxonomy.items():
+            exact_aliases = [alias[1:] for alias in aliases if alias.startswith("=")]
+            if name not in exact_aliases:
+                self._add(name, name, exact=False)
+            for alias in aliases:
+                if alias.startswith("="):
+                    self._add(alias[1:], name, exact=True)
+                else:
+                    self._add(alias, name, exact=False)
+        self.size = len(taxonomy)
+
+    def _add(self, phrase: str, skill: str, exact: bool):
+        tokens = [token for token, _, _ in tokenize(phrase)]
+        if not tokens:
+            return
+        node = self._root
+        for token in tokens:
+            key = _EXACT + token if exact else token.lower()
+            node = node.setdefault(key, {})
+        node[None] = skill
+        self.max_depth = max(self.max_depth, len(tokens))
+
+    def find(self, text: str) -> list[SkillMatch]:
+        """Returns every skill occurrence in text, with character offsets, in order."""
+        tokens = tokenize(text)
+        matches = []
+        i = 0
+        while i < len(tokens):
+            # A token can continue both a case-insensitive and an exact path ("c sharp" vs "=C")
+            frontier = [self._root]
+            best = None
+            j = i
+            while frontier and j < len(tokens) and j - i < self.max_depth:
+                token = tokens[j][0]
+                frontier = [child for node in frontier
+                            for child in (node.get(token.lower()), node.get(_EXACT + token)) if child is not None]
+                j += 1
+                for node in frontier:
+                    if None in node:
+                        best = (node[None], j)
+                        break
+            if best:
+                skill, end = best
+                matches.append(SkillMatch(skill=skill, start=tokens[i][1], end=tokens[end - 1][2]))
+                i = end
+            else:
+                i += 1
+        return matches
+
+    def extract(self, text: str) -> list[str]:
+        """Distinct canonical skills in order of first appearance."""
+        return list(dict.fromkeys(match.skill for match in self.find(text)))
+
+
+def canonical_name(name: str) -> str:
+    """Maps a skill name to its taxonomy spelling ("postgres" -> "PostgreSQL") when the whole name is one known skill."""
+    name = " ".join(name.split())
+    matches = get_matcher().find(name)
+    if len(matches) == 1 and matches[0].start == 0 and matches[0].end == len(name):
+        return matches[0].skill
+    return name
+
+
+def load_taxonomy(path: str = SKILL_TAXONOMY_PATH) -> dict[str, list[str]]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+_matcher = None
+
+def get_matcher() -> SkillMatcher:
+    """Builds the matcher from SKILL_TAXONOMY_PATH on first use and reuses it afterwards."""
+    global _matcher
+    if _matcher is None:
+        _matcher = SkillMatcher(load_taxonomy())
+        logger.info("Loaded skill taxonomy with %d skills from %s", _matcher.size, SKILL_TAXONOMY_PATH)
+    return _matcher
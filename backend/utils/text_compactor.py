@@ -0,0 +1,236 @@
+"""
+Shrinks extracted resume text to a prompt token budget.
+
+PDF and DOCX extraction leaves behind blank lines, running headers and
+footers, page numbers and contact details, none of which help the model.
+compact() removes those first, splits what is left into sections at heading
+lines, and if the text is still over budget keeps the sections that add the
+most new taxonomy skills per token, in their original order.
+
+Tokens are counted with the model's tokenizer when tiktoken is installed and
+estimated at four characters per token otherwise.
+"""
+import os
+import re
+import logging
+import threading
+import unicodedata
+from dataclasses import dataclass
+from utils.skill_taxonomy import get_matcher
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "800"))
+TOKENIZER_MODEL = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
+# Lines repeated at least this many times are treated as headers/footers
+REPEATED_LINE_MIN_COUNT = 2
+CHARS_PER_TOKEN = 4
+
+SECTION_HEADINGS = {
+    "summary", "profile", "objective", "about me", "skills", "technical skills", "core competencies", "competencies",
+    "experience", "work experience", "professional experience", "employment history", "work history", "projects",
+    "education", "certifications", "certificates", "courses", "training", "publications", "awards", "languages",
+    "interests", "volunteering", "volunteer experience", "references", "contact", "tools", "technologies",
+}
+# Sections that are never worth prompt tokens
+DROPPED_SECTIONS = {"contact", "references", "interests"}
+
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_URL_RE = re.compile(r"(?:https?://|www\.)\S+|\b(?:linkedin|github)\.com/\S*", re.IGNORECASE)
+# Candidate runs of digits and separators; _phone_number() decides which are phone numbers
+_PHONE_RE = re.compile(r"\+?\(?\d[\d\s().-]{7,}\d")
+# A year, optionally with month and day ("2018", "2018-01", "01.2018", "15.01.2018"); two joined by "-" are a date range
+_DATE = r"(?:(?:19|20)\d{2}(?:[-.](?:0?[1-9]|1[0-2])(?:[-.](?:0?[1-9]|[12]\d|3[01]))?)?|(?:(?:0?[1-9]|[12]\d|3[01])[-.])?(?:0?[1-9]|1[0-2])[-.](?:19|20)\d{2})"
+_DATE_RANGE_RE = re.compile(rf"(?<![\d.]){_DATE}\s*-\s*{_DATE}(?![\d.])")
+# "Page 2", "Page 2 of 3", "2 of 3", "2 / 3" or a bare page number; years and month/year lines are content
+_PAGE_NUMBER_RE = re.compile(r"^(?:page\s*\d+(?:\s*(?:of|/)\s*\d+)?|[1-9]\d{0,2}(?:\s*(?:of|/)\s*[1-9]\d{0,2})?)$", re.IGNORECASE)
+_CONTACT_LABEL_RE = re.compile(r"^(?:e-?mail|phone|mobile|tel|address|linkedin|github|website)\s*:?\s*$", re.IGNORECASE)
+
+
+@dataclass
+class CompactedText:
+    text: str
+    original_tokens: int
+    tokens: int
+    sections_kept: int
+    sections_total: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(self.original_tokens - self.tokens, 0)
+
+
+_encoding = None
+_encoding_loaded = False
+
+def count_tokens(text: str) -> int:
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        try:
+            import tiktoken
+            try:
+                _encoding = tiktoken.encoding_for_model(TOKENIZER_MODEL)
+            except KeyError:
+                _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:  # not installed, or the encoding can't be downloaded
+            logger.info(f"tiktoken unavailable, estimating tokens from length: {e}")
+        _encoding_loaded = True
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def normalize_lines(text: str) -> list[str]:
+    """NFKC-normalizes, collapses whitespace, and drops blank lines, page numbers and repeated headers/footers."""
+    lines = [" ".join(line.split()) for line in unicodedata.normalize("NFKC", text).splitlines()]
+    lines = [line for line in lines if line and not _PAGE_NUMBER_RE.match(line)]
+    counts = {}
+    for line in lines:
+        counts[line.lower()] = counts.get(line.lower(), 0) + 1
+    seen = set()
+    kept = []
+    for line in lines:
+        key = line.lower()
+        if key in seen and counts[key] >= REPEATED_LINE_MIN_COUNT:
+            continue
+        seen.add(key)
+        kept.append(line)
+    return kept
+
+
+def _phone_number(match: re.Match) -> str:
+    """Drops the match if it is shaped like a phone number: 8+ digits after a "+", or 10-15 digits, and no date range."""
+    candidate = match.group()
+    digits = sum(c.isdigit() for c in candidate)
+    if _DATE_RANGE_RE.search(candidate) or digits > 15:
+        return candidate  # employment and education dates, e.g. "2015 - 2019" or "01.2018 - 03.2021"
+    if digits >= 10 or (candidate.startswith("+") and digits >= 8):
+        return ""
+    return candidate
+
+
+def strip_contact(line: str) -> str:
+    """Removes emails, URLs and phone numbers; returns "" if nothing else was on the line."""
+    stripped = _PHONE_RE.sub(_phone_number, _URL_RE.sub("", _EMAIL_RE.sub("", line)))
+    if stripped == line:
+        return line
+    stripped = " ".join(stripped.strip(" |,;·•-").split())
+    if len(stripped) < 3 or _CONTACT_LABEL_RE.match(stripped):
+        return ""
+    return stripped
+
+
+def is_heading(line: str) -> bool:
+    name = line.rstrip(":").strip().lower()
+    if name in SECTION_HEADINGS:
+        return True
+    words = line.split()
+    return len(words) <= 4 and line.isupper() and any(c.isalpha() for c in line)
+
+
+def split_sections(lines: list[str]) -> list[list[str]]:
+    """Groups lines into sections; each section starts with its heading line (the first may have none)."""
+    sections = [[]]
+    for line in lines:
+        if is_heading(line) and sections[-1]:
+            sections.append([])
+        sections[-1].append(line)
+    return [section for section in sections if section]
+
+
+def _section_name(section: list[str]) -> str:
+    return section[0].rstrip(":").strip().lower() if is_heading(section[0]) else ""
+
+
+def _truncate(section: list[str], budget: int, covered: set) -> list[str]:
+    """Fits section into budget tokens, taking lines with uncovered skills first; keeps the original line order."""
+    matcher = get_matcher()
+    new_skills = [bool(set(matcher.extract(line)) - covered) for line in section]
+    order = sorted(range(len(section)), key=lambda i: (i > 0, not new_skills[i], i))  # heading line first
+    kept = set()
+    used = 0
+    for i in order:
+        cost = count_tokens(section[i]) + 1
+        if used + cost <= budget:
+            kept.add(i)
+            used += cost
+    return [section[i] for i in sorted(kept)]
+
+
+def clean_sections(text: str) -> list[list[str]]:
+    """The cleaned lines of text grouped into sections, without contact details or dropped sections."""
+    lines = [line for line in (strip_contact(line) for line in normalize_lines(text)) if line]
+    return [section for section in split_sections(lines) if _section_name(section) not in DROPPED_SECTIONS]
+
+
+def compact(text: str, budget: int = PROMPT_TOKEN_BUDGET) -> CompactedText:
+    """Cleans text and, if it is still over budget tokens, keeps the most skill-dense sections."""
+    original_tokens = count_tokens(text)
+    sections = clean_sections(text)
+    total = len(sections)
+
+    cleaned = "\n".join(line for section in sections for line in section)
+    cleaned_tokens = count_tokens(cleaned)
+    if cleaned_tokens <= budget:
+        return CompactedText(cleaned, original_tokens, cleaned_tokens, total, total)
+
+    matcher = get_matcher()
+    costs = [count_tokens("\n".join(section)) + 1 for section in sections]
+    skills = [set(matcher.extract("\n".join(section))) for section in sections]
+
+    # Greedy: repeatedly take the section with the most not-yet-covered skills per token
+    chosen = set()
+    covered = set()
+    remaining = budget
+    while True:
+        best, best_gain = None, 0.0
+        for i, section_skills in enumerate(skills):
+            if i in chosen or costs[i] > remaining:
+                continue
+            gain = len(section_skills - covered) / costs[i]
+            if gain > best_gain:
+                best, best_gain = i, gain
+        if best is None:
+            break
+        chosen.add(best)
+        covered |= skills[best]
+        remaining -= costs[best]
+
+    # Spend what's left on the other sections, most uncovered skills first; those that don't fit are truncated
+    kept = {i: sections[i] for i in chosen}
+    for i in sorted(set(range(total)) - chosen, key=lambda i: (-len(skills[i] - covered), i)):
+        if remaining <= 0:
+            break
+        part = sections[i] if costs[i] <= remaining else _truncate(sections[i], remaining, covered)
+        if part:
+            kept[i] = part
+            covered |= skills[i]
+            remaining -= costs[i] if part is sections[i] else count_tokens("\n".join(part)) + 1
+
+    compacted = "\n".join(line for i in sorted(kept) for line in kept[i])
+    return CompactedText(compacted, original_tokens, count_tokens(compacted), len(kept), total)
+
+
+class CompactionStats:
+    """Running totals of prompt tokens before and after compaction."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.original_tokens = 0
+        self.tokens = 0
+
+    def record(self, compacted: CompactedText):
+        with self._lock:
+            self.requests += 1
+            self.original_tokens += compacted.original_tokens
+            self.tokens += compacted.tokens
+        metrics.PROMPT_TOKENS_SAVED.inc(compacted.tokens_saved)
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, "original_tokens": self.original_tokens, "tokens": self.tokens,
+                "tokens_saved": max(self.original_tokens - self.tokens, 0)}
+
+
+compaction_stats = CompactionStats()